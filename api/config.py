@@ -46,3 +46,47 @@ class Config:
     DEBUG = os.getenv("DEBUG", "True") == "True"
     DEMO_MODE = os.getenv("DEMO_MODE", "True") == "True"
     PORT = int(os.getenv("PORT", 8000))
+
+    # Concurrencia (CPU-bound fuera del event loop)
+    TOURNAMENT_EXECUTOR = os.getenv("TOURNAMENT_EXECUTOR", "thread") # "thread" | "process"
+    TOURNAMENT_WORKERS = int(os.getenv("TOURNAMENT_WORKERS", min(8, os.cpu_count() or 1)))
+    TRAINING_EXECUTOR = os.getenv("TRAINING_EXECUTOR", "process") # "process" | "thread"
+    TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", min(4, os.cpu_count() or 1))) # estrategias entrenadas a la vez
+    TRAINING_N_JOBS = int(os.getenv("TRAINING_N_JOBS", 1)) # núcleos por RandomForest.fit
+    TRAINING_MAX_JOBS = int(os.getenv("TRAINING_MAX_JOBS", 1)) # jobs de /ml/train ejecutándose a la vez (el resto espera en cola)
+    TRAINING_POLL_SECONDS = float(os.getenv("TRAINING_POLL_SECONDS", 2)) # con varios workers: cada cuánto recoge el principal los jobs de los demás
+
+    # Almacén local de velas (OHLCV)
+    OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", "api/data/ohlcv")
+    OHLCV_FETCH_CONCURRENCY = int(os.getenv("OHLCV_FETCH_CONCURRENCY", 4)) # páginas de historial en vuelo a la vez
+    DATASET_SNAPSHOT_DIR = os.getenv("DATASET_SNAPSHOT_DIR", "api/data/datasets") # snapshots versionados de entrenamiento
+    WALK_FORWARD_CACHE_DIR = os.getenv("WALK_FORWARD_CACHE_DIR", "api/data/walkforward") # folds de walk-forward ya evaluados
+
+    # Índice en memoria de bots/trades (recarga si Mongo no soporta change streams)
+    BOT_INDEX_REFRESH_SECONDS = float(os.getenv("BOT_INDEX_REFRESH_SECONDS", 30))
+    # Sharding de bots en vivo: cada worker ejecuta los streams (exchange, símbolo) que le asigna el anillo
+    BOT_SHARDING = os.getenv("BOT_SHARDING", "False") == "True"
+    SHARD_HEARTBEAT_SECONDS = float(os.getenv("SHARD_HEARTBEAT_SECONDS", 5))
+    SHARD_WORKER_TTL = float(os.getenv("SHARD_WORKER_TTL", 20)) # sin heartbeat en N s el worker se da por muerto
+    SHARD_VNODES = int(os.getenv("SHARD_VNODES", 64)) # puntos por worker en el anillo de hashing consistente
+
+    # WebSocket: cola de salida por conexión (un cliente lento no frena al resto)
+    SOCKET_QUEUE_SIZE = int(os.getenv("SOCKET_QUEUE_SIZE", 256)) # mensajes pendientes por conexión
+    SOCKET_SEND_TIMEOUT = float(os.getenv("SOCKET_SEND_TIMEOUT", 10)) # segundos por envío antes de cerrar la conexión
+    # Eventos de estado (ticks) que, con la cola llena, descartan el mensaje más antiguo; el resto nunca se descarta
+    SOCKET_DROP_OLDEST_EVENTS = [e.strip() for e in os.getenv(
+        "SOCKET_DROP_OLDEST_EVENTS", "candle_update,bot_update,status_update,backtest_progress"
+    ).split(",") if e.strip()]
+    SOCKET_COALESCE_MS = float(os.getenv("SOCKET_COALESCE_MS", 250)) # como mucho un estado por topic (vela, bot) cada N ms
+    # Eventos de alta frecuencia enviados en MessagePack a las conexiones que lo negocian (?encoding=msgpack)
+    SOCKET_BINARY_EVENTS = [e.strip() for e in os.getenv("SOCKET_BINARY_EVENTS", "candle_update,bot_update").split(",") if e.strip()]
+
+    # Varios workers: el bus reparte los eventos WebSocket entre procesos
+    SOCKET_EVENT_BUS = os.getenv("SOCKET_EVENT_BUS", "local") # "local" (un worker) | "unix" (varios workers en la misma máquina)
+    SOCKET_BUS_PATH = os.getenv("SOCKET_BUS_PATH", "/tmp/signalkey-events.sock")
+    API_WORKERS = int(os.getenv("API_WORKERS", 1)) # workers de uvicorn; con más de 1 requiere SOCKET_EVENT_BUS=unix
+    API_PRIMARY_LOCK = os.getenv("API_PRIMARY_LOCK", "/tmp/signalkey-primary.lock") # el worker que lo toma arranca bots, Telegram y colas
+
+    # Registro de modelos IA (carga perezosa + LRU)
+    MODEL_CACHE_MAX_MB = float(os.getenv("MODEL_CACHE_MAX_MB", 1024)) # tope de RAM para modelos cargados
+    MODEL_MMAP = os.getenv("MODEL_MMAP", "True") == "True" # árboles en arrays planos mapeados (compartidos entre procesos)
@@ -34,12 +34,47 @@ logger = logging.getLogger("API_MAIN")
 tracker_service = None
 monitor_service = None
 boot_task = None # Referencia para evitar Garbage Collection de la tarea
+primary_lock = None # Descriptor del lock del worker principal (se mantiene abierto)
+
+
+def acquire_primary() -> bool:
+    """
+    Con varios workers, solo uno arranca Telegram, los bots de trading y las colas: el que
+    toma API_PRIMARY_LOCK. El resto sirve HTTP/WebSocket y recibe sus eventos por el bus
+    (con BOT_SHARDING, además, cada worker ejecuta los bots de sus streams).
+    """
+    global primary_lock
+    if Config.API_WORKERS <= 1:
+        return True
+    from api.src.adapters.driven.notifications.event_bus import unix_bus_available
+    from api.src.infrastructure.concurrency.file_lock import try_lock_file
+    if not unix_bus_available():
+        logger.warning("⚠️ Sin sockets Unix: los eventos de un worker no llegarán a los sockets de otro")
+    primary_lock = try_lock_file(Config.API_PRIMARY_LOCK)
+    return primary_lock is not None
 
 # --- FUNCIÓN DE ARRANQUE EN SEGUNDO PLANO (NO BLOQUEANTE) ---
-async def run_background_startup():
+async def reactivate_trading_bots():
+    """Recupera el estado de los bots de trading desde la DB (con sharding, solo los de este worker)."""
+    from api.src.application.services.boot_manager import BootManager
+    from api.src.adapters.driven.notifications.socket_service import socket_service
+    boot_manager_service = BootManager(
+        db_adapter_in=db, 
+        socket_service=socket_service,
+        stream_service=market_stream_service,
+        shard=bot_shard
+    )
+    logger.info("📈 [BACKGROUND] Reactivando bots de trading...")
+    await boot_manager_service.initialize_active_bots()
+
+
+async def run_background_startup(primary: bool = True):
     """
     Ejecuta las tareas pesadas (Telegram, Carga de Modelos, Bots) en paralelo
     después de que la API ya está respondiendo.
+
+    Los workers secundarios (primary=False) solo llegan aquí con BOT_SHARDING: arrancan
+    los bots de sus streams, sin Telegram, cola de entrenamiento ni monitor.
     """
     logger.info("⏳ [BACKGROUND] Iniciando secuencia de carga de servicios...")
     
@@ -48,43 +83,49 @@ async def run_background_startup():
 
     try:
         # 1. Telegram Bots (Puede tardar por conexión de red)
-        bot_manager.signal_processor = process_signal_task
-        logger.info("🤖 [BACKGROUND] Iniciando Telegram Bot Manager...")
-        await bot_manager.restart_all_bots(message_handler=process_signal_task)
-        logger.info(f"✅ [BACKGROUND] Telegram activo: {bot_manager.get_active_bots_count()} bots.")
+        if primary:
+            bot_manager.signal_processor = process_signal_task
+            logger.info("🤖 [BACKGROUND] Iniciando Telegram Bot Manager...")
+            await bot_manager.restart_all_bots(message_handler=process_signal_task)
+            logger.info(f"✅ [BACKGROUND] Telegram activo: {bot_manager.get_active_bots_count()} bots.")
 
         # 2. Inicializar Bots de Trading (Recuperar estado de DB)
-        from api.src.application.services.boot_manager import BootManager
-        from api.src.adapters.driven.notifications.socket_service import socket_service
-        boot_manager_service = BootManager(
-            db_adapter_in=db, 
-            socket_service=socket_service,
-            stream_service=market_stream_service
-        )
-        logger.info("📈 [BACKGROUND] Reactivando bots de trading...")
-        await boot_manager_service.initialize_active_bots()
+        # Con sharding se hace tras el primer reparto de streams (paso 5)
+        if not bot_shard:
+            await reactivate_trading_bots()
         
-        # 3. Cargar Modelos IA (Pesado en CPU/RAM)
+        # 3. Indexar Modelos IA (se cargan bajo demanda, con LRU acotado por MODEL_CACHE_MAX_MB)
         try:
             from api.src.infrastructure.ai.model_manager import ModelManager
-            logger.info("🧠 [BACKGROUND] Cargando modelos de IA...")
-            # Ejecutar en thread pool para no bloquear el loop async si usa joblib
+            logger.info("🧠 [BACKGROUND] Indexando modelos de IA...")
+            # Ejecutar en thread pool para no bloquear el loop async con el recorrido del disco
             await asyncio.to_thread(ModelManager().load_all_models)
-            logger.info("✅ [BACKGROUND] Modelos cargados.")
+            logger.info("✅ [BACKGROUND] Modelos indexados (carga perezosa).")
         except Exception as e:
             logger.warning(f"⚠️ [BACKGROUND] IA Model Manager warning: {e}")
 
-        # 4. Iniciar Motores de Trading
+        # 4. Cola de entrenamiento (/ml/train, AutoML)
+        if primary:
+            from api.src.application.services.training_jobs import training_queue
+            from api.src.application.services.ml_service import MLService
+            training_queue.ml_service_factory = lambda: MLService(exchange_adapter=ccxt_adapter)
+            await training_queue.start()
+
+        # 5. Iniciar Motores de Trading
         logger.info("🚀 [BACKGROUND] Arrancando motores de ejecución...")
         
         # Servicios globales (tracker, monitor)
-        global tracker_service, monitor_service
-        tracker_service = TrackerService(cex_service=cex_service, dex_service=dex_service)
-        monitor_service = MonitorService(cex_service=cex_service, dex_service=dex_service)
-        
-        # Iniciar tareas asíncronas
-        asyncio.create_task(monitor_service.start_monitoring())
+        if primary:
+            global tracker_service, monitor_service
+            tracker_service = TrackerService(cex_service=cex_service, dex_service=dex_service)
+            monitor_service = MonitorService(cex_service=cex_service, dex_service=dex_service)
+            
+            # Iniciar tareas asíncronas
+            asyncio.create_task(monitor_service.start_monitoring())
         await signal_bot_service.start()
+        if bot_shard:
+            logger.info(f"🧩 [BACKGROUND] Shard {bot_shard.worker_id}: {len(bot_shard.owned)} streams")
+            await reactivate_trading_bots()
         
         logger.info("🎉 [BACKGROUND] SISTEMA COMPLETAMENTE OPERATIVO")
 
@@ -96,10 +137,22 @@ async def run_background_startup():
 async def lifespan(app: FastAPI):
     # === STARTUP ===
     logger.info("⚡ API iniciando...")
+    from api.src.adapters.driven.notifications.socket_service import socket_service
+    await socket_service.start()
     
-    # Lanzar la carga pesada como tarea independiente
+    # Lanzar la carga pesada como tarea independiente (solo en el worker principal)
     global boot_task
-    boot_task = asyncio.create_task(run_background_startup())
+    if acquire_primary():
+        boot_task = asyncio.create_task(run_background_startup())
+    else:
+        # Los jobs de /ml/train se registran en Mongo y los ejecuta el worker principal
+        from api.src.application.services.training_jobs import training_queue
+        training_queue.remote = True
+        if bot_shard:
+            logger.info(f"👥 Worker secundario (pid {os.getpid()}): HTTP/WebSocket y su shard de bots")
+            boot_task = asyncio.create_task(run_background_startup(primary=False))
+        else:
+            logger.info(f"👥 Worker secundario (pid {os.getpid()}): solo HTTP/WebSocket")
     
     yield # Aquí la API empieza a recibir peticiones
     
@@ -107,6 +160,8 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 API deteniéndose...")
     try:
         if boot_task: boot_task.cancel()
+        from api.src.application.services.training_jobs import training_queue
+        await training_queue.stop()
         await bot_manager.stop_all_bots()
         if monitor_service: await monitor_service.stop_monitoring()
         await signal_bot_service.stop()
@@ -114,6 +169,9 @@ async def lifespan(app: FastAPI):
         await cex_service.close_all()
         await dex_service.close_all()
         await ai_service.close()
+        from api.src.infrastructure.concurrency import shutdown_executors
+        shutdown_executors()
+        await socket_service.stop()
     except Exception as e:
         logger.error(f"Error en shutdown: {e}")
     logger.info("👋 Shutdown completo.")
@@ -149,11 +207,16 @@ backtest_service = BacktestService(exchange_adapter=ccxt_adapter)
 from api.src.adapters.driven.notifications.socket_service import socket_service
 execution_engine = ExecutionEngine(db, socket_service=socket_service, exchange_adapter=ccxt_adapter)
 
+# Sharding de bots: cada worker ejecuta los streams (exchange, símbolo) que le asigna el anillo
+from api.src.application.services.bot_sharding import ShardCoordinator
+bot_shard = ShardCoordinator() if Config.BOT_SHARDING else None
+
 signal_bot_service = SignalBotService(
     cex_service=cex_service, 
     dex_service=dex_service,
     stream_service=market_stream_service,
-    engine=execution_engine
+    engine=execution_engine,
+    shard=bot_shard
 )
 
 # --- ROUTERS ---
@@ -268,12 +331,18 @@ else:
 # --- BLOQUE DE EJECUCIÓN (SOLUCIONA EL CIERRE PREMATURO) ---
 if __name__ == "__main__":
     import uvicorn
-    logger.info("🚀 Iniciando servidor Uvicorn...")
+    workers = Config.API_WORKERS
+    from api.src.adapters.driven.notifications.event_bus import unix_bus_available
+    if workers > 1 and (Config.SOCKET_EVENT_BUS.lower() == "local" or not unix_bus_available()):
+        # Sin bus entre procesos los eventos de un worker no llegarían a los sockets de otro
+        logger.warning("⚠️ API_WORKERS > 1 requiere SOCKET_EVENT_BUS=unix (sockets Unix); arrancando con 1 worker")
+        workers = 1
+    logger.info(f"🚀 Iniciando servidor Uvicorn ({workers} workers)...")
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=8000,
         reload=False,
-        workers=1,
+        workers=workers,
         log_level="info"
     )
\ No newline at end of file
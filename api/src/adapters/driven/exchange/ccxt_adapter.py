@@ -4,6 +4,7 @@ import ccxt.pro as ccxtpro
 from typing import Dict, Any, Optional, AsyncGenerator, List
 import pandas as pd
 from datetime import datetime
+from api.config import Config
 
 logger = logging.getLogger("CCXTAdapter")
 
@@ -12,6 +13,10 @@ class CcxtAdapter:
     Adaptador para CCXT Pro.
     Centraliza conexiones WebSocket (watch) y peticiones REST (fetch/execute).
     """
+    # Máximo de velas por llamada a fetch_ohlcv según exchange (el resto se pagina)
+    OHLCV_PAGE_LIMITS = {'binance': 1000, 'okx': 300, 'bybit': 1000, 'kucoin': 1500, 'bitget': 1000, 'gateio': 1000, 'mexc': 1000}
+    DEFAULT_OHLCV_PAGE_LIMIT = 500
+
     def __init__(self, **kwargs):
         self.exchanges: Dict[str, ccxtpro.Exchange] = {}
         self._locks: Dict[str, asyncio.Lock] = {}
@@ -121,14 +126,14 @@ class CcxtAdapter:
             logger.error(f"Error executing trade on {exchange_id}: {e}")
             return {"success": False, "message": str(e)}
 
-    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 100, user_id: str = None, exchange_id: str = 'binance', use_random_date: bool = False, **kwargs) -> pd.DataFrame:
+    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 100, user_id: str = None, exchange_id: str = 'binance', use_random_date: bool = False, since: Optional[int] = None, **kwargs) -> pd.DataFrame:
         """
         Obtiene datos históricos (velas).
-        Si use_random_date = True, busca un punto aleatorio en el tiempo (para entrenamiento ML).
+        since (ms) fija el inicio de la ventana; si use_random_date = True, busca un punto
+        aleatorio en el tiempo (para entrenamiento ML).
         """
         exchange = await self._get_exchange(exchange_id, user_id)
         
-        since = None
         if use_random_date:
             import random
             from datetime import timedelta
@@ -138,18 +143,65 @@ class CcxtAdapter:
             since = int(start_date.timestamp() * 1000)
 
         try:
+            page_limit = self.OHLCV_PAGE_LIMITS.get(exchange_id.lower(), self.DEFAULT_OHLCV_PAGE_LIMIT)
+            if limit > page_limit:
+                # Ventana más grande que una página: paginar en vez de truncar en silencio
+                tf_ms = exchange.parse_timeframe(timeframe) * 1000
+                if since is None:
+                    since = (exchange.milliseconds() // tf_ms - limit + 1) * tf_ms
+                return await self.fetch_ohlcv_range(symbol, timeframe, since, since + limit * tf_ms, user_id=user_id, exchange_id=exchange_id)
+
             ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit, since=since)
-            if not ohlcv:
-                return pd.DataFrame()
-                
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            return df
+            return self._ohlcv_to_df(ohlcv)
         except Exception as e:
             logger.error(f"Error fetching historical data for {symbol}: {e}")
             return pd.DataFrame()
 
+    async def fetch_ohlcv_range(self, symbol: str, timeframe: str, since: int, until: Optional[int] = None, user_id: str = None, exchange_id: str = 'binance', max_in_flight: Optional[int] = None) -> pd.DataFrame:
+        """
+        Historial completo [since, until) en páginas del tamaño del exchange.
+        Las páginas se piden en paralelo (max_in_flight a la vez, con el rate limit de CCXT
+        repartiendo las llamadas); una página que el exchange devuelve incompleta se continúa
+        desde su última vela. Las velas repetidas en los bordes se eliminan.
+        """
+        exchange = await self._get_exchange(exchange_id, user_id)
+        tf_ms = exchange.parse_timeframe(timeframe) * 1000
+        until = until or exchange.milliseconds()
+        page_limit = self.OHLCV_PAGE_LIMITS.get(exchange_id.lower(), self.DEFAULT_OHLCV_PAGE_LIMIT)
+        semaphore = asyncio.Semaphore(max_in_flight or Config.OHLCV_FETCH_CONCURRENCY)
+
+        async def fetch_page(start: int, end: int) -> List[list]:
+            rows = []
+            cursor = start
+            while cursor < end:
+                count = min(page_limit, -(-(end - cursor) // tf_ms))
+                async with semaphore:
+                    batch = await exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=count)
+                batch = [c for c in batch or [] if cursor <= c[0] < end]
+                if not batch:
+                    break
+                rows.extend(batch)
+                cursor = batch[-1][0] + tf_ms
+            return rows
+
+        span = page_limit * tf_ms
+        pages = await asyncio.gather(*(fetch_page(start, min(start + span, until)) for start in range(since, until, span)))
+
+        # De-duplicar bordes: la última versión de cada vela gana
+        candles = {c[0]: c for page in pages for c in page}
+        logger.info(f"📚 {symbol} {timeframe}: {len(candles)} velas en {len(pages)} páginas ({exchange_id})")
+        return self._ohlcv_to_df([candles[ts] for ts in sorted(candles)])
+
+    @staticmethod
+    def _ohlcv_to_df(ohlcv: List[list]) -> pd.DataFrame:
+        if not ohlcv:
+            return pd.DataFrame()
+            
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        return df
+
     async def get_public_current_price(self, symbol: str, exchange_id: str = 'binance') -> float:
         """Obtiene el precio actual rápido vía REST."""
         exchange = await self._get_exchange(exchange_id)
@@ -37,6 +37,13 @@ class MarketStreamService:
         )
         logger.info(f"🕯️ Suscripción Velas activada: {task_key}")
 
+    async def unsubscribe(self, exchange_id: str, symbol: str):
+        """Cancela el ticker y todas las velas de un par (p.ej. al pasar su shard a otro worker)."""
+        prefixes = (f"ticker:{exchange_id}:{symbol}", f"ohlcv:{exchange_id}:{symbol}:")
+        for task_key in [k for k in self.active_tasks if k == prefixes[0] or k.startswith(prefixes[1])]:
+            self.active_tasks.pop(task_key).cancel()
+            logger.info(f"🔕 Suscripción cancelada: {task_key}")
+
     async def _ticker_loop(self, exchange_id: str, symbol: str):
         async for ticker in ccxt_service.watch_ticker(exchange_id, symbol):
             await self._notify("ticker_update", {
@@ -0,0 +1,233 @@
+"""
+Bus de eventos detrás de SocketService.
+
+Cada proceso de la API solo tiene los WebSockets que se conectaron a él, así que un evento
+generado en un worker (un trade de un bot, un log de Telegram...) tiene que llegar al resto
+para que cada uno lo entregue a sus propias conexiones. SocketService publica cada emit en
+el bus y entrega lo que recibe de él:
+
+- LocalEventBus: un único proceso; publicar es llamar directamente al handler.
+- UnixSocketEventBus: varios workers en la misma máquina. El worker que obtiene el lock del
+  socket hace de hub (escucha en el socket Unix y reenvía cada mensaje al resto); los demás
+  se conectan a él. Si el hub muere, el kernel libera su lock, otro worker lo toma y los
+  demás reconectan. Los eventos publicados durante ese intervalo (~RETRY_SECONDS) solo se
+  entregan en su propio proceso; los clientes recuperan el estado al reconectar.
+  Requiere sockets Unix; donde no los hay (Windows) create_event_bus usa el bus local.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import socket
+from typing import Any, Callable, Dict, Optional, Set
+from api.config import Config
+from api.src.infrastructure.concurrency.file_lock import try_lock_file
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+def unix_bus_available() -> bool:
+    """Sockets Unix disponibles para UnixSocketEventBus (no en Windows)."""
+    return hasattr(socket, "AF_UNIX") and hasattr(asyncio, "start_unix_server")
+
+
+class EventBus:
+    """Interfaz: publish() entrega el mensaje al handler de todos los procesos, incluido este."""
+
+    distributed = False
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    def bind(self, handler: Handler):
+        self._handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, message: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class LocalEventBus(EventBus):
+    """Un solo proceso: sin serialización ni saltos extra."""
+
+    def publish(self, message: Dict[str, Any]):
+        self._handler(message)
+
+
+class UnixSocketEventBus(EventBus):
+    """
+    Bus entre procesos de la misma máquina sobre un socket Unix (JSON por líneas).
+
+    publish() no espera a la red: entrega en local y escribe la trama en el socket del hub
+    (o, si este proceso es el hub, en el de cada peer). Un peer que no lee y acumula más de
+    MAX_BUFFER bytes pendientes se desconecta; al reconectar sigue recibiendo.
+    """
+
+    distributed = True
+    RETRY_SECONDS = 0.5
+    READ_LIMIT = 64 * 1024 * 1024
+    MAX_BUFFER = 64 * 1024 * 1024
+
+    def __init__(self, path: str = None):
+        super().__init__()
+        self.path = path or Config.SOCKET_BUS_PATH
+        self.lock_path = self.path + ".lock"
+        self.is_hub = False
+        self.dropped = 0
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._upstream: Optional[asyncio.StreamWriter] = None
+        self._joined: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def connected(self) -> bool:
+        return self.is_hub or self._upstream is not None
+
+    async def start(self, timeout: float = 5.0):
+        """Se une al bus (como hub o como peer) y mantiene la conexión en segundo plano."""
+        self._closing = False
+        self._joined = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._joined.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Event bus {self.path}: no se pudo conectar en {timeout}s, se reintenta en segundo plano")
+
+    async def stop(self):
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for writer in list(self._peers):
+            writer.close()
+        self._peers.clear()
+        if self._upstream is not None:
+            self._upstream.close()
+            self._upstream = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self.is_hub:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+            self.is_hub = False
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def publish(self, message: Dict[str, Any]):
+        self._handler(message)
+        frame = (json.dumps(message, separators=(",", ":"), default=str) + "\n").encode()
+        if self.is_hub:
+            self._send_to_peers(frame)
+        elif self._upstream is not None:
+            self._write(self._upstream, frame)
+        else:
+            self.dropped += 1
+
+    # --- CONEXIÓN ---
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                if self._lock_fd is None:
+                    self._lock_fd = try_lock_file(self.lock_path)
+                if self._lock_fd is not None:
+                    await self._serve()
+                else:
+                    await self._follow()
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass  # el hub todavía no escucha (p.ej. está tomando el relevo)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event bus {self.path}: {e}")
+            await asyncio.sleep(self.RETRY_SECONDS)
+
+    async def _serve(self):
+        # Con el lock en la mano, un socket existente es de un hub que ya no está
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._on_peer, path=self.path, limit=self.READ_LIMIT)
+        self.is_hub = True
+        self._joined.set()
+        logger.info(f"Event bus: este proceso (pid {os.getpid()}) es el hub en {self.path}")
+        await self._server.serve_forever()
+
+    async def _follow(self):
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=self.READ_LIMIT)
+        self._upstream = writer
+        self._joined.set()
+        try:
+            while True:
+                frame = await reader.readline()
+                if not frame:
+                    break
+                self._receive(frame)
+        finally:
+            self._upstream = None
+            writer.close()
+        if not self._closing:
+            logger.warning(f"Event bus: conexión con el hub perdida, reconectando ({self.path})")
+
+    async def _on_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            while True:
+                frame = await reader.readline()
+                if not frame:
+                    break
+                self._receive(frame)
+                self._send_to_peers(frame, exclude=writer)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Event bus: peer desconectado: {e}")
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    def _receive(self, frame: bytes):
+        try:
+            self._handler(json.loads(frame))
+        except Exception as e:
+            logger.error(f"Event bus: error entregando evento: {e}")
+
+    def _send_to_peers(self, frame: bytes, exclude: asyncio.StreamWriter = None):
+        for writer in list(self._peers):
+            if writer is not exclude:
+                self._write(writer, frame)
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.MAX_BUFFER:
+            logger.warning("Event bus: peer atascado, se desconecta")
+            self._peers.discard(writer)
+            writer.close()
+            return
+        writer.write(frame)
+
+
+def create_event_bus(kind: str = None, path: str = None) -> EventBus:
+    """Bus según SOCKET_EVENT_BUS: "local" (un worker) o "unix" (varios workers en la máquina)."""
+    kind = (kind or Config.SOCKET_EVENT_BUS).lower()
+    if kind == "unix":
+        if unix_bus_available():
+            return UnixSocketEventBus(path)
+        logger.warning("SOCKET_EVENT_BUS=unix no está disponible en esta plataforma, usando 'local'")
+        return LocalEventBus()
+    if kind != "local":
+        logger.warning(f"SOCKET_EVENT_BUS desconocido '{kind}', usando 'local'")
+    return LocalEventBus()
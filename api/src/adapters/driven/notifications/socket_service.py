@@ -1,53 +1,437 @@
+import asyncio
 import json
 import logging
-from typing import Dict, List, Any
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Any, Optional, Set, Tuple
 from fastapi import WebSocket
+from api.config import Config
+from api.src.adapters.driven.notifications.event_bus import EventBus, create_event_bus
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 logger = logging.getLogger(__name__)
 
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+def candle_topic(exchange_id: str, symbol: str, timeframe: str) -> str:
+    """Topic de las velas de un stream, p.ej. "candles:okx:BTC/USDT:1h"."""
+    return f"candles:{exchange_id.lower()}:{symbol}:{timeframe}"
+
+
+def bot_topic(bot_id: str) -> str:
+    """Topic del estado en vivo de un bot (PnL, precio), p.ej. "bot:65f0..."."""
+    return f"bot:{bot_id}"
+
+
+class _CoalesceSlot:
+    """Último estado pendiente de un (topic, evento) y cuándo se envió por última vez."""
+
+    __slots__ = ("topic", "event", "data", "key", "owners", "private", "pending", "last_sent", "timer")
+
+    def __init__(self, topic: str, event: str):
+        self.topic = topic
+        self.event = event
+        self.data = None
+        self.key = None
+        self.owners: Set[str] = set()
+        self.private = False
+        self.pending = False
+        self.last_sent = float("-inf")
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class Envelope:
+    """
+    Un evento ({"event", "data"}) serializado como mucho una vez por codificación.
+
+    El mismo envelope se encola en todas las conexiones destinatarias: el JSON (o el
+    MessagePack) se genera la primera vez que una conexión lo necesita y el resto
+    reutiliza los mismos bytes, así que el coste por evento no depende del número de usuarios.
+    """
+
+    __slots__ = ("event", "data", "_text", "_binary")
+
+    def __init__(self, event: Optional[str], data: Any = None, text: str = None):
+        self.event = event
+        self.data = data
+        self._text = text
+        self._binary = None
+
+    @classmethod
+    def raw(cls, text: str) -> "Envelope":
+        """Mensaje de texto ya formado (p.ej. "pong")."""
+        return cls(None, text=text)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps({"event": self.event, "data": self.data}, default=str)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = msgpack.packb({"event": self.event, "data": self.data}, default=str, use_bin_type=True)
+        return self._binary
+
+
+class ClientConnection:
+    """
+    Conexión WebSocket con su propia cola de salida acotada y una tarea escritora.
+
+    Los emits solo encolan (no esperan a la red), así que un navegador lento no retrasa
+    al resto de clientes. Con la cola llena se descarta el mensaje más antiguo de tipo
+    "tick" (eventos droppable); los demás (trades, señales, balances...) nunca se descartan:
+    si aun así la cola crece por encima de STALL_FACTOR veces su tamaño, o un envío tarda
+    más de send_timeout, la conexión se da por atascada y se cierra (el cliente reconecta
+    y recupera el estado).
+    """
+
+    STALL_FACTOR = 4
+
+    def __init__(self, websocket: WebSocket, user_id: str, max_queue: int = None, send_timeout: float = None,
+                 on_close: Callable[["ClientConnection", str], None] = None, binary_events: Iterable[str] = ()):
+        self.websocket = websocket
+        self.user_id = user_id
+        # Eventos que esta conexión recibe en MessagePack (vacío = todo en JSON)
+        self.binary_events = frozenset(binary_events)
+        # Topics suscritos; None = cliente sin protocolo de suscripción (recibe todo lo de su usuario)
+        self.subscriptions: Optional[Set[str]] = None
+        self.max_queue = max_queue or Config.SOCKET_QUEUE_SIZE
+        self.send_timeout = send_timeout or Config.SOCKET_SEND_TIMEOUT
+        self.on_close = on_close
+        self.dropped = 0
+        self.closed = False
+        # (droppable, envelope)
+        self._queue: Deque[Tuple[bool, Envelope]] = deque()
+        self._droppable = 0
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: Envelope, droppable: bool = False) -> bool:
+        """Encola un mensaje aplicando la política de desbordamiento. Devuelve False si se descarta."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            if self._droppable:
+                self._drop_oldest_droppable()
+            elif droppable:
+                self.dropped += 1
+                return False
+            elif len(self._queue) >= self.max_queue * self.STALL_FACTOR:
+                self._fail("send queue stalled")
+                return False
+        self._queue.append((droppable, message))
+        self._droppable += droppable
+        self._ready.set()
+        return True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def _drop_oldest_droppable(self):
+        for i, (droppable, _) in enumerate(self._queue):
+            if droppable:
+                del self._queue[i]
+                self._droppable -= 1
+                self.dropped += 1
+                return
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                droppable, message = self._queue.popleft()
+                self._droppable -= droppable
+                if message.event in self.binary_events:
+                    send = self.websocket.send_bytes(message.binary)
+                else:
+                    send = self.websocket.send_text(message.text)
+                await asyncio.wait_for(send, self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._fail(f"send timed out after {self.send_timeout}s")
+        except Exception as e:
+            self._fail(str(e))
+
+    def _fail(self, reason: str):
+        if not self.closed and self.on_close:
+            self.on_close(self, reason)
+        self.close()
+
+
 class SocketService:
-    def __init__(self):
-        # user_id -> list of active WebSocket connections
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    """
+    Conexiones WebSocket por usuario.
+
+    emit_to_user/broadcast entregan eventos puntuales. Los streams de estado (velas, PnL
+    de bots) van por publish(): cada conexión que se suscribe a topics ({"action":
+    "subscribe", "topics": [...]}) solo recibe esos topics, y cada (topic, evento) se
+    coalesce para enviar como mucho el último estado cada SOCKET_COALESCE_MS.
+    Los clientes que nunca se suscriben reciben, coalescido, todo lo de sus bots.
+
+    Todo lo que se emite pasa por el bus de eventos (event_bus): con varios workers cada
+    proceso recibe los eventos de los demás y los entrega a sus propias conexiones. La
+    coalescencia se hace antes del bus, en el proceso que publica.
+    """
+
+    # Cada cuánto anuncia un proceso sus usuarios conectados al resto (bus distribuido)
+    PRESENCE_INTERVAL = 10.0
+
+    def __init__(self, max_queue: int = None, send_timeout: float = None, drop_oldest_events: Iterable[str] = None,
+                 binary_events: Iterable[str] = None, coalesce_ms: float = None, bus: EventBus = None):
+        # user_id -> list of active connections (each one with its own send queue)
+        self.active_connections: Dict[str, List[ClientConnection]] = {}
+        self.max_queue = max_queue or Config.SOCKET_QUEUE_SIZE
+        self.send_timeout = send_timeout or Config.SOCKET_SEND_TIMEOUT
+        self.drop_oldest_events = set(Config.SOCKET_DROP_OLDEST_EVENTS if drop_oldest_events is None else drop_oldest_events)
+        self.binary_events = frozenset(Config.SOCKET_BINARY_EVENTS if binary_events is None else binary_events)
+        self.coalesce_interval = (Config.SOCKET_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        # topic -> conexiones suscritas
+        self._subscribers: Dict[str, Set[ClientConnection]] = {}
+        self._slots: Dict[Tuple[str, str], _CoalesceSlot] = {}
+        self.node_id = uuid.uuid4().hex[:12]
+        # node_id -> (expira, usuarios conectados a ese proceso)
+        self._remote_users: Dict[str, Tuple[float, Set[str]]] = {}
+        self._presence_task: Optional[asyncio.Task] = None
+        self.bus = bus or create_event_bus()
+        self.bus.bind(self._dispatch)
+
+    async def start(self):
+        """Se une al bus de eventos (no-op con el bus local)."""
+        await self.bus.start()
+        if self.bus.distributed and self._presence_task is None:
+            self._presence_task = asyncio.create_task(self._presence_loop())
+
+    async def stop(self):
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+            self._presence_task = None
+        await self.bus.stop()
+
+    def connected_users(self) -> Set[str]:
+        """Usuarios con algún WebSocket abierto en cualquier worker."""
+        now = time.monotonic()
+        users = set(self.active_connections)
+        for expires, remote in self._remote_users.values():
+            if expires > now:
+                users.update(remote)
+        return users
 
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, encoding: str = JSON):
         await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-        
-        self.active_connections[user_id].append(websocket)
+        connection = ClientConnection(websocket, user_id, self.max_queue, self.send_timeout, on_close=self._on_connection_failed)
+        connection.start()
+        self.active_connections.setdefault(user_id, []).append(connection)
         logger.info(f"Client connected to WebSocket: {user_id}. Total connections for user: {len(self.active_connections[user_id])}")
+        if encoding != JSON:
+            self.set_encoding(websocket, user_id, encoding)
+
+    def set_encoding(self, websocket: WebSocket, user_id: str, encoding: str) -> str:
+        """
+        Negocia la codificación de la conexión: "msgpack" envía los eventos de alta frecuencia
+        (SOCKET_BINARY_EVENTS) como frames binarios MessagePack; el resto sigue en JSON.
+        Si msgpack no está instalado se mantiene JSON. Confirma con un evento "encoding".
+        """
+        connection = self._find(websocket, user_id)
+        if connection is None:
+            return JSON
+        if encoding == MSGPACK and msgpack is None:
+            logger.warning("msgpack no está instalado: la conexión sigue en JSON")
+        accepted = MSGPACK if encoding == MSGPACK and msgpack is not None else JSON
+        connection.binary_events = self.binary_events if accepted == MSGPACK else frozenset()
+        connection.enqueue(Envelope("encoding", {"encoding": accepted, "binary_events": sorted(connection.binary_events)}))
+        return accepted
 
     def disconnect(self, websocket: WebSocket, user_id: str):
-        if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-                if not self.active_connections[user_id]:
-                    del self.active_connections[user_id]
-                logger.info(f"Client disconnected from WebSocket: {user_id}")
+        connection = self._find(websocket, user_id)
+        if connection is not None:
+            self._remove(connection)
+            logger.info(f"Client disconnected from WebSocket: {user_id}")
 
     async def emit_to_user(self, user_id: str, event: str, data: Any):
-        """Envía un evento a todas las conexiones activas del usuario"""
-        websockets = self.active_connections.get(user_id, [])
-        if not websockets:
+        """Encola un evento en todas las conexiones activas del usuario (no espera a la red)"""
+        self.bus.publish({"op": "emit", "user_id": user_id, "event": event, "data": data})
+
+    async def broadcast(self, event: str, data: Any):
+        """Envía un evento a todos los usuarios conectados (un único envelope para todos)"""
+        self.bus.publish({"op": "broadcast", "event": event, "data": data})
+
+    def _dispatch(self, message: Dict[str, Any]):
+        """Entrega en este proceso un mensaje del bus (propio o de otro worker)."""
+        op = message["op"]
+        if op == "emit":
+            connections = self.active_connections.get(message["user_id"])
+            if connections:
+                self._enqueue(connections, Envelope(message["event"], message["data"]))
+        elif op == "broadcast":
+            envelope = Envelope(message["event"], message["data"])
+            for connections in list(self.active_connections.values()):
+                self._enqueue(connections, envelope)
+        elif op == "topic":
+            self._deliver(message["topic"], message["event"], message["data"], set(message["owners"]), message["private"])
+        elif op == "presence" and message["node"] != self.node_id:
+            self._remote_users[message["node"]] = (time.monotonic() + 3 * self.PRESENCE_INTERVAL, set(message["users"]))
+
+    async def _presence_loop(self):
+        while True:
+            self.bus.publish({"op": "presence", "node": self.node_id, "users": list(self.active_connections)})
+            now = time.monotonic()
+            self._remote_users = {node: entry for node, entry in self._remote_users.items() if entry[0] > now}
+            await asyncio.sleep(self.PRESENCE_INTERVAL)
+
+    # --- TOPICS ---
+
+    def subscribe(self, websocket: WebSocket, user_id: str, topics: Iterable[str]) -> List[str]:
+        connection = self._find(websocket, user_id)
+        if connection is None:
+            return []
+        if connection.subscriptions is None:
+            connection.subscriptions = set()
+        for topic in topics:
+            connection.subscriptions.add(topic)
+            self._subscribers.setdefault(topic, set()).add(connection)
+        return self._ack_subscriptions(connection)
+
+    def unsubscribe(self, websocket: WebSocket, user_id: str, topics: Iterable[str]) -> List[str]:
+        connection = self._find(websocket, user_id)
+        if connection is None:
+            return []
+        if connection.subscriptions is None:
+            connection.subscriptions = set()
+        for topic in topics:
+            connection.subscriptions.discard(topic)
+            self._discard_subscriber(topic, connection)
+        return self._ack_subscriptions(connection)
+
+    async def publish(self, topic: str, event: str, data: Any, owners: Iterable[str] = (), private: bool = False, key: Any = None):
+        """
+        Publica el estado de un topic. Lo reciben las conexiones suscritas al topic (si es
+        private, solo las de sus owners) y las de los owners que no usan suscripciones.
+
+        Dentro de cada intervalo de coalescencia se conserva solo el último estado (los dicts
+        se fusionan campo a campo). Si cambia `key` (p.ej. el timestamp de la vela), el estado
+        pendiente anterior se envía antes para no perder su valor final.
+        """
+        if self.coalesce_interval <= 0:
+            self._publish_topic(topic, event, data, owners, private)
             return
 
-        message = json.dumps({
-            "event": event,
-            "data": data
-        }, default=str)
+        slot = self._slots.get((topic, event))
+        if slot is None:
+            slot = self._slots[(topic, event)] = _CoalesceSlot(topic, event)
+        elif slot.pending and slot.key != key:
+            self._flush(slot)
 
-        # Iterate over a copy to avoid issues during modification
-        for ws in list(websockets):
-            try:
-                await ws.send_text(message)
-            except Exception as e:
-                logger.error(f"Error emitting to user {user_id} on a specific socket: {e}")
-                self.disconnect(ws, user_id)
+        if slot.pending and isinstance(slot.data, dict) and isinstance(data, dict):
+            slot.data = {**slot.data, **data}
+        else:
+            slot.data = data
+        slot.key = key
+        slot.owners.update(owners)
+        slot.private = private
+        slot.pending = True
 
-    async def broadcast(self, event: str, data: Any):
-        """Envía un evento a todos los usuarios conectados"""
-        for user_id in list(self.active_connections.keys()):
-            await self.emit_to_user(user_id, event, data)
+        loop = asyncio.get_running_loop()
+        wait = slot.last_sent + self.coalesce_interval - loop.time()
+        if wait <= 0:
+            self._flush(slot)
+        elif slot.timer is None:
+            slot.timer = loop.call_later(wait, self._flush, slot)
+
+    def _flush(self, slot: _CoalesceSlot):
+        if slot.timer is not None:
+            slot.timer.cancel()
+            slot.timer = None
+        if not slot.pending:
+            return
+        self._publish_topic(slot.topic, slot.event, slot.data, slot.owners, slot.private)
+        slot.data, slot.owners, slot.pending = None, set(), False
+        slot.last_sent = asyncio.get_running_loop().time()
+
+    def _publish_topic(self, topic: str, event: str, data: Any, owners: Iterable[str], private: bool):
+        self.bus.publish({"op": "topic", "topic": topic, "event": event, "data": data,
+                          "owners": list(owners), "private": private})
+
+    def _deliver(self, topic: str, event: str, data: Any, owners: Set[str], private: bool):
+        targets = {c for c in self._subscribers.get(topic, ()) if not private or c.user_id in owners}
+        for user_id in owners:
+            targets.update(c for c in self.active_connections.get(user_id, ()) if c.subscriptions is None)
+        if targets:
+            self._enqueue(targets, Envelope(event, data))
+
+    def _ack_subscriptions(self, connection: ClientConnection) -> List[str]:
+        topics = sorted(connection.subscriptions)
+        connection.enqueue(Envelope("subscriptions", {"topics": topics}))
+        return topics
+
+    def _discard_subscriber(self, topic: str, connection: ClientConnection):
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def _enqueue(self, connections: Iterable[ClientConnection], envelope: Envelope):
+        droppable = envelope.event in self.drop_oldest_events
+        for connection in list(connections):
+            connection.enqueue(envelope, droppable)
+
+    def send_text(self, websocket: WebSocket, user_id: str, text: str):
+        """Respuesta directa a una conexión (p.ej. "pong") a través de su cola, sin competir con su escritor"""
+        connection = self._find(websocket, user_id)
+        if connection is not None:
+            connection.enqueue(Envelope.raw(text))
+
+    def _find(self, websocket: WebSocket, user_id: str) -> Optional[ClientConnection]:
+        for connection in self.active_connections.get(user_id, []):
+            if connection.websocket is websocket:
+                return connection
+        return None
+
+    def _remove(self, connection: ClientConnection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections and connection in connections:
+            connections.remove(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+        for topic in connection.subscriptions or ():
+            self._discard_subscriber(topic, connection)
+        connection.close()
+
+    def _on_connection_failed(self, connection: ClientConnection, reason: str):
+        logger.warning(f"Closing slow/broken WebSocket of user {connection.user_id}: {reason} ({connection.dropped} ticks dropped)")
+        self._remove(connection)
+        asyncio.create_task(self._close_socket(connection.websocket))
+
+    async def _close_socket(self, websocket: WebSocket):
+        # 1013 = Try Again Later: el cliente reconecta y vuelve a pedir el estado
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
 
 socket_service = SocketService()
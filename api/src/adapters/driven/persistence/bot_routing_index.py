@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from api.config import Config
+
+logger = logging.getLogger("BotRoutingIndex")
+
+OPEN_TRADE_STATUSES = ("active", "open")
+
+
+def bot_exchange(bot: Dict[str, Any]) -> str:
+    return (bot.get("exchangeId") or bot.get("exchange_id") or "binance").lower()
+
+
+def trade_exchange(trade: Dict[str, Any]) -> str:
+    return (trade.get("exchangeId") or "binance").lower()
+
+
+class BotRoutingIndex:
+    """
+    Índice en memoria de bots activos y trades abiertos para el hot path de mercado.
+
+    - (exchange, symbol, timeframe) -> bots activos (eventos candle_update)
+    - (exchange, symbol) -> trades abiertos (eventos ticker_update)
+    - userId -> openId de los dueños de esos trades
+
+    Se carga al arrancar y se mantiene al día con los CRUD de bots/trades y, si Mongo
+    corre como replica set, con change streams; sin change streams se recarga
+    periódicamente (BOT_INDEX_REFRESH_SECONDS). Las consultas son O(1) y no tocan la DB.
+    """
+
+    def __init__(self, db_adapter=None, refresh_interval: float = None):
+        self._db = db_adapter
+        self.refresh_interval = refresh_interval if refresh_interval is not None else Config.BOT_INDEX_REFRESH_SECONDS
+        self._bots: Dict[Any, Dict[str, Any]] = {}
+        self._bot_routes: Dict[Tuple[str, str, Any], Dict[Any, Dict[str, Any]]] = {}
+        self._trades: Dict[Any, Dict[str, Any]] = {}
+        self._trade_routes: Dict[Tuple[str, str], Dict[Any, Dict[str, Any]]] = {}
+        self._user_open_ids: Dict[Any, str] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._polling = False
+
+    @property
+    def db(self):
+        if self._db is None:
+            from api.src.adapters.driven.persistence.mongodb import db as db_global
+            self._db = db_global
+        return self._db
+
+    # --- CONSULTAS (HOT PATH) ---
+
+    def bots_for(self, exchange_id: str, symbol: str, timeframe: str) -> List[Dict[str, Any]]:
+        return list(self._bot_routes.get((exchange_id, symbol, timeframe), {}).values())
+
+    def trades_for(self, exchange_id: str, symbol: str) -> List[Dict[str, Any]]:
+        return list(self._trade_routes.get((exchange_id, symbol), {}).values())
+
+    def active_bots(self) -> List[Dict[str, Any]]:
+        return [b for b in self._bots.values() if b.get("status") == "active"]
+
+    def open_trades(self) -> List[Dict[str, Any]]:
+        return [t for t in self._trades.values() if t.get("status") in OPEN_TRADE_STATUSES]
+
+    def user_open_id(self, user_id: Any) -> Optional[str]:
+        return self._user_open_ids.get(user_id)
+
+    # --- CARGA / SINCRONIZACIÓN ---
+
+    async def start(self):
+        await self.load()
+        self._tasks = [
+            asyncio.create_task(self._follow("bot_instances", self._on_bot_change)),
+            asyncio.create_task(self._follow("trades", self._on_trade_change)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._polling = False
+
+    async def load(self):
+        """Recarga completa desde Mongo (arranque y fallback sin change streams)."""
+        bots = await self.db.bot_instances.find({"status": "active"}).to_list(length=None)
+        trades = await self.db.trades.find({"status": {"$in": list(OPEN_TRADE_STATUSES)}}).to_list(length=None)
+
+        self._bots, self._bot_routes = {}, {}
+        self._trades, self._trade_routes = {}, {}
+        for bot in bots:
+            self.upsert_bot(bot)
+        for trade in trades:
+            self.upsert_trade(trade)
+        await self._resolve_users([t.get("userId") for t in trades])
+        logger.info(f"Índice de routing cargado: {len(self._bots)} bots activos, {len(self._trades)} trades abiertos")
+
+    async def _follow(self, collection: str, handler):
+        """Change stream de la colección; si Mongo no lo soporta, recarga periódica."""
+        try:
+            async with self.db[collection].watch(full_document="updateLookup") as stream:
+                async for change in stream:
+                    await handler(change)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.info(f"Change streams no disponibles para {collection} ({e}); recarga cada {self.refresh_interval}s")
+            if not self._polling:
+                self._polling = True
+                while True:
+                    await asyncio.sleep(self.refresh_interval)
+                    try:
+                        await self.load()
+                    except PyMongoError as load_error:
+                        logger.error(f"Error recargando índice de routing: {load_error}")
+
+    async def _on_bot_change(self, change: Dict[str, Any]):
+        if change.get("operationType") == "delete":
+            self.remove_bot(change["documentKey"]["_id"])
+        elif change.get("fullDocument"):
+            self.upsert_bot(change["fullDocument"])
+
+    async def _on_trade_change(self, change: Dict[str, Any]):
+        if change.get("operationType") == "delete":
+            self.remove_trade(change["documentKey"]["_id"])
+        elif change.get("fullDocument"):
+            await self.add_trade(change["fullDocument"])
+
+    async def _resolve_users(self, user_ids: List[Any]):
+        missing = list({u for u in user_ids if u is not None and u not in self._user_open_ids})
+        if not missing:
+            return
+        async for user in self.db.users.find({"_id": {"$in": missing}}, {"openId": 1}):
+            if user.get("openId"):
+                self._user_open_ids[user["_id"]] = user["openId"]
+
+    # --- MUTACIONES (CRUD) ---
+
+    def upsert_bot(self, bot: Dict[str, Any]):
+        bot_id = bot.get("_id")
+        self.remove_bot(bot_id)
+        if bot.get("status") != "active":
+            return
+        self._bots[bot_id] = bot
+        route = (bot_exchange(bot), bot.get("symbol"), bot.get("timeframe"))
+        self._bot_routes.setdefault(route, {})[bot_id] = bot
+
+    def patch_bot(self, bot_id: Any, fields: Dict[str, Any], inc: Dict[str, float] = None):
+        """Aplica un $set (y un $inc) ya persistido al bot indexado (sin volver a leerlo)."""
+        bot = self._bots.get(self._oid(bot_id))
+        if bot is not None:
+            updated = {**bot, **fields}
+            for field, delta in (inc or {}).items():
+                updated[field] = (updated.get(field) or 0) + delta
+            self.upsert_bot(updated)
+
+    def remove_bot(self, bot_id: Any):
+        bot = self._bots.pop(self._oid(bot_id), None)
+        if bot is not None:
+            route = (bot_exchange(bot), bot.get("symbol"), bot.get("timeframe"))
+            self._bot_routes.get(route, {}).pop(bot["_id"], None)
+
+    async def refresh_bot(self, bot_id: Any):
+        """Relee un bot tras un CRUD parcial (fuera del hot path)."""
+        bot = await self.db.bot_instances.find_one({"_id": self._oid(bot_id)})
+        if bot:
+            self.upsert_bot(bot)
+        else:
+            self.remove_bot(bot_id)
+
+    def upsert_trade(self, trade: Dict[str, Any]):
+        trade_id = trade.get("_id")
+        self.remove_trade(trade_id)
+        if trade.get("status") not in OPEN_TRADE_STATUSES:
+            return
+        self._trades[trade_id] = trade
+        self._trade_routes.setdefault((trade_exchange(trade), trade.get("symbol")), {})[trade_id] = trade
+
+    async def add_trade(self, trade: Dict[str, Any]):
+        """Indexa un trade y resuelve el openId de su usuario para las notificaciones."""
+        self.upsert_trade(trade)
+        await self._resolve_users([trade.get("userId")])
+
+    def remove_trade(self, trade_id: Any):
+        trade = self._trades.pop(self._oid(trade_id), None)
+        if trade is not None:
+            self._trade_routes.get((trade_exchange(trade), trade.get("symbol")), {}).pop(trade["_id"], None)
+
+    @staticmethod
+    def _oid(value: Any) -> Any:
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            return ObjectId(value)
+        return value
+
+
+# Instancia compartida
+bot_routing_index = BotRoutingIndex()
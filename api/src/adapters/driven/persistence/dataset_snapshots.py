@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from api.config import Config
+from api.src.adapters.driven.persistence.ohlcv_store import COLUMNS, FetchFn, OHLCVStore, candle_open, ohlcv_store, timeframe_to_ms
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger("DatasetSnapshots")
+
+PARQUET = "parquet"
+NPY = "npy"
+
+
+def contract_hash(contract: Dict[str, List[str]]) -> str:
+    """Hash estable del contrato de features {estrategia: [features]}."""
+    payload = json.dumps({k: list(v) for k, v in contract.items()}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def random_since(min_days: int = 30, max_days: int = 730) -> int:
+    """Punto aleatorio en los últimos 2 años (misma ventana que use_random_date del adaptador)."""
+    return int(time.time() * 1000) - random.randint(min_days, max_days) * 86_400_000
+
+
+class DatasetSnapshotStore:
+    """
+    Snapshots versionados de los datasets de entrenamiento (velas OHLCV por símbolo).
+
+    Cada dataset se identifica por (exchange, timeframe, símbolos) y guarda sus velas en
+    partes columnares inmutables: Parquet si pyarrow está instalado, si no archivos .npy
+    por columna (mismo formato que el almacén de velas). Cada versión es un manifest que
+    enumera las partes de cada símbolo, su rango [inicio, fin] y el hash del contrato de
+    features con el que se entrenó. Reentrenar reutiliza la última versión sin llamar al
+    exchange; con refresh solo se descargan las velas cerradas posteriores al final de
+    cada símbolo, que se añaden como una parte nueva en una versión nueva.
+    """
+
+    def __init__(self, base_dir: str = None, candle_store: OHLCVStore = None, data_format: str = None):
+        self.base_dir = base_dir or Config.DATASET_SNAPSHOT_DIR
+        self.candle_store = candle_store or ohlcv_store
+        self.data_format = data_format or (PARQUET if pq is not None else NPY)
+        if self.data_format == PARQUET and pq is None:
+            raise ValueError("Parquet snapshots require pyarrow")
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    # --- API PÚBLICA ---
+
+    async def materialize(
+        self,
+        exchange_id: str,
+        symbols: List[str],
+        timeframe: str,
+        fetch_for: Callable[[str], FetchFn],
+        features_hash: str,
+        market_type: str = "spot",
+        limit: int = 2000,
+        refresh: bool = False,
+        since_fn: Callable[[], int] = random_since,
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, pd.DataFrame]]:
+        """
+        Devuelve (manifest, {símbolo: DataFrame}) de la última versión del dataset.
+
+        Solo se piden velas para los símbolos que aún no están en el snapshot (ventana de
+        `limit` velas desde since_fn()) y, con refresh, para la cola posterior a su último
+        cierre. Si no hay velas nuevas ni cambió el contrato se reutiliza la versión actual.
+        """
+        path = self._dataset_dir(exchange_id, timeframe, symbols, market_type)
+        async with self._lock_for(path):
+            manifest = self.latest_manifest(exchange_id, timeframe, symbols, market_type)
+            entries = {s: dict(e) for s, e in (manifest or {}).get("symbols", {}).items()}
+            tf_ms = timeframe_to_ms(timeframe)
+            last_closed = candle_open(int(time.time() * 1000), timeframe) - tf_ms
+            changed = False
+
+            for symbol in symbols:
+                entry = entries.get(symbol)
+                try:
+                    if entry is None:
+                        since = since_fn()
+                        df = await self.candle_store.get_window(exchange_id, symbol, timeframe, since, limit, fetch_for(symbol))
+                    elif refresh and entry["end"] < last_closed:
+                        count = (last_closed - entry["end"]) // tf_ms
+                        df = await self.candle_store.get_window(exchange_id, symbol, timeframe, entry["end"] + tf_ms, count, fetch_for(symbol))
+                    else:
+                        continue
+                except Exception as e:
+                    logger.error(f"No se pudo obtener velas para {symbol}: {e}")
+                    continue
+
+                ts = OHLCVStore._to_ms(df.index)
+                keep = ts <= last_closed  # la vela en formación no entra en el snapshot
+                if entry is not None:
+                    keep &= ts > entry["end"]
+                df, ts = df[keep], ts[keep]
+                if df.empty:
+                    continue
+
+                part = self._write_part(path, symbol, df, ts)
+                if entry is None:
+                    entry = {"start": part["start"], "end": part["end"], "rows": 0, "parts": []}
+                entry["parts"] = entry["parts"] + [part]
+                entry["end"] = part["end"]
+                entry["rows"] += part["rows"]
+                entries[symbol] = entry
+                changed = True
+
+            if not entries:
+                return None, {}
+            if changed or manifest is None or manifest.get("contract_hash") != features_hash:
+                manifest = self._write_manifest(path, {
+                    "dataset_id": os.path.basename(path),
+                    "version": (manifest or {}).get("version", 0) + 1,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "exchange": exchange_id.lower(),
+                    "timeframe": timeframe,
+                    "market_type": market_type,
+                    "contract_hash": features_hash,
+                    "symbols": {s: entries[s] for s in symbols if s in entries},
+                })
+                logger.info(f"Snapshot {manifest['dataset_id']} v{manifest['version']} ({len(manifest['symbols'])} símbolos)")
+
+        return manifest, await asyncio.to_thread(self.read, manifest)
+
+    def latest_manifest(self, exchange_id: str, timeframe: str, symbols: List[str],
+                        market_type: str = "spot") -> Optional[Dict[str, Any]]:
+        versions = self.versions(exchange_id, timeframe, symbols, market_type)
+        if not versions:
+            return None
+        return self.load_manifest(exchange_id, timeframe, symbols, versions[-1], market_type)
+
+    def load_manifest(self, exchange_id: str, timeframe: str, symbols: List[str], version: int,
+                      market_type: str = "spot") -> Dict[str, Any]:
+        path = self._dataset_dir(exchange_id, timeframe, symbols, market_type)
+        with open(os.path.join(path, "manifests", f"v{version:04d}.json")) as f:
+            manifest = json.load(f)
+        manifest["path"] = path
+        return manifest
+
+    def versions(self, exchange_id: str, timeframe: str, symbols: List[str], market_type: str = "spot") -> List[int]:
+        manifests_dir = os.path.join(self._dataset_dir(exchange_id, timeframe, symbols, market_type), "manifests")
+        if not os.path.isdir(manifests_dir):
+            return []
+        return sorted(int(f[1:-5]) for f in os.listdir(manifests_dir) if re.fullmatch(r"v\d+\.json", f))
+
+    def read(self, manifest: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+        """Lee las velas de una versión (sin tocar el exchange)."""
+        data = {}
+        for symbol, entry in manifest["symbols"].items():
+            parts = [self._read_part(os.path.join(manifest["path"], "parts", p["file"])) for p in entry["parts"]]
+            columns = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+            index = pd.DatetimeIndex(pd.to_datetime(columns['timestamp'], unit='ms'), name='timestamp')
+            data[symbol] = pd.DataFrame({c: columns[c] for c in COLUMNS[1:]}, index=index)
+        return data
+
+    # --- I/O ---
+
+    def _dataset_dir(self, exchange_id: str, timeframe: str, symbols: List[str], market_type: str = "spot") -> str:
+        # Spot y futuros son datasets distintos (cada uno con sus versiones y su contrato)
+        key = market_type.lower() + "|" + "|".join(sorted(symbols))
+        dataset_id = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return os.path.join(self.base_dir, exchange_id.lower(), timeframe, dataset_id)
+
+    def _lock_for(self, path: str) -> asyncio.Lock:
+        if path not in self._locks:
+            self._locks[path] = asyncio.Lock()
+        return self._locks[path]
+
+    def _write_part(self, path: str, symbol: str, df: pd.DataFrame, ts: np.ndarray) -> Dict[str, Any]:
+        safe_symbol = re.sub(r'[^A-Za-z0-9_-]', '_', symbol)
+        start, end = int(ts[0]), int(ts[-1])
+        name = f"{safe_symbol}-{start}-{end}.{self.data_format}"
+        arrays = {'timestamp': np.ascontiguousarray(ts, dtype=np.int64)}
+        arrays.update({c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS[1:]})
+
+        parts_dir = os.path.join(path, "parts")
+        os.makedirs(parts_dir, exist_ok=True)
+        target = os.path.join(parts_dir, name)
+        tmp = f"{target}.tmp-{os.getpid()}"
+        if self.data_format == PARQUET:
+            pq.write_table(pa.table(arrays), tmp)
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            for column, values in arrays.items():
+                np.save(os.path.join(tmp, f"{column}.npy"), values, allow_pickle=False)
+            shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        return {"file": name, "rows": len(ts), "start": start, "end": end}
+
+    @staticmethod
+    def _read_part(part_path: str) -> Dict[str, np.ndarray]:
+        if part_path.endswith(f".{PARQUET}"):
+            if pq is None:
+                raise RuntimeError(f"pyarrow is required to read {part_path}")
+            table = pq.read_table(part_path, columns=COLUMNS)
+            return {c: table.column(c).to_numpy() for c in COLUMNS}
+        return {c: np.load(os.path.join(part_path, f"{c}.npy"), allow_pickle=False) for c in COLUMNS}
+
+    @staticmethod
+    def _write_manifest(path: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        manifests_dir = os.path.join(path, "manifests")
+        os.makedirs(manifests_dir, exist_ok=True)
+        target = os.path.join(manifests_dir, f"v{manifest['version']:04d}.json")
+        tmp = f"{target}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, target)
+        return {**manifest, "path": path}
+
+
+# Instancia compartida (mismo patrón que ohlcv_store)
+dataset_snapshots = DatasetSnapshotStore()
@@ -115,7 +115,10 @@ async def get_app_config(user_id: str):
 
 async def save_trade(trade_data: Dict[str, Any]):
     trade_data["createdAt"] = datetime.utcnow()
-    return await db.trades.insert_one(trade_data)
+    result = await db.trades.insert_one(trade_data)
+    from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
+    await bot_routing_index.add_trade(trade_data)
+    return result
 
 async def update_virtual_balance(user_id: str, market_type: str, asset: str, amount: float, is_relative: bool = False):
     user = await db.users.find_one({"openId": user_id})
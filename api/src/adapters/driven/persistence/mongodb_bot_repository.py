@@ -3,6 +3,7 @@ from api.src.domain.entities.bot_instance import BotInstance
 from bson import ObjectId
 import os
 from datetime import datetime
+from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
 
 class MongoBotRepository:
     """
@@ -18,6 +19,7 @@ class MongoBotRepository:
         doc = bot.to_dict()
         if "id" in doc: del doc["id"]
         result = await self.collection.insert_one(doc)
+        bot_routing_index.upsert_bot(doc)
         return str(result.inserted_id)
 
     async def get_active_bots(self) -> list:
@@ -34,6 +36,7 @@ class MongoBotRepository:
             {"_id": ObjectId(bot_id)},
             {"$set": {"status": status}}
         )
+        await bot_routing_index.refresh_bot(bot_id)
         return result.modified_count > 0
         
     async def update(self, bot_id: str, data: dict) -> bool:
@@ -43,10 +46,12 @@ class MongoBotRepository:
             {"_id": ObjectId(bot_id)},
             {"$set": data}
         )
+        await bot_routing_index.refresh_bot(bot_id)
         return result.modified_count > 0
         
     async def delete(self, bot_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(bot_id)})
+        bot_routing_index.remove_bot(bot_id)
         return result.deleted_count > 0
 
     def _map_doc(self, doc) -> BotInstance:
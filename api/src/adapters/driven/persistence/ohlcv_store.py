@@ -0,0 +1,249 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from ccxt.base.exchange import Exchange
+from api.config import Config
+from api.src.infrastructure.concurrency.file_lock import lock_fd, unlock_fd
+
+logger = logging.getLogger("OHLCVStore")
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# fetch(since_ms, limit) -> DataFrame indexado por timestamp (mismo formato que CcxtAdapter.get_historical_data).
+# since_ms=None significa "las últimas `limit` velas".
+FetchFn = Callable[[Optional[int], int], Awaitable[pd.DataFrame]]
+
+
+WEEK_OFFSET_MS = 4 * 86_400_000 # Las velas semanales abren en lunes (el epoch cae en jueves)
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    return int(Exchange.parse_timeframe(timeframe) * 1000)
+
+
+def candle_open(ts_ms: int, timeframe: str) -> int:
+    """Apertura de la vela que contiene ts_ms (las semanales alineadas a lunes, como en los exchanges)."""
+    tf_ms = timeframe_to_ms(timeframe)
+    offset = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    return (ts_ms - offset) // tf_ms * tf_ms + offset
+
+
+class OHLCVStore:
+    """
+    Almacén local de velas por (exchange, símbolo, timeframe).
+
+    Cada serie se guarda como archivos columnares .npy (uno por columna) que se leen con
+    memory-map: una lectura solo materializa el tramo pedido, sin parsear nada. Un
+    `ranges.json` al lado registra los intervalos ya descargados, de modo que cada
+    consulta solo pide al exchange la cabeza, la cola o los huecos que falten.
+    La vela en formación nunca se marca como cubierta y se vuelve a pedir en la siguiente sync.
+
+    Varios procesos (workers de la API) pueden compartir el directorio: cada serie tiene un
+    `.lock` con un lock de fichero (flock en POSIX, msvcrt en Windows; exclusivo para
+    leer-fusionar-escribir, compartido para leer), así que ninguna escritura pisa a otra ni un lector ve columnas de versiones distintas.
+    """
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or Config.OHLCV_STORE_DIR
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    # --- API PÚBLICA ---
+
+    async def get_latest(self, exchange_id: str, symbol: str, timeframe: str, limit: int, fetch: FetchFn) -> pd.DataFrame:
+        """Últimas `limit` velas (incluida la vela en formación), sincronizando solo lo que falte."""
+        if timeframe.endswith('M'):
+            return await fetch(None, limit)  # velas mensuales: duración variable, no se almacenan
+        tf_ms = timeframe_to_ms(timeframe)
+        end = candle_open(self._now_ms(), timeframe)
+        start = end - (max(int(limit), 1) - 1) * tf_ms
+
+        path = self._series_dir(exchange_id, symbol, timeframe)
+        async with self._lock_for(path):
+            await self._sync(path, start, end, tf_ms, fetch, tail_is_latest=True)
+            # Solo se materializan las últimas `limit` filas (aunque la serie sea antigua o tenga huecos)
+            return self._read(path, None, end, tail=int(limit) or None)
+
+    async def get_window(self, exchange_id: str, symbol: str, timeframe: str, since: int, limit: int, fetch: FetchFn) -> pd.DataFrame:
+        """Hasta `limit` velas desde `since` (ms), sincronizando solo los huecos de esa ventana."""
+        if timeframe.endswith('M'):
+            return await fetch(since, limit)
+        tf_ms = timeframe_to_ms(timeframe)
+        start = candle_open(int(since), timeframe)
+        end = min(start + (max(int(limit), 1) - 1) * tf_ms, candle_open(self._now_ms(), timeframe))
+
+        path = self._series_dir(exchange_id, symbol, timeframe)
+        async with self._lock_for(path):
+            await self._sync(path, start, end, tf_ms, fetch, tail_is_latest=False)
+            return self._read(path, start, end)
+
+    def read(self, exchange_id: str, symbol: str, timeframe: str, start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+        """Lectura local sin tocar el exchange (start/end en ms, inclusivos)."""
+        return self._read(self._series_dir(exchange_id, symbol, timeframe), start, end)
+
+    def get_ranges(self, exchange_id: str, symbol: str, timeframe: str) -> List[Tuple[int, int]]:
+        """Intervalos [inicio, fin] (ms) de velas cerradas ya almacenadas."""
+        return [tuple(r) for r in self._load_ranges(self._series_dir(exchange_id, symbol, timeframe))]
+
+    # --- SINCRONIZACIÓN ---
+
+    async def _sync(self, path: str, start: int, end: int, tf_ms: int, fetch: FetchFn, tail_is_latest: bool):
+        ranges = self._load_ranges(path)
+        missing = self._missing_intervals(ranges, start, end, tf_ms)
+        if not missing:
+            return
+
+        frames, covered = [], []
+        for gap_start, gap_end in missing:
+            count = (gap_end - gap_start) // tf_ms + 1
+            # La cola de get_latest se pide como "últimas N velas", igual que el fetch directo
+            since = None if tail_is_latest and gap_end == end else gap_start
+            try:
+                df = await fetch(since, int(count))
+            except Exception as e:
+                logger.error(f"Error sincronizando {path} [{gap_start}, {gap_end}]: {e}")
+                continue
+            if df is None or df.empty:
+                continue
+
+            frames.append(df)
+            ts = self._to_ms(df.index)
+            first = int(ts.min()) if since is None else min(since, int(ts.min()))
+            last = int(ts.max())
+            if last + tf_ms > self._now_ms():
+                last -= tf_ms  # vela en formación: se guarda pero no cuenta como cubierta
+            if last >= first:
+                covered.append([first, last])
+
+        if frames:
+            await asyncio.to_thread(self._merge_and_write, path, frames, covered, tf_ms)
+
+    @staticmethod
+    def _missing_intervals(ranges: List[List[int]], start: int, end: int, tf_ms: int) -> List[Tuple[int, int]]:
+        missing = []
+        cursor = start
+        for r_start, r_end in ranges:
+            if r_end < cursor:
+                continue
+            if r_start > end:
+                break
+            if r_start > cursor:
+                missing.append((cursor, min(r_start - tf_ms, end)))
+            cursor = max(cursor, r_end + tf_ms)
+            if cursor > end:
+                break
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    @staticmethod
+    def _merge_ranges(ranges: List[List[int]], tf_ms: int) -> List[List[int]]:
+        merged: List[List[int]] = []
+        for r_start, r_end in sorted(ranges):
+            if merged and r_start <= merged[-1][1] + tf_ms:
+                merged[-1][1] = max(merged[-1][1], r_end)
+            else:
+                merged.append([r_start, r_end])
+        return merged
+
+    # --- I/O ---
+
+    def _series_dir(self, exchange_id: str, symbol: str, timeframe: str) -> str:
+        safe_symbol = re.sub(r'[^A-Za-z0-9_-]', '_', symbol)
+        return os.path.join(self.base_dir, exchange_id.lower(), safe_symbol, timeframe)
+
+    def _lock_for(self, path: str) -> asyncio.Lock:
+        if path not in self._locks:
+            self._locks[path] = asyncio.Lock()
+        return self._locks[path]
+
+    @contextlib.contextmanager
+    def _series_lock(self, path: str, exclusive: bool):
+        """Lock de fichero sobre la serie, compartido entre procesos (el asyncio.Lock solo cubre este)."""
+        fd = os.open(os.path.join(path, ".lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            lock_fd(fd, exclusive=exclusive)
+            try:
+                yield
+            finally:
+                unlock_fd(fd)
+        finally:
+            os.close(fd)
+
+    def _load_ranges(self, path: str) -> List[List[int]]:
+        ranges_path = os.path.join(path, "ranges.json")
+        if not os.path.exists(ranges_path):
+            return []
+        with open(ranges_path) as f:
+            return [list(r) for r in json.load(f)]
+
+    def _load_columns(self, path: str) -> Optional[Dict[str, np.ndarray]]:
+        if not os.path.exists(os.path.join(path, "timestamp.npy")):
+            return None
+        return {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode='r') for c in COLUMNS}
+
+    def _read(self, path: str, start: Optional[int], end: Optional[int], tail: Optional[int] = None) -> pd.DataFrame:
+        if not os.path.isdir(path):
+            return self._read_columns(path, start, end, tail)
+        with self._series_lock(path, exclusive=False):
+            return self._read_columns(path, start, end, tail)
+
+    def _read_columns(self, path: str, start: Optional[int], end: Optional[int], tail: Optional[int] = None) -> pd.DataFrame:
+        """Velas con timestamp en [start, end]; con tail, solo las últimas `tail` de ese tramo."""
+        columns = self._load_columns(path)
+        if columns is None:
+            return pd.DataFrame(columns=COLUMNS[1:], index=pd.DatetimeIndex([], name='timestamp'))
+
+        ts = columns['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='right'))
+        if tail:
+            lo = max(lo, hi - tail)
+
+        index = pd.DatetimeIndex(pd.to_datetime(np.array(ts[lo:hi]), unit='ms'), name='timestamp')
+        return pd.DataFrame({c: np.array(columns[c][lo:hi]) for c in COLUMNS[1:]}, index=index)
+
+    def _merge_and_write(self, path: str, frames: List[pd.DataFrame], covered: List[List[int]], tf_ms: int):
+        os.makedirs(path, exist_ok=True)
+        with self._series_lock(path, exclusive=True):
+            # Se relee bajo el lock: otro proceso puede haber escrito desde que empezó esta sync
+            self._write_merged(path, frames, self._merge_ranges(self._load_ranges(path) + covered, tf_ms))
+
+    def _write_merged(self, path: str, frames: List[pd.DataFrame], ranges: List[List[int]]):
+        stored = self._read_columns(path, None, None)
+        parts = ([stored] if not stored.empty else []) + [f[COLUMNS[1:]].astype(float) for f in frames]
+        combined = pd.concat(parts)
+        combined = combined[~combined.index.duplicated(keep='last')].sort_index()
+
+        suffix = f"{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        arrays = {'timestamp': self._to_ms(combined.index)}
+        arrays.update({c: combined[c].to_numpy(dtype=np.float64) for c in COLUMNS[1:]})
+        for name, values in arrays.items():
+            tmp = os.path.join(path, f"{name}.{suffix}.npy")
+            np.save(tmp, np.ascontiguousarray(values))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        tmp = os.path.join(path, f"ranges.json.{suffix}")
+        with open(tmp, "w") as f:
+            json.dump(ranges, f)
+        os.replace(tmp, os.path.join(path, "ranges.json"))
+
+    @staticmethod
+    def _to_ms(index: pd.DatetimeIndex) -> np.ndarray:
+        """Epoch en ms como int64, independiente de la resolución del índice (ns/us/ms/s)."""
+        return index.values.astype('datetime64[ms]').astype(np.int64)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+
+# Instancia compartida (mismo patrón que ccxt_service / socket_service)
+ohlcv_store = OHLCVStore()
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+from api.config import Config
+
+logger = logging.getLogger("WalkForwardCache")
+
+
+class WalkForwardCache:
+    """
+    Resultados de folds de walk-forward ya evaluados, uno por archivo JSON.
+
+    La clave de un fold (ver walk_forward.fold_key) incluye la estrategia, sus parámetros,
+    los del modelo, el rango del fold y un digest de sus velas: ampliar el histórico solo
+    añade folds nuevos y los anteriores se sirven desde aquí sin reentrenar. Se mantiene
+    además una copia en memoria para no releer disco entre peticiones.
+    """
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or Config.WALK_FORWARD_CACHE_DIR
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if key in self._memory:
+            return self._memory[key]
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Fold {key} ilegible, se reevaluará: {e}")
+            return None
+        self._memory[key] = result
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        self._memory[key] = result
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"No se pudo guardar el fold {key}: {e}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.base_dir, key[:2], f"{key}.json")
+
+
+# Instancia compartida (mismo patrón que ohlcv_store / dataset_snapshots)
+walk_forward_cache = WalkForwardCache()
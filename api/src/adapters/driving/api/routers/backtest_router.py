@@ -5,13 +5,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional, List, Dict, Any
 import logging
 from datetime import datetime
+from bson import ObjectId
 from api.src.adapters.driven.persistence.mongodb import db
 from api.src.adapters.driven.exchange.ccxt_adapter import ccxt_service
 from api.src.application.services.ml_service import MLService
 from api.src.domain.entities.bot_instance import BotInstance
+from api.src.domain.services import backtest_metrics
 from api.src.adapters.driven.persistence.mongodb_bot_repository import MongoBotRepository
 from api.src.infrastructure.security.auth_deps import get_current_user
-from api.src.domain.models.schemas import StrategyOptimizationRequest, StrategyOptimizationResponse, SaveStrategyRequest
+from api.src.domain.models.schemas import StrategyOptimizationRequest, StrategyOptimizationResponse, SaveStrategyRequest, SweepRequest, WalkForwardRequest
 
 logger = logging.getLogger(__name__)
 
@@ -133,15 +135,19 @@ async def run_backtest(
     model_id: Optional[str] = None,
     initial_balance: float = 10000.0,
     trade_amount: Optional[float] = None,
+    metric: str = "profit_pct",
     current_user: dict = Depends(get_current_user)
 ):
     """
     Ejecuta un backtest (Auth via JWT).
+    `metric` decide el ganador del torneo (profit_pct, sharpe_ratio, max_drawdown, ...).
     """
     try:
         user = current_user
         user_id = user["openId"]
 
+        if metric not in backtest_metrics.RANK_METRICS:
+            raise HTTPException(status_code=400, detail=f"Unsupported metric: {metric}")
         
         # Obtener configuración del usuario si se usa IA
         user_config = None
@@ -199,7 +205,8 @@ async def run_backtest(
             exchange_id=exchange_id,
             model_id=model_id,
             initial_balance=initial_balance,
-            trade_amount=trade_amount
+            trade_amount=trade_amount,
+            metric=metric
         )
         
         return results
@@ -211,6 +218,89 @@ async def run_backtest(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/sweep")
+async def run_sweep(
+    request: SweepRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Barrido de parámetros de estrategia + hiperparámetros del modelo (grid o random search).
+    Devuelve la tabla ordenada por la métrica y, con bot_id, guarda la mejor configuración como recomendación en el bot.
+    """
+    try:
+        user_id = current_user["openId"]
+        if request.bot_id:
+            bot = await db.bot_instances.find_one({"_id": ObjectId(request.bot_id)}) if ObjectId.is_valid(request.bot_id) else None
+            if not bot or bot.get("user_id") not in (user_id, str(current_user.get("_id"))):
+                raise HTTPException(status_code=404, detail="Bot not found")
+
+        from api.src.application.services.backtest_service import BacktestService
+
+        backtest_service = BacktestService(exchange_adapter=ccxt_service)
+        return await backtest_service.run_sweep(
+            symbol=request.symbol,
+            strategy_name=request.strategy_name,
+            strategy_space=request.strategy_space,
+            model_space=request.model_space,
+            search=request.search,
+            n_iter=request.n_iter,
+            metric=request.metric,
+            days=request.days,
+            timeframe=request.timeframe,
+            market_type=request.market_type,
+            exchange_id=request.exchange_id,
+            user_id=user_id,
+            initial_balance=request.initial_balance,
+            trade_amount=request.trade_amount,
+            train_fraction=request.train_fraction,
+            bot_id=request.bot_id
+        )
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running sweep: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/walk-forward")
+async def run_walk_forward(
+    request: WalkForwardRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Evaluación walk-forward: reentrena por fold y agrega PnL y precisión fuera de muestra.
+    Los folds ya evaluados se reutilizan, así que ampliar el histórico solo entrena los nuevos.
+    """
+    try:
+        from api.src.application.services.backtest_service import BacktestService
+
+        backtest_service = BacktestService(exchange_adapter=ccxt_service)
+        return await backtest_service.run_walk_forward(
+            symbol=request.symbol,
+            strategy_name=request.strategy_name,
+            strategy_params=request.strategy_params,
+            model_params=request.model_params,
+            train_size=request.train_size,
+            test_size=request.test_size,
+            days=request.days,
+            timeframe=request.timeframe,
+            market_type=request.market_type,
+            exchange_id=request.exchange_id,
+            user_id=current_user["openId"],
+            initial_balance=request.initial_balance,
+            trade_amount=request.trade_amount
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running walk-forward: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/deploy_bot")
 async def deploy_bot(
     symbol: str,
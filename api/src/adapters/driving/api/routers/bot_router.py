@@ -214,7 +214,8 @@ async def update_bot(bot_id: str, data: UpdateBotSchema, current_user: dict = De
 
     # 3. Actualizar
     if updates:
-        await repo.collection.update_one({"_id": ObjectId(bot_id)}, {"$set": updates})
+        # Por el repositorio: mantiene al día el índice de enrutado (status/timeframe/estrategia)
+        await repo.update(bot_id, dict(updates))
         
         # Emitir
         await socket_service.emit_to_user(user_id, "bot_updated", {
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 import logging
 from api.src.adapters.driven.exchange.ccxt_adapter import ccxt_service
+from api.src.adapters.driven.persistence.ohlcv_store import ohlcv_store
 import ccxt.async_support as ccxt # Keep for ccxt.exchanges list (static)
 
 logger = logging.getLogger(__name__)
@@ -45,8 +46,11 @@ async def get_candles(symbol: str, timeframe: str = "1h", limit: int = 100):
     Get historical candles for charts.
     """
     try:
-        # We use the public data fetcher which is robust
-        df = await ccxt_service.get_historical_data(symbol, timeframe, limit=limit)
+        # We use the public data fetcher which is robust, through the local candle store
+        async def fetch(since, count):
+            return await ccxt_service.get_historical_data(symbol, timeframe, limit=count, since=since)
+
+        df = await ohlcv_store.get_latest('binance', symbol, timeframe, limit, fetch)
         
         if df.empty:
              return []
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from api.src.application.services.ml_service import MLService
 from api.src.application.services.cex_service import CEXService
+from api.src.application.services.training_jobs import training_queue
 from api.src.infrastructure.ai.model_manager import ModelManager
 import logging
 
@@ -30,6 +31,7 @@ class BatchTrainRequest(BaseModel):
     user_id: str = "default_user"
     exchange: str = "okx"
     market: str = "spot"
+    refresh_data: bool = False # añadir las velas nuevas al snapshot del dataset
 
 class PredictRequest(BaseModel):
     symbol: str
@@ -38,44 +40,45 @@ class PredictRequest(BaseModel):
     candles: list[dict] # [ {'timestamp':..., 'open':..., 'close':...}, ... ]
 
 @router.post("/train")
-async def train_all_strategies_endpoint(request: BatchTrainRequest, background_tasks: BackgroundTasks):
+async def train_all_strategies_endpoint(request: BatchTrainRequest):
     """
     Entrena TODOS los modelos de estrategia (RandomForest) utilizando los símbolos provistos.
-    Nueva arquitectura agnóstica.
+    Nueva arquitectura agnóstica. El entrenamiento se encola (TRAINING_MAX_JOBS a la vez);
+    si ya hay un job idéntico en cola o en curso, el usuario se suscribe a ese.
     """
     try:
         logging.info(f"🚀 Endpoint /train called. Request User ID: {request.user_id}")
-        
-        # Resolve dependencies inside endpoint to ensure correct context
-        # Ideally use FastAPI depends, but for now we create fresh instances or import from main if possible.
-        # However, to avoid circular imports with main, we use fresh instantiation but configured correctly.
-        import api.main as main
-        logging.info(f"🔧 Initializing MLService for User: {request.user_id}")
-        service = MLService(exchange_adapter=main.ccxt_adapter)
-        
-        background_tasks.add_task(
-            service.train_all_strategies, 
-            request.symbols, 
-            request.timeframe, 
-            request.days,
-            request.market,
-            request.user_id
-        )
-        logging.info(f"✅ Background task added for User: {request.user_id} - Symbols: {request.symbols}")
-        return {"status": "started", "message": f"Training started for {len(request.symbols)} symbols"}
+        params = request.model_dump(exclude={"user_id", "epochs"})
+        job, created = await training_queue.submit(params, user_id=request.user_id)
+        logging.info(f"✅ Training job {job['id']} ({'queued' if created else 'deduplicated'}) for User: {request.user_id} - Symbols: {request.symbols}")
+        return {
+            "status": "queued" if created else "deduplicated",
+            "job_id": job["id"],
+            "message": f"Training queued for {len(request.symbols)} symbols" if created else "Identical training already in progress"
+        }
     except Exception as e:
         logger.error(f"❌ Error starting training endpoint: {e}")
-        # Try generic fallback if import fails
-        service = MLService(exchange_adapter=CEXService())
-        background_tasks.add_task(
-            service.train_all_strategies, 
-            request.symbols, 
-            request.timeframe, 
-            request.days,
-            request.market,
-            request.user_id
-        )
-        return {"status": "started (fallback)", "message": f"Training started (fallback)"}
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs")
+async def list_training_jobs(user_id: str = None, limit: int = 50):
+    """Jobs de entrenamiento (más recientes primero), opcionalmente filtrados por suscriptor."""
+    return await training_queue.list_jobs(user_id=user_id, limit=limit)
+
+@router.get("/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Estado y progreso de un job (polling; el mismo estado se emite por socket como 'training_job')."""
+    job = await training_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str):
+    job = await training_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
 
 @router.get("/models")
 async def get_models(market: str = "spot"):
@@ -126,12 +129,12 @@ async def predict_strategy(request: PredictRequest):
 
 # Deprecated/Mapped Endpoints for compatibility
 @router.post("/train_global")
-async def train_global_redirect(request: BatchTrainRequest, background_tasks: BackgroundTasks):
-    return await train_all_strategies_endpoint(request, background_tasks)
+async def train_global_redirect(request: BatchTrainRequest):
+    return await train_all_strategies_endpoint(request)
 
 @router.post("/train-strategies")
-async def train_strategies_redirect(request: BatchTrainRequest, background_tasks: BackgroundTasks):
-    return await train_all_strategies_endpoint(request, background_tasks)
+async def train_strategies_redirect(request: BatchTrainRequest):
+    return await train_all_strategies_endpoint(request)
 
 @router.post("/reload-models")
 async def reload_models():
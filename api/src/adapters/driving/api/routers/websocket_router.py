@@ -74,6 +74,10 @@ async def _run_batch_backtest(user_id: str, params: dict):
                          "percent": round(((i+1)/total_symbols)*100, 1)
                      })
 
+                     # Resultado parcial por estrategia a medida que termina en el pool
+                     async def _on_strategy_result(row, symbol=symbol):
+                         await socket_service.emit_to_user(user_id, "backtest_strategy_result", {"symbol": symbol, **row})
+
                      # Ejecutar Backtest para este símbolo
                      # Esto prueba TODAS las estrategias y devuelve la mejor
                      result = await backtest_service.run_backtest(
@@ -84,7 +88,8 @@ async def _run_batch_backtest(user_id: str, params: dict):
                          user_id=user_id,
                          exchange_id=exchange_id,
                          initial_balance=initial_balance,
-                         trade_amount=trade_amount
+                         trade_amount=trade_amount,
+                         on_result=_on_strategy_result
                      )
 
                      # Emitir resultado individual
@@ -125,7 +130,8 @@ async def _run_batch_backtest(user_id: str, params: dict):
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     logger.info(f"New WebSocket connection request from user: {user_id}")
     try:
-        await socket_service.connect(websocket, user_id)
+        # ?encoding=msgpack: eventos de alta frecuencia en binario (ver SocketService.set_encoding)
+        await socket_service.connect(websocket, user_id, encoding=websocket.query_params.get("encoding", "json"))
         while True:
             # Mantener conexión viva y escuchar mensajes
             data_text = await websocket.receive_text()
@@ -211,6 +217,17 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
 
                             await socket_service.emit_to_user(user_id, "bot_details", b_dict)
 
+                    elif action in ("subscribe", "unsubscribe"):
+                        # Topics: "candles:<exchange>:<symbol>:<timeframe>" y "bot:<bot_id>"
+                        topics = [str(t) for t in message.get("topics", []) if t]
+                        if action == "subscribe":
+                            socket_service.subscribe(websocket, user_id, topics)
+                        else:
+                            socket_service.unsubscribe(websocket, user_id, topics)
+
+                    elif action == "set_encoding":
+                        socket_service.set_encoding(websocket, user_id, str(message.get("encoding", "json")))
+
                     elif action == "run_batch_backtest":
                         # Lanzar backtest masivo en background
                         params = message.get("data", {})
@@ -222,7 +239,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
             except json.JSONDecodeError:
                 # Mantener compatibilidad con mensajes de texto simple como "ping"
                 if data_text == "ping":
-                    await websocket.send_text("pong")
+                    socket_service.send_text(websocket, user_id, "pong")
                 
     except WebSocketDisconnect:
         socket_service.disconnect(websocket, user_id)
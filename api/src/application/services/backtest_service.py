@@ -1,12 +1,21 @@
 import os
-import joblib
 import pandas as pd
 import logging
 import importlib
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from concurrent.futures import Executor
+from api.config import Config
 from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.src.domain.services import backtest_metrics
+from api.src.domain.services.backtest_simulator import BacktestSimulator
 from api.src.domain.services.exchange_port import IExchangePort
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, ohlcv_store, timeframe_to_ms
+from api.src.adapters.driven.persistence.walk_forward_cache import WalkForwardCache, walk_forward_cache
+from api.src.application.services import strategy_tournament, strategy_sweep, walk_forward
+from api.src.infrastructure.ai.model_manager import ModelManager
+from api.src.infrastructure.concurrency import run_jobs
 
 class BacktestService:
     """
@@ -16,20 +25,27 @@ class BacktestService:
     Ahora confía al 100% en el contrato dinámico (get_features) de cada 
     estrategia para preparar los datos de entrada del modelo .pkl.
     """
-    def __init__(self, exchange_adapter: IExchangePort, trainer: StrategyTrainer = None, models_dir: str = "api/data/models"):
+    def __init__(self, exchange_adapter: IExchangePort, trainer: StrategyTrainer = None, models_dir: str = "api/data/models", executor: Executor = None, candle_store: OHLCVStore = None, fold_cache: WalkForwardCache = None):
         self.exchange = exchange_adapter
         self.trainer = trainer or StrategyTrainer()
         self.models_dir = models_dir
         self.logger = logging.getLogger("BacktestService")
+        # Pool donde se evalúan las estrategias del torneo (fuera del event loop)
+        self.executor = executor
+        # Velas locales: solo se pide al exchange lo que falte
+        self.candle_store = candle_store or ohlcv_store
+        # Resultados de folds walk-forward ya evaluados
+        self.fold_cache = fold_cache or walk_forward_cache
         
         # Lazy load MLService to avoid circular dependency
         from api.src.application.services.ml_service import MLService
         self.ml_service = MLService(exchange_adapter=self.exchange)
 
-    async def select_best_model(self, symbol: str, timeframe: str, market_type: str = "spot") -> Dict[str, Any]:
+    async def select_best_model(self, symbol: str, timeframe: str, market_type: str = "spot", on_result: Callable[[Dict[str, Any]], Awaitable[None]] = None) -> Dict[str, Any]:
         """
         Evalúa todos los modelos agnósticos y recomienda el mejor para un activo,
         utilizando exclusivamente el contrato de features de la estrategia.
+        Cada estrategia se evalúa en el pool del torneo; on_result recibe cada fila al terminar.
         """
         self.logger.info(f"Iniciando validación técnica para {symbol} ({market_type})...")
         
@@ -42,67 +58,37 @@ class BacktestService:
         best_score = -1
         best_strat = None
 
-        results = []
-
+        jobs = []
         for strat_name in strategies:
-            try:
-                model_dir_specific = os.path.join(self.models_dir, market_type.lower()).replace('\\', '/')
-                model_path = os.path.join(model_dir_specific, f"{strat_name}.pkl").replace('\\', '/')
-
-                if not os.path.exists(model_path):
-                    # Fallback: Check root models dir
-                    model_path_root = os.path.normpath(os.path.join(self.models_dir, f"{strat_name}.pkl"))
-                    if os.path.exists(model_path_root):
-                        model_path = model_path_root
-                    else:
-                        continue
-                
-                # Cargar el modelo IA y la clase de estrategia correspondiente
-                model = joblib.load(model_path)
-                
-                # Importación dinámica del contrato de la estrategia
-                StrategyClass = self.trainer.load_strategy_class(strat_name, market_type)
-                if not StrategyClass:
-                    continue
-                strategy = StrategyClass()
-                
-                # 2. Aplicar procesamiento (Cálculo de indicadores y contexto S9)
-                df_test = self.prepare_data_for_model(df.copy(), strategy).dropna()
-                if df_test.empty:
-                    continue
+            model_path = self._resolve_model_path(strat_name, market_type)
+            if not model_path:
+                continue
+            # Importación dinámica del contrato de la estrategia
+            StrategyClass = self.trainer.load_strategy_class(strat_name, market_type)
+            if not StrategyClass:
+                continue
+            jobs.append((strat_name, strategy_tournament.evaluate_model_accuracy, (df, strat_name, StrategyClass, model_path)))
 
-                # 3. SINCRONIZACIÓN TOTAL
-                features = strategy.get_features()
-                model_features = features + ['in_position', 'current_pnl']
+        async def _stream(strat_name, row, error):
+            if on_result and (row or error):
+                await on_result(row or {"strategy": strat_name, "error": str(error), "status": "failed"})
 
-                missing = [c for c in model_features if c not in df_test.columns]
-                if missing:
-                    self.logger.error(f"Contrato roto en {strat_name}: Faltan columnas {missing}")
-                    continue
+        # 2. Evaluación en paralelo (indicadores + contexto S9 + predicción) y ranking por precisión
+        results = []
+        outcomes = await run_jobs(self._get_executor(), jobs, _stream)
 
-                X = df_test[model_features]
-                
-                # 4. Predicción y Cálculo de Precisión
-                predictions = model.predict(X)
-                score = self._calculate_accuracy(df_test['signal'].values, predictions)
-                
-                # Calcular métricas básicas
-                trades_count = (predictions != 0).sum()
-                
-                results.append({
-                    "strategy": strat_name,
-                    "accuracy": score,
-                    "trades": int(trades_count),
-                    "status": "active"
-                })
-                
-                if score > best_score:
-                    best_score = score
-                    best_strat = strat_name
+        for strat_name, row, error in outcomes:
+            if error:
+                self.logger.error(f"Error analizando modelo {strat_name}: {error}")
+                results.append({"strategy": strat_name, "error": str(error), "status": "failed"})
+                continue
+            if not row:
+                continue
 
-            except Exception as e:
-                self.logger.error(f"Error analizando modelo {strat_name}: {e}")
-                results.append({"strategy": strat_name, "error": str(e), "status": "failed"})
+            results.append(row)
+            if row["accuracy"] > best_score:
+                best_score = row["accuracy"]
+                best_strat = strat_name
 
         return {
             "symbol": symbol,
@@ -127,12 +113,18 @@ class BacktestService:
         initial_balance: float = 10000.0,
         trade_amount: Optional[float] = None,
         tp: float = 0.03,
-        sl: float = 0.9
+        sl: float = 0.9,
+        metric: str = "profit_pct",
+        on_result: Callable[[Dict[str, Any]], Awaitable[None]] = None
     ) -> Dict[str, Any]:
         """
         Ejecuta un Backtest Tournament: evalúa todas las estrategias y devuelve 
-        los resultados detallados de la mejor posicionada.
+        los resultados detallados de la mejor posicionada según `metric`.
+        Las estrategias se simulan en el pool del torneo; on_result recibe el resumen
+        (con sus métricas de riesgo/retorno) de cada una en cuanto termina.
         """
+        if metric not in backtest_metrics.RANK_METRICS:
+            raise ValueError(f"Métrica no soportada: {metric} (opciones: {', '.join(backtest_metrics.RANK_METRICS)})")
         self.logger.info(f"🚀 Iniciando Backtest Tournament: {symbol} | {days}d | {timeframe}")
         
         # 1. Obtener datos históricos
@@ -160,104 +152,60 @@ class BacktestService:
         if not strategies_to_test:
             raise ValueError(f"No hay estrategias disponibles para el mercado {market_type} (Ni modelos .pkl ni código fuente).")
 
-        tournament_results = []
-        best_strategy_data = None
-        highest_pnl = -float('inf')
+        step_investment = await self._resolve_step_investment(initial_balance, trade_amount, user_id)
 
-        # 3. Ejecutar simulación para cada estrategia
+        # 3. Preparar una simulación por estrategia (modelo segmentado o fallback a root)
+        jobs = []
         for strat_name in strategies_to_test:
-            try:
-                self.logger.info(f"🧪 Testing strategy: {strat_name} ({market_type})")
-                
-                # Cargar modelo segmentado (o fallback a root)
-                model_dir_specific = os.path.join(self.models_dir, market_type.lower()).replace('\\', '/')
-                model_path = os.path.join(model_dir_specific, f"{strat_name}.pkl").replace('\\', '/')
-                
-                if not os.path.exists(model_path):
-                    model_path_root = os.path.normpath(os.path.join(self.models_dir, f"{strat_name}.pkl"))
-                    if os.path.exists(model_path_root):
-                        model_path = model_path_root
-                        self.logger.info(f"Using root model for {strat_name}")
-                    else:
-                        self.logger.warning(f"⏩ Skipping {strat_name}: No .pkl model found in {model_dir_specific} or root.")
-                        continue
-                
-                model = joblib.load(model_path)
-                
-                # Carga dinámica de la clase de estrategia
-                StrategyClass = self.trainer.load_strategy_class(strat_name, market_type)
-                if not StrategyClass:
-                     self.logger.warning(f"⏩ Skipping {strat_name}: Could not load strategy class.")
-                     continue
-
-                strategy_obj = StrategyClass()
-                features = strategy_obj.get_features()
-
-                df_processed = self.prepare_data_for_model(df.copy(), strategy_obj)
-                
-                if df_processed.empty or not all(c in df_processed.columns for c in features):
-                    self.logger.warning(f"⏩ Skipping {strat_name}: Missing features.")
-                    continue
+            model_path = self._resolve_model_path(strat_name, market_type)
+            if not model_path:
+                self.logger.warning(f"⏩ Skipping {strat_name}: No .pkl model found in {self.models_dir}/{market_type.lower()} or root.")
+                continue
 
-                step_investment = initial_balance * 0.2
-                
-                if trade_amount and trade_amount > 0:
-                    step_investment = trade_amount
-                    self.logger.info(f"💰 Usando monto fijo por parámetro: ${step_investment}")
-                else:
-                    try:
-                        from api.src.adapters.driven.persistence.mongodb import get_app_config
-                        user_config = await get_app_config(user_id)
-                        if user_config and 'investmentLimits' in user_config:
-                            cex_limit = user_config['investmentLimits'].get('cexMaxAmount')
-                            if cex_limit and isinstance(cex_limit, (int, float)) and cex_limit > 0:
-                                step_investment = float(cex_limit)
-                                self.logger.info(f"💰 Usando monto de inversión configurado en DB: ${step_investment}")
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ No se pudo cargar configuración de usuario, usando default: {e}")
-
-                model_features = features + ['in_position', 'current_pnl']
-                
-                valid_idx = df_processed[model_features].dropna().index
-                X = df_processed.loc[valid_idx, model_features]
-                df_processed.loc[valid_idx, 'ai_signal'] = model.predict(X)
-                df_processed['ai_signal'] = df_processed['ai_signal'].fillna(0)
-
-                simulation_result = self._simulate_with_reversal(
-                    df_processed, 
-                    initial_balance=initial_balance,
-                    trade_amount=step_investment,
-                    tp=tp,
-                    sl=sl
-                )
-                
-                if not simulation_result:
-                     continue
-
-                tournament_results.append({
-                    "strategy": strat_name,
-                    "profit_pct": simulation_result['profit_pct'],
-                    "total_trades": simulation_result['total_trades'],
-                    "win_rate": simulation_result['win_rate'],
-                    "final_balance": simulation_result['final_balance']
-                })
-                
-                if simulation_result['profit_pct'] > highest_pnl:
-                    highest_pnl = simulation_result['profit_pct']
-                    best_strategy_data = {
-                        "strategy_name": strat_name,
-                        **simulation_result,
-                        "trades": simulation_result['trades']
-                    }
+            # Carga dinámica de la clase de estrategia
+            StrategyClass = self.trainer.load_strategy_class(strat_name, market_type)
+            if not StrategyClass:
+                self.logger.warning(f"⏩ Skipping {strat_name}: Could not load strategy class.")
+                continue
 
-            except Exception as e:
-                self.logger.error(f"Error testing {strat_name}: {e}")
+            self.logger.info(f"🧪 Testing strategy: {strat_name} ({market_type})")
+            jobs.append((strat_name, strategy_tournament.evaluate_backtest_strategy, (
+                df, strat_name, StrategyClass, model_path, initial_balance, step_investment, tp, sl
+            )))
+
+        def _summary(strat_name, simulation_result):
+            return {
+                "strategy": strat_name,
+                **simulation_result['metrics'],
+                "final_balance": simulation_result['final_balance']
+            }
+
+        async def _stream(strat_name, simulation_result, error):
+            if on_result and simulation_result:
+                await on_result(_summary(strat_name, simulation_result))
+
+        # 4. Ejecutar las simulaciones en paralelo; los resultados llegan a medida que terminan
+        outcomes = await run_jobs(self._get_executor(), jobs, _stream)
+
+        tournament_results = []
+        simulations = {}
+
+        for strat_name, simulation_result, error in outcomes:
+            if error:
+                self.logger.error(f"Error testing {strat_name}: {error}")
+                continue
+            if not simulation_result:
+                continue
+
+            tournament_results.append(_summary(strat_name, simulation_result))
+            simulations[strat_name] = simulation_result
 
         if not tournament_results:
             raise ValueError(f"No se pudo completar el backtest para ninguna estrategia en {exchange_id}.")
 
-        tournament_results.sort(key=lambda x: x['profit_pct'], reverse=True)
+        tournament_results.sort(key=lambda x: backtest_metrics.rank_key(x, metric), reverse=True)
         winner = tournament_results[0]
+        best_strategy_data = {"strategy_name": winner["strategy"], **simulations[winner["strategy"]]}
         
         chart_data = []
         def sanitize(val):
@@ -287,14 +235,9 @@ class BacktestService:
             "win_rate": best_strategy_data["win_rate"],
             "trades": best_strategy_data["trades"],
             "chart_data": chart_data,
-            "metrics": {
-                "total_trades": best_strategy_data["total_trades"],
-                "win_rate": best_strategy_data["win_rate"],
-                "profit_pct": best_strategy_data["profit_pct"],
-                "profit_factor": 1.5,
-                "max_drawdown": 5.0,
-                "sharpe_ratio": 1.1
-            },
+            "equity_curve": best_strategy_data["equity_curve"],
+            "ranked_by": metric,
+            "metrics": best_strategy_data["metrics"],
             "bot_configuration": {
                 "strategy_type": best_strategy_data["strategy_name"],
                 "model_id": f"{best_strategy_data['strategy_name']}.pkl",
@@ -302,181 +245,277 @@ class BacktestService:
             }
         }
 
+    async def run_sweep(
+        self,
+        symbol: str,
+        strategy_name: str,
+        strategy_space: Dict[str, List[Any]] = None,
+        model_space: Dict[str, List[Any]] = None,
+        search: str = "grid",
+        n_iter: int = 20,
+        metric: str = "profit_pct",
+        days: int = 30,
+        timeframe: str = "1h",
+        market_type: str = "spot",
+        exchange_id: str = "binance",
+        user_id: str = "default_user",
+        initial_balance: float = 10000.0,
+        trade_amount: Optional[float] = None,
+        train_fraction: float = 0.7,
+        bot_id: Optional[str] = None,
+        on_result: Callable[[Dict[str, Any]], Awaitable[None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Barrido (grid o random search) de parámetros de estrategia e hiperparámetros del
+        RandomForest. Cada punto se entrena con el primer tramo del histórico y se simula
+        fuera de muestra; los bloques de puntos se evalúan en el pool del torneo y on_result
+        recibe las filas de cada bloque al terminar. Con bot_id, la mejor configuración se
+        guarda como recomendación en `config.sweep` del bot (no se aplica en vivo).
+        """
+        if metric not in strategy_sweep.RANK_METRICS:
+            raise ValueError(f"Métrica no soportada: {metric} (opciones: {', '.join(strategy_sweep.RANK_METRICS)})")
+        StrategyClass = self.trainer.load_strategy_class(strategy_name, market_type)
+        if not StrategyClass:
+            raise ValueError(f"Estrategia no encontrada: {strategy_name} ({market_type})")
+
+        points = strategy_sweep.build_points(strategy_space, model_space, search, n_iter)
+        self.logger.info(f"🔬 Sweep {strategy_name} sobre {symbol}: {len(points)} puntos ({search})")
+
+        # Velas del almacén local: solo se pide al exchange lo que falte
+        df = await self.get_market_data(symbol, timeframe, days, exchange_id, user_id=user_id)
+        step_investment = await self._resolve_step_investment(initial_balance, trade_amount, user_id)
+
+        executor = self._get_executor()
+        # Un bloque por worker: los puntos de un bloque comparten caché de indicadores
+        n_chunks = Config.TOURNAMENT_WORKERS
+        jobs = [
+            (f"{strategy_name}#{i}", strategy_sweep.evaluate_sweep_points,
+             (df, strategy_name, StrategyClass, chunk, initial_balance, step_investment, train_fraction))
+            for i, chunk in enumerate(strategy_sweep.chunk_points(points, n_chunks))
+        ]
+
+        async def _stream(key, rows, error):
+            if on_result and rows:
+                for row in rows:
+                    await on_result(row)
+
+        rows = []
+        for key, chunk_rows, error in await run_jobs(executor, jobs, _stream):
+            if error:
+                self.logger.error(f"Error en bloque {key} del sweep: {error}")
+                continue
+            rows.extend(chunk_rows)
+
+        ranked = strategy_sweep.rank_results(rows, metric)
+        best = ranked[0] if ranked and "rank" in ranked[0] else None
+        persisted = False
+        if best and bot_id:
+            persisted = await self._save_sweep_config(bot_id, best, metric)
+
+        return {
+            "symbol": symbol,
+            "strategy": strategy_name,
+            "timeframe": timeframe,
+            "metric": metric,
+            "search": search,
+            "points": len(points),
+            "train_fraction": train_fraction,
+            "results": ranked,
+            "best": best,
+            "persisted": persisted
+        }
+
+    async def _save_sweep_config(self, bot_id: str, best: Dict[str, Any], metric: str) -> bool:
+        """
+        Guarda la mejor configuración del sweep en config.sweep del bot como recomendación.
+        No se aplica en vivo: cada punto se evaluó con un modelo reentrenado con sus propios
+        parámetros, y el bot sigue usando el modelo compartido entrenado con los de defecto.
+        """
+        from bson import ObjectId
+        from api.src.adapters.driven.persistence.mongodb_bot_repository import MongoBotRepository
+        try:
+            repo = MongoBotRepository()
+            # $set sobre "config.x" falla si config es null: se inicializa antes
+            await repo.collection.update_one({"_id": ObjectId(bot_id), "config": None}, {"$set": {"config": {}}})
+            await repo.update(bot_id, {
+                "config.sweep": {"metric": metric, "score": best[metric], "strategy_params": best["strategy_params"],
+                                 "model_params": best["model_params"], "updated_at": datetime.utcnow().isoformat()}
+            })
+            self.logger.info(f"💾 Recomendación del sweep guardada en el bot {bot_id}")
+            return True
+        except Exception as e:
+            self.logger.error(f"No se pudo guardar la configuración del sweep en el bot {bot_id}: {e}")
+            return False
+
+    async def run_walk_forward(
+        self,
+        symbol: str,
+        strategy_name: Optional[str] = None,
+        strategy_params: Dict[str, Any] = None,
+        model_params: Dict[str, Any] = None,
+        train_size: int = 500,
+        test_size: int = 100,
+        days: int = 90,
+        timeframe: str = "1h",
+        market_type: str = "spot",
+        exchange_id: str = "binance",
+        user_id: str = "default_user",
+        initial_balance: float = 10000.0,
+        trade_amount: Optional[float] = None,
+        on_result: Callable[[Dict[str, Any]], Awaitable[None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Walk-forward: divide el histórico en folds (train_size velas de entrenamiento seguidas
+        de test_size de test), reentrena cada fold en el pool del torneo y agrega el PnL y la
+        precisión fuera de muestra por estrategia (todas las del mercado si no se indica una).
+        Los folds ya evaluados se sirven desde la caché; on_result recibe cada fold evaluado.
+        """
+        if train_size <= 0 or test_size <= 0:
+            raise ValueError("train_size y test_size deben ser positivos")
+        strategies = [strategy_name] if strategy_name else self.trainer.discover_strategies(market_type)
+        classes = {name: self.trainer.load_strategy_class(name, market_type) for name in strategies}
+        classes = {name: cls for name, cls in classes.items() if cls}
+        if not classes:
+            raise ValueError(f"No hay estrategias disponibles para el mercado {market_type}")
+
+        df = await self.get_market_data(symbol, timeframe, days, exchange_id, user_id=user_id)
+        folds = walk_forward.build_folds(df.index, timeframe, train_size, test_size)
+        if not folds:
+            raise ValueError(f"Histórico insuficiente para walk-forward: {len(df)} velas (train {train_size} + test {test_size})")
+
+        step_investment = await self._resolve_step_investment(initial_balance, trade_amount, user_id)
+        strategy_params = strategy_params or {}
+        model_params = {**strategy_sweep.DEFAULT_MODEL_PARAMS, **(model_params or {})}
+        self.logger.info(f"🚶 Walk-forward {symbol} {timeframe}: {len(folds)} folds x {len(classes)} estrategias")
+
+        # Folds de la caché o, si no están, un job por (estrategia, fold)
+        rows: Dict[str, List[Optional[Dict[str, Any]]]] = {name: [None] * len(folds) for name in classes}
+        keys, jobs = {}, []
+        for i, fold in enumerate(folds):
+            window = df.iloc[fold["train_start"]:fold["test_end"]]
+            digest = walk_forward.data_digest(window)
+            for name, StrategyClass in classes.items():
+                key = walk_forward.fold_key(exchange_id, symbol, timeframe, name, strategy_params, model_params,
+                                            initial_balance, step_investment, fold, digest)
+                cached = self.fold_cache.get(key)
+                if cached is not None:
+                    rows[name][i] = self._fold_row(name, i, fold, cached, cached=True)
+                    continue
+                keys[f"{name}#{i}"] = (name, i, key)
+                jobs.append((f"{name}#{i}", walk_forward.evaluate_fold, (
+                    window, name, StrategyClass, train_size, strategy_params, model_params, initial_balance, step_investment
+                )))
+
+        async def _stream(job_key, result, error):
+            if error is None:
+                name, i, key = keys[job_key]
+                self.fold_cache.put(key, result)
+                rows[name][i] = self._fold_row(name, i, folds[i], result, cached=False)
+                if on_result:
+                    await on_result(rows[name][i])
+
+        for job_key, _, error in await run_jobs(self._get_executor(), jobs, _stream):
+            if error:
+                name, i, _ = keys[job_key]
+                self.logger.error(f"Error en el fold {i} de {name}: {error}")
+                rows[name][i] = self._fold_row(name, i, folds[i], {"error": str(error)}, cached=False)
+
+        results = []
+        for name, fold_rows in rows.items():
+            results.append({"strategy": name, **walk_forward.aggregate_folds(fold_rows, initial_balance), "fold_results": fold_rows})
+        results.sort(key=lambda r: (r["folds"] > 0, r["profit_pct"]), reverse=True)
+        best = results[0] if results[0]["folds"] else None
+
+        return {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "train_size": train_size,
+            "test_size": test_size,
+            "folds": len(folds),
+            "trained_folds": len(jobs),
+            "cached_folds": len(folds) * len(classes) - len(jobs),
+            "recommended_strategy": best["strategy"] if best else None,
+            "results": results
+        }
+
+    @staticmethod
+    def _fold_row(strat_name: str, i: int, fold: Dict[str, Any], result: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        return {
+            "strategy": strat_name,
+            "fold": i,
+            "test_start": datetime.utcfromtimestamp(fold["start_ms"] / 1000).isoformat(),
+            "test_end": datetime.utcfromtimestamp(fold["end_ms"] / 1000).isoformat(),
+            **result,
+            "cached": cached
+        }
+
     async def get_market_data(self, symbol: str, timeframe: str, days: int = 30, exchange_id: str = 'binance', user_id: str = "default_user"):
         """
         Tarea 5.1: Sourcing de Datos Reales para Backtest
         Obtiene datos reales para el backtest, utilizando credenciales del usuario si están disponibles.
         """
-        limit = (24 * days)
-        if timeframe == '4h': limit = days * 6
-        elif timeframe == '1d': limit = days
-        elif timeframe == '15m': limit = days * 96
-        elif timeframe == '5m': limit = days * 288
-        elif timeframe == '1m': limit = days * 1440
+        limit = days * 86_400_000 // timeframe_to_ms(timeframe)
         limit += 100 # Buffer
         
-        self.logger.info(f"🌍 FETCHING REAL DATA via CCXT for {symbol} (Limit: {limit} candles, User: {user_id}, Exchange: {exchange_id})")
-        df = await self.exchange.get_historical_data(symbol, timeframe, limit=limit, user_id=user_id, exchange_id=exchange_id)
-        if df.empty:
-            self.logger.warning("Empty data from auth client, retrying with public...")
-            df = await self.exchange.get_historical_data(symbol, timeframe, limit=limit, exchange_id=exchange_id)
+        async def fetch(since: Optional[int], count: int) -> pd.DataFrame:
+            self.logger.info(f"🌍 FETCHING REAL DATA via CCXT for {symbol} (Limit: {count} candles, User: {user_id}, Exchange: {exchange_id})")
+            df = await self.exchange.get_historical_data(symbol, timeframe, limit=count, since=since, user_id=user_id, exchange_id=exchange_id)
+            if df.empty:
+                self.logger.warning("Empty data from auth client, retrying with public...")
+                df = await self.exchange.get_historical_data(symbol, timeframe, limit=count, since=since, exchange_id=exchange_id)
+            return df
+
+        df = await self.candle_store.get_latest(exchange_id, symbol, timeframe, limit, fetch)
             
         if df.empty:
             raise ValueError(f"No se pudieron obtener datos para {symbol}")
         return df
 
-    def _simulate_with_reversal(self, df_processed, initial_balance=1000.0, trade_amount=None, **kwargs):
-        """
-        Simulación de Backtesting sin SL/TP, puramente impulsada por flipping (Long/Short).
-        """
-        balance = initial_balance
-        step_investment = trade_amount or (initial_balance * 0.2)
-        
-        long_amount = 0
-        long_invested = 0
-        short_amount = 0
-        short_invested = 0
-        
-        trades = []
-        win_count = 0
-        loss_count = 0
-        
-        from api.src.domain.strategies.base import BaseStrategy
+    def _get_executor(self) -> Executor:
+        return self.executor or strategy_tournament.get_tournament_executor()
 
-        for i in range(len(df_processed) - 1):
-            current_row = df_processed.iloc[i]
-            next_row = df_processed.iloc[i+1]
+    def _resolve_model_path(self, strat_name: str, market_type: str) -> Optional[str]:
+        """Modelo segmentado por mercado con fallback al directorio raíz de modelos."""
+        return ModelManager().resolve_path(strat_name, market_type, self.models_dir)
 
-            signal = current_row['ai_signal']
-            
-            price = next_row['open']
-            timestamp = next_row.name
+    async def _resolve_step_investment(self, initial_balance: float, trade_amount: Optional[float], user_id: str) -> float:
+        """Monto por operación: parámetro explícito, límite CEX del usuario o 20% del balance."""
+        step_investment = initial_balance * 0.2
 
-            if signal == 0:
-                continue
+        if trade_amount and trade_amount > 0:
+            step_investment = trade_amount
+            self.logger.info(f"💰 Usando monto fijo por parámetro: ${step_investment}")
+        else:
+            try:
+                from api.src.adapters.driven.persistence.mongodb import get_app_config
+                user_config = await get_app_config(user_id)
+                if user_config and 'investmentLimits' in user_config:
+                    cex_limit = user_config['investmentLimits'].get('cexMaxAmount')
+                    if cex_limit and isinstance(cex_limit, (int, float)) and cex_limit > 0:
+                        step_investment = float(cex_limit)
+                        self.logger.info(f"💰 Usando monto de inversión configurado en DB: ${step_investment}")
+            except Exception as e:
+                self.logger.warning(f"⚠️ No se pudo cargar configuración de usuario, usando default: {e}")
+        return step_investment
 
-            if signal == BaseStrategy.SIGNAL_BUY: 
-                if short_amount > 0:
-                    pnl = short_invested - (short_amount * price)
-                    balance += short_invested + pnl
-                    trades.append({
-                        "time": int(timestamp.timestamp()),
-                        "type": "BUY",
-                        "price": price,
-                        "amount": short_amount,
-                        "pnl": round(pnl, 2),
-                        "label": "FLIP_CLOSE_SHORT"
-                    })
-                    if pnl > 0: win_count += 1
-                    else: loss_count += 1
-                    short_amount, short_invested = 0, 0
-                    
-                    if balance >= step_investment:
-                        amount_to_buy = step_investment / price
-                        long_amount, long_invested = amount_to_buy, step_investment
-                        balance -= step_investment
-                        trades.append({"time": int(timestamp.timestamp()), "type": "BUY", "price": price, "amount": amount_to_buy, "label": "FLIP_OPEN_LONG"})
-                
-                elif balance >= step_investment:
-                    is_dca = long_amount > 0
-                    amount_to_buy = step_investment / price
-                    long_amount += amount_to_buy
-                    long_invested += step_investment
-                    balance -= step_investment
-                    trades.append({"time": int(timestamp.timestamp()), "type": "BUY", "price": price, "amount": amount_to_buy, "label": "DCA_LONG" if is_dca else "OPEN_LONG"})
-                    
-            elif signal == BaseStrategy.SIGNAL_SELL: 
-                if long_amount > 0:
-                    pnl = (long_amount * price) - long_invested
-                    balance += (long_amount * price)
-                    trades.append({
-                        "time": int(timestamp.timestamp()),
-                        "type": "SELL",
-                        "price": price,
-                        "amount": long_amount,
-                        "pnl": round(pnl, 2),
-                        "label": "FLIP_CLOSE_LONG"
-                    })
-                    if pnl > 0: win_count += 1
-                    else: loss_count += 1
-                    long_amount, long_invested = 0, 0
-                    
-                    if balance >= step_investment:
-                        amount_to_short = step_investment / price
-                        short_amount, short_invested = amount_to_short, step_investment
-                        balance -= step_investment
-                        trades.append({"time": int(timestamp.timestamp()), "type": "SELL", "price": price, "amount": amount_to_short, "label": "FLIP_OPEN_SHORT"})
-                        
-                elif balance >= step_investment:
-                    is_dca = short_amount > 0
-                    amount_to_short = step_investment / price
-                    short_amount += amount_to_short
-                    short_invested += step_investment
-                    balance -= step_investment
-                    trades.append({"time": int(timestamp.timestamp()), "type": "SELL", "price": price, "amount": amount_to_short, "label": "DCA_SHORT" if is_dca else "OPEN_SHORT"})
-
-        final_balance = balance
-        if long_amount > 0:
-             final_balance += (long_amount * df_processed.iloc[-1]['close'])
-        if short_amount > 0:
-             pnl_short = short_invested - (short_amount * df_processed.iloc[-1]['close'])
-             final_balance += short_invested + pnl_short
-
-        profit_pct = ((final_balance / initial_balance) - 1) * 100
-        total_trades = len(trades)
-        win_rate = (win_count / (win_count + loss_count) * 100) if (win_count + loss_count) > 0 else 0
-        
-        return {
-            "profit_pct": round(profit_pct, 2),
-            "total_trades": total_trades,
-            "win_rate": round(win_rate, 2),
-            "final_balance": round(final_balance, 2),
-            "trades": trades
-        }
+    def _simulate_with_reversal(self, df_processed, initial_balance=1000.0, trade_amount=None, **kwargs):
+        """
+        Simulación de Backtesting sin SL/TP, puramente impulsada por flipping (Long/Short).
+        Delegada al motor vectorizado (arrays NumPy) en lugar de recorrer filas con iloc.
+        """
+        simulator = BacktestSimulator(initial_balance=initial_balance, trade_amount=trade_amount)
+        return simulator.run(df_processed)
 
     def _calculate_accuracy(self, y_true: Any, y_pred: Any) -> float:
         """Compara la señal ideal de la estrategia con la predicción de la IA."""
-        if len(y_true) == 0: return 0.0
-        matches = (y_true == y_pred).sum()
-        return float(matches / len(y_true))
+        return strategy_tournament.calculate_accuracy(y_true, y_pred)
 
     def prepare_data_for_model(self, df: pd.DataFrame, strategy: BaseStrategy) -> pd.DataFrame:
         """
         Prepara el DataFrame con los indicadores técnicos 
         y el contexto de posición requerido por los nuevos modelos (S9).
         """
-        df = strategy.apply(df)
-        
-        df['in_position'] = 0
-        df['current_pnl'] = 0.0
-        
-        avg_price = 0.0
-        in_pos = False
-        
-        current_side = None
-
-        for i in range(1, len(df)):
-            prev_signal = df.iloc[i-1].get('signal')
-
-            if prev_signal == BaseStrategy.SIGNAL_BUY:
-                in_pos = True
-                current_side = "BUY"
-                avg_price = df.iloc[i]['close']
-            elif prev_signal == BaseStrategy.SIGNAL_SELL:
-                in_pos = True
-                current_side = "SELL"
-                avg_price = df.iloc[i]['close']
-
-            if in_pos:
-                df.at[df.index[i], 'in_position'] = 1
-                current_price = df.iloc[i]['close']
-                if avg_price > 0:
-                    if current_side == "BUY":
-                        df.at[df.index[i], 'current_pnl'] = (current_price - avg_price) / avg_price
-                    else:
-                        df.at[df.index[i], 'current_pnl'] = (avg_price - current_price) / avg_price
-                    
-        return df
+        return strategy_tournament.prepare_data_for_model(df, strategy)
 
     async def optimize_strategy(
         self,
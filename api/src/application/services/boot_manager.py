@@ -12,11 +12,13 @@ class BootManager:
     """
     Servicio de Resiliencia.
     Ahora utiliza suscripciones dinámicas a través de StreamService.
+    Con sharding (shard) solo reactiva los bots de los streams asignados a este worker.
     """
-    def __init__(self, db_adapter_in=None, socket_service=None, stream_service=None):
+    def __init__(self, db_adapter_in=None, socket_service=None, stream_service=None, shard=None):
         self.repo = MongoBotRepository()
         self.socket_service = socket_service
         self.stream_service = stream_service # Inyectado desde el arranque global
+        self.shard = shard
         self.engine = ExecutionEngine(
             db_adapter_in if db_adapter_in is not None else db_global, 
             socket_service, 
@@ -40,6 +42,9 @@ class BootManager:
                 timeframe = bot_data.get('timeframe', '15m')
                 user_id = str(bot_data.get('user_id'))
 
+                if self.shard and not self.shard.owns(exchange_id, symbol):
+                    continue # Lo ejecuta otro worker
+
                 logger.info(f"Reactivando streams para {bot_data['name']} en {exchange_id}")
 
                 # 1. Suscribir a precio real para el frontend
@@ -1,7 +1,8 @@
 import logging
 import asyncio
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 from api.src.adapters.driven.persistence.mongodb import db, save_trade, update_virtual_balance, get_app_config
 from api.src.application.services.cex_service import CEXService
 from api.src.application.services.dex_service import DEXService
@@ -11,11 +12,14 @@ from api.src.application.services.buffer_service import DataBufferService
 from api.src.application.services.ml_service import MLService
 from api.src.application.services.execution_engine import ExecutionEngine
 from api.src.adapters.driven.persistence.mongodb_signal_repository import MongoDBSignalRepository
+from api.src.adapters.driven.persistence.bot_routing_index import BotRoutingIndex, bot_routing_index, bot_exchange, trade_exchange
+from api.src.application.services.bot_sharding import ShardCoordinator
 
 logger = logging.getLogger(__name__)
 
 class SignalBotService:
-    def __init__(self, cex_service=None, dex_service=None, ml_service=None, stream_service=None, engine=None):
+    def __init__(self, cex_service=None, dex_service=None, ml_service=None, stream_service=None, engine=None, routing_index: BotRoutingIndex = None,
+                 shard: ShardCoordinator = None):
         self.cex_service = cex_service or CEXService()
         self.dex_service = dex_service or DEXService()
         self.ml_service = ml_service or MLService(exchange_adapter=self.cex_service) 
@@ -24,34 +28,58 @@ class SignalBotService:
         self.engine = engine or ExecutionEngine(db, socket_service=None, exchange_adapter=self.cex_service.ccxt_provider)
         
         self.buffer_service = DataBufferService(stream_service=self.stream_service, cex_service=self.cex_service)
+        # Bots activos / trades abiertos en memoria: los eventos de mercado no consultan Mongo
+        self.routing_index = routing_index or bot_routing_index
+        # Con sharding este proceso solo ejecuta los streams (exchange, símbolo) que tiene asignados
+        self.shard = shard
         self.stream_service.add_listener(self.handle_market_update)
         # Diccionario para trackear la última vela analizada por par:timeframe
         self._last_analyzed_per_bot: Dict[str, Any] = {}
+        # Latencia de la última inferencia en lote por stream (exchange:symbol:timeframe)
+        self.inference_latency_ms: Dict[str, Dict[str, float]] = {}
 
     async def start(self):
-        await self.initialize_active_bots_monitoring()
+        await self.routing_index.start()
+        if self.shard:
+            await self.shard.start(self.streams, on_acquire=self.start_stream, on_release=self.stop_stream)
+        else:
+            await self.initialize_active_bots_monitoring()
         logger.info("SignalBotService operativo.")
 
     async def stop(self):
+        if self.shard:
+            await self.shard.stop()
+        await self.routing_index.stop()
         await self.stream_service.stop()
 
+    def streams(self) -> Set[Tuple[str, str]]:
+        """Pares (exchange, símbolo) con bots activos o trades abiertos."""
+        pairs = {(bot_exchange(bot), bot["symbol"]) for bot in self.routing_index.active_bots()}
+        pairs.update((trade_exchange(trade), trade["symbol"]) for trade in self.routing_index.open_trades())
+        return pairs
+
     async def initialize_active_bots_monitoring(self):
-        # 1. Estrategias (Entradas)
-        active_instances = await db.bot_instances.find({"status": "active"}).to_list(length=1000)
-        for bot in active_instances:
-            ex_id = (bot.get("exchangeId") or bot.get("exchange_id") or "binance").lower()
-            symbol = bot["symbol"]
-            tf = bot.get("timeframe", "15m")
-            
+        for ex_id, symbol in self.streams():
+            await self.start_stream(ex_id, symbol)
+
+    async def start_stream(self, ex_id: str, symbol: str):
+        """Velas de cada timeframe con bots (entradas) y ticker del par (salidas de trades abiertos)."""
+        timeframes = {bot.get("timeframe", "15m") for bot in self.routing_index.active_bots()
+                      if bot["symbol"] == symbol and bot_exchange(bot) == ex_id}
+        for tf in timeframes:
             await self.buffer_service.initialize_buffer(ex_id, symbol, tf, limit=100)
             await self.stream_service.subscribe_candles(ex_id, symbol, tf)
-            await self.stream_service.subscribe_ticker(ex_id, symbol)
+        await self.stream_service.subscribe_ticker(ex_id, symbol)
 
-        # 2. Trades activos (Salidas)
-        active_trades = await db.trades.find({"status": {"$in": ["active", "open"]}}).to_list(length=1000)
-        for trade in active_trades:
-            ex_id = (trade.get("exchangeId") or "binance").lower()
-            await self.stream_service.subscribe_ticker(ex_id, trade["symbol"])
+    async def stop_stream(self, ex_id: str, symbol: str):
+        await self.stream_service.unsubscribe(ex_id, symbol)
+        prefix = f"{ex_id}:{symbol}:"
+        for stream_key in [k for k in self._last_analyzed_per_bot if k.startswith(prefix)]:
+            del self._last_analyzed_per_bot[stream_key]
+        for stream_key in [k for k in self.inference_latency_ms if k.startswith(prefix)]:
+            del self.inference_latency_ms[stream_key]
+        # El estado incremental de features de un stream parado no se vuelve a usar aquí
+        self.ml_service.feature_cache.discard_stream(prefix)
 
     async def handle_market_update(self, event_type: str, data: Dict[str, Any]):
         if event_type == "ticker_update":
@@ -66,41 +94,36 @@ class SignalBotService:
 
         if not symbol or not last_price: return
 
-        # Filtrar bots que coincidan en SIMBOLO y EXCHANGE
-        active_trades = await db.trades.find({
-            "symbol": symbol, 
-            "status": {"$in": ["active", "open"]}
-        }).to_list(length=None)
-        
-        for trade in active_trades:
-            bot_exchange = (trade.get("exchangeId") or "binance").lower()
-            if bot_exchange == exchange_id:
-                await self._process_bot_tick(trade, current_price=last_price)
-                
-                # --- EMITR UPDATE EN VIVO ---
-                from api.src.adapters.driven.notifications.socket_service import socket_service
-                user_open_id = trade.get("userOpenId") # Debemos asegurar que este campo existe o conseguirlo
-                if not user_open_id:
-                    # Fallback: buscar usuario
-                    user = await db.users.find_one({"_id": trade.get("userId")})
-                    user_open_id = user["openId"] if user else None
+        # Trades abiertos de este SIMBOLO y EXCHANGE (índice en memoria)
+        for trade in self.routing_index.trades_for(exchange_id, symbol):
+            await self._process_bot_tick(trade, current_price=last_price)
+            
+            # --- EMITR UPDATE EN VIVO ---
+            from api.src.adapters.driven.notifications.socket_service import socket_service, bot_topic
+            user_open_id = trade.get("userOpenId") or self.routing_index.user_open_id(trade.get("userId"))
+            if not user_open_id:
+                # Fallback: usuario aún no resuelto por el índice
+                user = await db.users.find_one({"_id": trade.get("userId")})
+                user_open_id = user["openId"] if user else None
+            
+            if user_open_id:
+                # Calcular PnL de nuevo o reusar el del update
+                pnl = trade.get("pnl", 0) # Update_one lo actualizó en DB pero no en el objeto local 'trade'
+                # Re-calcular para el mensaje
+                entry_price = trade.get("entryPrice", 0)
+                side = trade.get("side", "BUY")
+                if entry_price > 0:
+                    pnl = ((last_price - entry_price) / entry_price) * 100 if side == "BUY" else ((entry_price - last_price) / entry_price) * 100
                 
-                if user_open_id:
-                    # Calcular PnL de nuevo o reusar el del update
-                    pnl = trade.get("pnl", 0) # Update_one lo actualizó en DB pero no en el objeto local 'trade'
-                    # Re-calcular para el mensaje
-                    entry_price = trade.get("entryPrice", 0)
-                    side = trade.get("side", "BUY")
-                    if entry_price > 0:
-                        pnl = ((last_price - entry_price) / entry_price) * 100 if side == "BUY" else ((entry_price - last_price) / entry_price) * 100
-                    
-                    await socket_service.emit_to_user(user_open_id, "bot_update", {
-                        "id": str(trade.get("botId")),
-                        "symbol": symbol,
-                        "currentPrice": last_price,
-                        "pnl": round(pnl, 2),
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
+                # Coalescido por bot: solo el último PnL de cada intervalo, y solo a su dueño
+                bot_id = str(trade.get("botId"))
+                await socket_service.publish(bot_topic(bot_id), "bot_update", {
+                    "id": bot_id,
+                    "symbol": symbol,
+                    "currentPrice": last_price,
+                    "pnl": round(pnl, 2),
+                    "timestamp": datetime.utcnow().isoformat()
+                }, owners=[user_open_id], private=True)
 
     async def _handle_candle_update(self, data: Dict[str, Any]):
         symbol = data["symbol"]
@@ -117,19 +140,8 @@ class SignalBotService:
         
         is_new_candle = last_ts != current_ts
         
-        # Buscar bots para este exchange específico
-        relevant_bots = await db.bot_instances.find({
-            "symbol": symbol, 
-            "timeframe": timeframe, 
-            "status": "active"
-        }).to_list(length=None)
-
-        if not relevant_bots: return
-        
-        bots_for_exchange = [
-            b for b in relevant_bots 
-            if (b.get("exchangeId") or b.get("exchange_id") or "binance").lower() == ex_id
-        ]
+        # Bots activos para este exchange/símbolo/timeframe (índice en memoria)
+        bots_for_exchange = self.routing_index.bots_for(ex_id, symbol, timeframe)
         
         if not bots_for_exchange: return
 
@@ -139,7 +151,7 @@ class SignalBotService:
         # --- EMISION DE VELA AL FRONTEND ---
         # Siempre emitimos para que el gráfico se mueva en vivo, 
         # pero la lógica de IA solo si la vela es nueva (cerró la anterior)
-        from api.src.adapters.driven.notifications.socket_service import socket_service
+        from api.src.adapters.driven.notifications.socket_service import socket_service, candle_topic
         
         candle_msg = {
             "symbol": symbol,
@@ -155,12 +167,10 @@ class SignalBotService:
             }
         }
         
-        processed_users = set()
-        for bot in bots_for_exchange:
-            uid = bot.get("user_id")
-            if uid and uid not in processed_users:
-                await socket_service.emit_to_user(uid, "candle_update", candle_msg)
-                processed_users.add(uid)
+        # Suscriptores del stream + dueños de bots sin suscripciones; coalescido por vela
+        owners = {bot.get("user_id") for bot in bots_for_exchange if bot.get("user_id")}
+        await socket_service.publish(candle_topic(ex_id, symbol, timeframe), "candle_update", candle_msg,
+                                     owners=owners, key=current_ts)
 
         # Lógica de IA (solo en cambio de timestamp: la vela anterior acaba de cerrar)
         if is_new_candle:
@@ -168,27 +178,52 @@ class SignalBotService:
             # Si no es None, significa que current_ts avanzó, por lo que analizamos la vela que acaba de cerrar.
             full_history = self.buffer_service.get_latest_data(ex_id, symbol, timeframe)
             if full_history is not None and not full_history.empty:
+                # Analizamos el dataframe excluyendo la vela actual (en formación), en lote para todos los bots
+                await self._execute_ai_batch(stream_key, bots_for_exchange, full_history.iloc[:-1])
                 for bot in bots_for_exchange:
-                    # Analizamos el dataframe excluyendo la vela actual (en formación)
-                    await self._execute_ai_pipeline(bot, full_history.iloc[:-1])
                     await db.bot_instances.update_one({"_id": bot["_id"]}, {"$set": {"lastCandleTimestamp": current_ts}})
+                    self.routing_index.patch_bot(bot["_id"], {"lastCandleTimestamp": current_ts})
             
             self._last_analyzed_per_bot[stream_key] = current_ts
 
-    async def _execute_ai_pipeline(self, bot: Dict[str, Any], candles_df: Any):
-        candles_list = candles_df.reset_index().to_dict('records')
+    async def _execute_ai_batch(self, stream_key: str, bots: List[Dict[str, Any]], candles_df: Any):
+        """
+        Inferencia en lote al cierre de vela: una pasada de indicadores y un model.predict por
+        estrategia para todos los bots del stream; luego cada bot despacha su señal.
+        """
+        started = time.perf_counter()
+        requests = [{
+            "key": i,
+            "strategy_name": bot.get("strategy_name", "auto"),
+            "market_type": bot.get("marketType", "spot"),
+            "current_position": bot.get('position', {"qty": 0, "avg_price": 0})
+        } for i, bot in enumerate(bots)]
+
+        symbol, timeframe = bots[0]["symbol"], bots[0]["timeframe"]
+        predictions = self.ml_service.predict_batch(symbol, timeframe, candles_df.reset_index(), requests, stream_key=stream_key)
+        inference_ms = (time.perf_counter() - started) * 1000
+
+        for i, bot in enumerate(bots):
+            await self._execute_ai_pipeline(bot, candles_df, prediction=predictions[i])
+
+        total_ms = (time.perf_counter() - started) * 1000
+        self.inference_latency_ms[stream_key] = {"bots": len(bots), "inference_ms": inference_ms, "total_ms": total_ms}
+        logger.info(f"⏱️ {stream_key}: {len(bots)} bots, inferencia {inference_ms:.1f} ms, total {total_ms:.1f} ms")
+
+    async def _execute_ai_pipeline(self, bot: Dict[str, Any], candles_df: Any, prediction: Dict[str, Any] = None):
         current_pos = bot.get('position', {"qty": 0, "avg_price": 0})
         # USAR ID DEL BOT
         exchange_id = (bot.get("exchangeId") or bot.get("exchange_id") or "binance").lower()
         
-        prediction = self.ml_service.predict(
-            symbol=bot["symbol"],
-            timeframe=bot["timeframe"],
-            candles=candles_list,
-            market_type=bot.get("marketType", "spot"),
-            strategy_name=bot.get("strategy_name", "auto"),
-            current_position=current_pos
-        )
+        if prediction is None:
+            prediction = self.ml_service.predict(
+                symbol=bot["symbol"],
+                timeframe=bot["timeframe"],
+                candles=candles_df.reset_index().to_dict('records'),
+                market_type=bot.get("marketType", "spot"),
+                strategy_name=bot.get("strategy_name", "auto"),
+                current_position=current_pos
+            )
         
         decision = prediction.get("decision", "HOLD")
         if decision in ["BUY", "SELL"]:
@@ -200,7 +235,7 @@ class SignalBotService:
             
             await self.engine.process_signal(bot_with_exchange, {
                 "signal": 1 if decision == "BUY" else 2,
-                "price": candles_list[-1]['close'],
+                "price": candles_df['close'].iloc[-1],
                 "confidence": prediction.get('confidence', 0),
                 "reasoning": prediction.get('reasoning', ''),
                 "is_alert": False
@@ -0,0 +1,210 @@
+"""
+Reparto de los bots en vivo entre varios procesos.
+
+Cada stream de mercado (exchange, símbolo) —y con él todos los bots y trades que cuelgan
+de sus velas y tickers— lo ejecuta un único worker, elegido por hashing consistente sobre
+los workers vivos. Así la inferencia de cientos de bots se reparte entre núcleos y un
+worker que entra o sale solo mueve ~1/N de los streams.
+
+Estado en Mongo:
+- bot_workers: un documento por worker con su último heartbeat.
+- bot_shards: la asignación vigente de cada stream (workerId), que funciona como lease:
+  un worker solo arranca un stream tras reclamarlo con una actualización condicional, y el
+  dueño anterior lo libera después de parar sus streams. Si un worker muere, su heartbeat
+  caduca (SHARD_WORKER_TTL) y los streams pasan a sus sucesores en el anillo.
+
+Un worker que se queda colgado más de SHARD_WORKER_TTL (p.ej. con el loop bloqueado por
+inferencia) puede haber perdido sus leases: en cada sync comprueba su propio heartbeat
+anterior y el lease de cada stream que ejecuta, y para los que ya no son suyos.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+from pymongo.errors import DuplicateKeyError
+from api.config import Config
+
+logger = logging.getLogger("BotSharding")
+
+Stream = Tuple[str, str]  # (exchange_id, symbol)
+StreamCallback = Callable[[str, str], Awaitable[None]]
+
+
+def stream_key(exchange_id: str, symbol: str) -> str:
+    return f"{exchange_id.lower()}:{symbol}"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Anillo de hashing consistente con `vnodes` puntos por worker."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = None):
+        vnodes = vnodes or Config.SHARD_VNODES
+        points = sorted((_hash(f"{node}#{i}"), node) for node in set(nodes) for i in range(vnodes))
+        self._points = [p for p, _ in points]
+        self._nodes = [n for _, n in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[i]
+
+
+class ShardCoordinator:
+    """
+    Asignación de streams a este worker. Cada SHARD_HEARTBEAT_SECONDS: renueva el heartbeat,
+    calcula el anillo con los workers vivos, libera los streams que ya no le tocan (tras
+    on_release) y reclama los que sí (antes de on_acquire).
+    """
+
+    def __init__(self, db_adapter=None, worker_id: str = None, heartbeat_seconds: float = None,
+                 worker_ttl: float = None, vnodes: int = None):
+        self._db = db_adapter
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_seconds = heartbeat_seconds or Config.SHARD_HEARTBEAT_SECONDS
+        self.worker_ttl = worker_ttl or Config.SHARD_WORKER_TTL
+        self.vnodes = vnodes or Config.SHARD_VNODES
+        self.owned: Set[Stream] = set()
+        self.live_workers: List[str] = []
+        self._streams: Callable[[], Iterable[Stream]] = lambda: ()
+        self._on_acquire: Optional[StreamCallback] = None
+        self._on_release: Optional[StreamCallback] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            from api.src.adapters.driven.persistence.mongodb import db as db_global
+            self._db = db_global
+        return self._db
+
+    def owns(self, exchange_id: str, symbol: str) -> bool:
+        return (exchange_id.lower(), symbol) in self.owned
+
+    async def start(self, streams: Callable[[], Iterable[Stream]], on_acquire: StreamCallback = None,
+                    on_release: StreamCallback = None):
+        """Primer reparto (bloqueante) y bucle de heartbeat en segundo plano."""
+        self._streams = streams
+        self._on_acquire = on_acquire
+        self._on_release = on_release
+        await self.sync()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Worker {self.worker_id}: {len(self.owned)} streams asignados de {len(self.live_workers)} workers")
+
+    async def stop(self):
+        """Salida ordenada: para y libera sus streams para que los demás los tomen ya."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for exchange_id, symbol in list(self.owned):
+            await self._release((exchange_id, symbol), delete=False)
+        await self.db.bot_workers.delete_one({"_id": self.worker_id})
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sincronizando shards: {e}")
+
+    async def sync(self) -> Tuple[List[Stream], List[Stream]]:
+        """Un ciclo de heartbeat + rebalanceo. Devuelve (adquiridos, liberados)."""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.worker_ttl)
+        released = await self._drop_lost_leases(cutoff)
+        await self.db.bot_workers.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"heartbeatAt": now, "pid": os.getpid(), "host": socket.gethostname()}},
+            upsert=True
+        )
+        workers = await self.db.bot_workers.find({"heartbeatAt": {"$gte": cutoff}}).to_list(length=None)
+        self.live_workers = sorted(w["_id"] for w in workers)
+        ring = HashRing(self.live_workers, self.vnodes)
+
+        wanted = {(ex.lower(), symbol) for ex, symbol in self._streams()}
+        for stream in sorted(self.owned):
+            if stream not in wanted:
+                await self._release(stream, delete=True)  # ya no hay bots ni trades en ese stream
+                released.append(stream)
+            elif ring.owner(stream_key(*stream)) != self.worker_id:
+                await self._release(stream, delete=False)  # rebalanceo: otro worker lo reclamará
+                released.append(stream)
+
+        acquired = []
+        for stream in sorted(wanted - self.owned):
+            if ring.owner(stream_key(*stream)) == self.worker_id and await self._claim(stream, now):
+                acquired.append(stream)
+        if acquired or released:
+            logger.info(f"Worker {self.worker_id}: +{len(acquired)} / -{len(released)} streams ({len(self.owned)} en total)")
+        return acquired, released
+
+    async def _drop_lost_leases(self, cutoff: datetime) -> List[Stream]:
+        """Para los streams cuyo lease ya no es de este worker (sin tocar Mongo: son de otro)."""
+        if not self.owned:
+            return []
+        me = await self.db.bot_workers.find_one({"_id": self.worker_id})
+        if me is None or me["heartbeatAt"] < cutoff:
+            # Hemos estado "muertos" para el resto: cualquier stream puede tener ya otro dueño
+            lost = set(self.owned)
+            logger.warning(f"Worker {self.worker_id}: heartbeat caducado, se paran sus {len(lost)} streams")
+        else:
+            keys = {stream_key(*s): s for s in self.owned}
+            leases = await self.db.bot_shards.find({"_id": {"$in": list(keys)}}).to_list(length=None)
+            mine = {lease["_id"] for lease in leases if lease.get("workerId") == self.worker_id}
+            lost = {stream for key, stream in keys.items() if key not in mine}
+            if lost:
+                logger.warning(f"Worker {self.worker_id}: {len(lost)} leases perdidos, se paran sus streams")
+        for stream in sorted(lost):
+            self.owned.discard(stream)
+            await self._stop(stream)
+        return sorted(lost)
+
+    async def _claim(self, stream: Stream, now: datetime) -> bool:
+        # Libre, ya nuestro, o de un worker sin heartbeat reciente
+        try:
+            await self.db.bot_shards.update_one(
+                {"_id": stream_key(*stream), "$or": [
+                    {"workerId": self.worker_id},
+                    {"workerId": None},
+                    {"workerId": {"$nin": self.live_workers}},
+                ]},
+                {"$set": {"workerId": self.worker_id, "exchange": stream[0], "symbol": stream[1], "assignedAt": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # su dueño anterior sigue vivo y aún no lo ha liberado
+        self.owned.add(stream)
+        if self._on_acquire:
+            try:
+                await self._on_acquire(*stream)
+            except Exception as e:
+                logger.error(f"Error arrancando stream {stream_key(*stream)}: {e}")
+        return True
+
+    async def _release(self, stream: Stream, delete: bool):
+        self.owned.discard(stream)
+        await self._stop(stream)
+        owned_by_me = {"_id": stream_key(*stream), "workerId": self.worker_id}
+        if delete:
+            await self.db.bot_shards.delete_one(owned_by_me)
+        else:
+            await self.db.bot_shards.update_one(owned_by_me, {"$set": {"workerId": None}})
+
+    async def _stop(self, stream: Stream):
+        if self._on_release:
+            try:
+                await self._on_release(*stream)
+            except Exception as e:
+                logger.error(f"Error parando stream {stream_key(*stream)}: {e}")
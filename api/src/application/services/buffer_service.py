@@ -1,13 +1,18 @@
 import pandas as pd
 import logging
 import asyncio
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 from api.src.adapters.driven.exchange.stream_service import MarketStreamService
 from api.src.application.services.cex_service import CEXService
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, ohlcv_store, timeframe_to_ms, WEEK_OFFSET_MS
+from api.src.domain.services.candle_ring_buffer import CandleRingBuffer
 
 logger = logging.getLogger(__name__)
 
+BUFFER_CAPACITY = 500 # Velas por (exchange, símbolo, timeframe)
+WEEK_OFFSET_NS = WEEK_OFFSET_MS * 1_000_000 # Las velas semanales abren en lunes (el epoch cae en jueves)
+
 class DataBufferService:
     _instance = None
     
@@ -17,13 +22,16 @@ class DataBufferService:
             cls._instance._initialized = False
         return cls._instance
     
-    def __init__(self, stream_service: MarketStreamService = None, cex_service: CEXService = None):
+    def __init__(self, stream_service: MarketStreamService = None, cex_service: CEXService = None, candle_store: OHLCVStore = None):
         if hasattr(self, '_initialized') and self._initialized:
             return
             
-        self.buffers: Dict[str, pd.DataFrame] = {} # Key: "exchange_symbol_timeframe"
+        self.buffers: Dict[str, CandleRingBuffer] = {} # Key: "exchange_symbol_timeframe"
+        # Índice (exchange, symbol) -> {timeframe: (duración ns, desfase ns, buffer)} para los ticks
+        self._symbol_index: Dict[Tuple[str, str], Dict[str, Tuple[int, int, CandleRingBuffer]]] = {}
         self.stream_service = stream_service or MarketStreamService()
         self.cex_service = cex_service or CEXService()
+        self.candle_store = candle_store or ohlcv_store
         self.lock = asyncio.Lock()
         
         # Subscribe to stream updates
@@ -34,10 +42,21 @@ class DataBufferService:
     def get_buffer_key(self, exchange_id: str, symbol: str, timeframe: str) -> str:
         return f"{exchange_id}_{symbol}_{timeframe}"
 
+    def _register_buffer(self, exchange_id: str, symbol: str, timeframe: str, buffer: CandleRingBuffer) -> CandleRingBuffer:
+        """Guarda el buffer y lo indexa por (exchange, symbol) para la agregación de ticks."""
+        self.buffers[self.get_buffer_key(exchange_id, symbol, timeframe)] = buffer
+        if timeframe.endswith('M'):
+            return buffer # Velas mensuales: duración variable, solo se actualizan con candle_update
+        tf_ns = timeframe_to_ms(timeframe) * 1_000_000
+        offset_ns = WEEK_OFFSET_NS if timeframe.endswith('w') else 0
+        self._symbol_index.setdefault((exchange_id, symbol), {})[timeframe] = (tf_ns, offset_ns, buffer)
+        return buffer
+
     async def initialize_buffer(self, exchange_id: str, symbol: str, timeframe: str = '15m', limit: int = 100):
         """
         WARM-UP: Descarga datos históricos REST para iniciar el buffer con datos.
         Evita el problema de 'Cold Start' donde la IA no tiene RSI/EMA inicial.
+        Lee del almacén local de velas: tras un reinicio solo se descarga la cola que falte.
         """
         key = self.get_buffer_key(exchange_id, symbol, timeframe)
         
@@ -49,15 +68,16 @@ class DataBufferService:
             logger.info(f"🔥 Initializing buffer (Warm-up) for {symbol} ({timeframe})")
             
             try:
-                # Usamos el CEX Service para la llamada REST síncrona/asíncrona inicial
-                # Assuming get_historical_candles returns list of [ts, o, h, l, c, v]
-                candles = await self.cex_service.get_historical_candles(exchange_id, symbol, timeframe, limit)
+                async def fetch(since: Optional[int], count: int) -> pd.DataFrame:
+                    # API pública (sin usuario), igual que get_historical_candles
+                    return await self.cex_service.get_historical_data(
+                        symbol, timeframe, limit=count, user_id=None, exchange_id=exchange_id, since=since
+                    )
+
+                df = await self.candle_store.get_latest(exchange_id, symbol, timeframe, limit, fetch)
                 
-                if candles:
-                    df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                    df.set_index('timestamp', inplace=True)
-                    self.buffers[key] = df
+                if not df.empty:
+                    self._register_buffer(exchange_id, symbol, timeframe, CandleRingBuffer.from_frame(df, BUFFER_CAPACITY))
                     logger.info(f"Buffer initialized for {key}: {len(df)} candles")
                 else:
                     logger.warning(f"No history found for {key}")
@@ -90,47 +110,27 @@ class DataBufferService:
         new_ts = pd.to_datetime(ts, unit='ms')
 
         async with self.lock:
-            if key not in self.buffers:
-                # Create new DF
-                df = pd.DataFrame([candle_data])
-                df['timestamp'] = new_ts
-                df.set_index('timestamp', inplace=True)
-                self.buffers[key] = df
-                return
-
-            df = self.buffers[key]
-            if df.empty:
-                # Should not happen if key in buffers usually, but safety check
-                 df = pd.DataFrame([candle_data])
-                 df['timestamp'] = new_ts
-                 df.set_index('timestamp', inplace=True)
-                 self.buffers[key] = df
-                 return
-
-            last_ts = df.index[-1]
-
-            if new_ts > last_ts:
-                # Append new candle
-                # Ensure columns match
-                new_row = pd.DataFrame([candle_data])
-                new_row['timestamp'] = new_ts
-                new_row.set_index('timestamp', inplace=True)
-
-                # Use pd.concat
-                self.buffers[key] = pd.concat([df, new_row])
-
-                # Keep buffer size manageable (e.g. last 500)
-                if len(self.buffers[key]) > 500:
-                    self.buffers[key] = self.buffers[key].iloc[-500:]
-
-            elif new_ts == last_ts:
-                # Update existing (Re-close / Correction)
-                # Map dict keys to columns
-                for col in ['open', 'high', 'low', 'close', 'volume']:
-                    if col in candle_data:
-                        df.at[new_ts, col] = candle_data[col]
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = self._register_buffer(exchange_id, symbol, timeframe, CandleRingBuffer(BUFFER_CAPACITY))
+
+            last_ts = buffer.last_timestamp
+
+            if last_ts is None or new_ts > last_ts:
+                # Append new candle (O(1), sin realocar; descarta la más antigua al llenarse)
+                buffer.append(new_ts, candle_data)
+
+            else:
+                # Re-cierre / corrección de una vela ya en el buffer: la última, o la recién
+                # cerrada cuando un tick ya abrió la siguiente (su cierre llega después)
+                buffer.update_at(new_ts, **{col: candle_data[col] for col in ['open', 'high', 'low', 'close', 'volume'] if col in candle_data})
 
     async def update_with_ticker(self, data: Dict):
+        """
+        Agrega el tick a cada timeframe del símbolo: el timestamp se lleva al inicio de su
+        vela, se abre una vela nueva al cruzar la frontera y si no se actualiza high/low/close
+        de la actual. Los buffers se encuentran por (exchange, symbol): O(timeframes) por tick.
+        """
         exchange_id = data.get("exchange")
         symbol = data.get("symbol")
         ticker = data.get("ticker", {})
@@ -140,36 +140,19 @@ class DataBufferService:
         if not price or not timestamp:
             return
 
-        # Update all timeframes for this symbol
-        # This is a simplification. Real implementation needs candle boundaries logic.
-        curr_time = pd.to_datetime(timestamp, unit='ms')
+        timeframes = self._symbol_index.get((exchange_id, symbol))
+        if not timeframes:
+            return
+
+        tick_ns = int(timestamp) * 1_000_000
+        price = float(price)
         
         async with self.lock:
-            for key, df in self.buffers.items():
-                if key.startswith(f"{exchange_id}_{symbol}_"):
-                    # Logic: 
-                    # 1. Check if current time belongs to the last candle
-                    # 2. If yes, update Close, High, Low
-                    # 3. If no (new candle), append new row
-                    
-                    if df.empty:
-                        continue
-                        
-                    last_idx = df.index[-1]
-                    # Simple check: If difference is small enough, it's same candle? 
-                    # No, need explicit timeframe logic (e.g. 15m boundaries)
-                    # For now, simplistic "update last" approach for responsiveness
-                    
-                    # Update High/Low
-                    df.at[last_idx, 'close'] = price
-                    if price > df.at[last_idx, 'high']:
-                        df.at[last_idx, 'high'] = price
-                    if price < df.at[last_idx, 'low']:
-                        df.at[last_idx, 'low'] = price
-                    
-                    # Update Volume? Ticker volume is 24h usually, not candle volume. 
-                    # Ignoring volume update from ticker for now.
+            for tf_ns, offset_ns, buffer in timeframes.values():
+                buffer.apply_tick(tick_ns - (tick_ns - offset_ns) % tf_ns, price)
 
     def get_latest_data(self, exchange_id: str, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """DataFrame de la ventana actual; se construye solo si el buffer cambió desde la última lectura."""
         key = self.get_buffer_key(exchange_id, symbol, timeframe)
-        return self.buffers.get(key)
+        buffer = self.buffers.get(key)
+        return buffer.to_frame() if buffer is not None else None
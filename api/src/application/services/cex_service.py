@@ -206,7 +206,7 @@ class CEXService:
     async def fetch_positions(self, user_id: str, symbols: Optional[List[str]] = None, exchange_id: Optional[str] = None) -> List[Dict[str, Any]]:
         return []
 
-    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 1500, use_random_date: bool = False, user_id: str = "default_user", exchange_id: str = "binance") -> Any:
+    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 1500, use_random_date: bool = False, user_id: str = "default_user", exchange_id: str = "binance", since: Optional[int] = None) -> Any:
         import pandas as pd
         try:
             return await self.ccxt_provider.get_historical_data(
@@ -215,7 +215,8 @@ class CEXService:
                 limit=limit,
                 use_random_date=use_random_date,
                 user_id=user_id,
-                exchange_id=exchange_id 
+                exchange_id=exchange_id,
+                since=since
             )
         except Exception as e:
             logger.error(f"Error CEXService.get_historical_data for {symbol} on {exchange_id}: {e}")
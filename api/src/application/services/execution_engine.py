@@ -5,6 +5,7 @@ from bson import ObjectId
 from api.src.application.services.simulation_service import SimulationService
 from api.src.domain.strategies.base import BaseStrategy
 from api.src.adapters.driven.persistence.mongodb import update_virtual_balance
+from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
 
 class ExecutionEngine:
     """
@@ -369,17 +370,20 @@ class ExecutionEngine:
         }
 
     async def _update_bot_db(self, bot_id, side, qty, price, pnl):
+        fields = {
+            "side": side,
+            "position": {"qty": float(qty), "avg_price": float(price)},
+            "last_execution": datetime.utcnow()
+        }
+        increments = {"total_pnl": float(pnl)}
         await self.db.db["bot_instances"].update_one(
             {"_id": ObjectId(bot_id)},
             {
-                "$set": {
-                    "side": side,
-                    "position": {"qty": float(qty), "avg_price": float(price)},
-                    "last_execution": datetime.utcnow()
-                },
-                "$inc": {"total_pnl": float(pnl)}
+                "$set": fields,
+                "$inc": increments
             }
         )
+        bot_routing_index.patch_bot(bot_id, fields, inc=increments)
 
     def _calculate_realized_pnl_value(self, bot, exit_price):
         pos = bot.get('position', {})
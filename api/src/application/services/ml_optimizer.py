@@ -1,6 +1,4 @@
 import logging
-import asyncio
-from typing import List
 
 logger = logging.getLogger("MLOptimizer")
 
@@ -9,9 +7,12 @@ class MLOptimizer:
     Tarea 8.1: AutoML Retraining Pipeline
     Programar un re-entrenamiento automático de los modelos .pkl si el Win Rate cae por debajo del 45%.
     """
-    def __init__(self, db_adapter, ml_service):
+    def __init__(self, db_adapter, ml_service, training_queue=None):
         self.db = db_adapter
         self.ml_service = ml_service
+        if training_queue is None:
+            from api.src.application.services.training_jobs import training_queue
+        self.training_queue = training_queue
         self.threshold_win_rate = 0.45
 
     async def check_and_retrain(self, bot_id: str):
@@ -51,19 +52,22 @@ class MLOptimizer:
                      symbol = bot['symbol']
                      timeframe = bot.get('timeframe', '1h')
                      
-                     # Dispara la Tarea 5.1 (Entrenamiento consciente) con nuevos datos
-                     # Usamos una función del MLService que soporte esto, o lo invocamos directamente.
-                     # Por simplicidad y siguiendo el plan, asumimos que ml_service tiene 'run_professional_training'
-                     # o usamos el trainer.
-                     
+                     # Dispara la Tarea 5.1 (Entrenamiento consciente) con nuevos datos:
+                     # se encola en la cola de entrenamiento (deduplicada y con workers acotados),
+                     # refrescando el snapshot del dataset con las velas más recientes.
                      logger.info(f"🚀 Triggering re-training for {symbol} {timeframe}")
+                     params = {
+                         "symbols": [symbol],
+                         "timeframe": timeframe,
+                         "days": 365,
+                         "market": bot.get('market_type', 'spot').lower(),
+                         "exchange": (bot.get('exchangeId') or bot.get('exchange_id') or 'binance').lower(),
+                         "refresh_data": True,
+                     }
+                     job, created = await self.training_queue.submit(params, requested_by="automl")
                      
-                     # Nota: Esto podría tardar, idealmente debería ser una tarea de fondo (Celery/BackgroundTasks)
-                     # Aquí lo llamamos 'await' simulando el proceso
-                     # await self.ml_service.run_professional_training([symbol], timeframe)
-                     # Para no bloquear, lo correcto sería encolarlo.
-                     
-                     logger.info(f"✅ AutoML scheduled for {symbol}")
+                     logger.info(f"✅ AutoML {'scheduled' if created else 'already queued'} for {symbol} (job {job['id']})")
+                     return job
 
         except Exception as e:
             logger.error(f"Error in AutoML check for {bot_id}: {e}")
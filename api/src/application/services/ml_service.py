@@ -1,13 +1,18 @@
 import logging
 import pandas as pd
+import numpy as np
 import os
-import joblib
 import importlib
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from api.src.domain.services import backtest_metrics
 from api.src.domain.services.strategy_trainer import StrategyTrainer
 from api.src.domain.services.exchange_port import ExchangePort
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.incremental_indicators import IncrementalFeatureCache
+from api.src.infrastructure.ai.flat_forest import FlatForest
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, ohlcv_store
+from api.src.adapters.driven.persistence.dataset_snapshots import DatasetSnapshotStore, contract_hash, dataset_snapshots
 
 class MLService:
     """
@@ -18,9 +23,16 @@ class MLService:
     Ahora actúa como un puente limpio que recolecta datos y delega la 'inteligencia' 
     al StrategyTrainer y las estrategias dinámicas.
     """
-    def __init__(self, exchange_adapter: ExchangePort, trainer: StrategyTrainer = None):
+    def __init__(self, exchange_adapter: ExchangePort, trainer: StrategyTrainer = None, candle_store: OHLCVStore = None, snapshots: DatasetSnapshotStore = None):
         self.exchange = exchange_adapter
         self.trainer = trainer or StrategyTrainer()
+        self.candle_store = candle_store or ohlcv_store
+        # Snapshots de entrenamiento sobre el mismo almacén de velas
+        if snapshots is None:
+            snapshots = dataset_snapshots if self.candle_store is ohlcv_store else DatasetSnapshotStore(candle_store=self.candle_store)
+        self.snapshots = snapshots
+        # Estado de indicadores por stream para la inferencia en vivo
+        self.feature_cache = IncrementalFeatureCache()
         self.logger = logging.getLogger("MLService")
         self.models_dir = "api/data/models"
         # Import ModelManager (Singleton)
@@ -32,50 +44,71 @@ class MLService:
         symbols: List[str], 
         timeframe: str, 
         user_id: str = "default_user",
-        socket_callback = None
-    ) -> Dict[str, pd.DataFrame]:
+        socket_callback = None,
+        exchange_id: str = "binance",
+        market_type: str = "spot",
+        refresh: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, pd.DataFrame]]:
         """
         Método centralizado para obtener datos históricos de entrenamiento.
-        Usa API pública con fechas aleatorias para robustez.
+        Los datasets se materializan como snapshots versionados: un reentrenamiento con los
+        mismos símbolos reutiliza la última versión sin llamar al exchange. Los símbolos
+        nuevos parten de una fecha aleatoria (ventana de 2000 velas) y con refresh solo se
+        descargan las velas cerradas posteriores al final del snapshot.
         
         Args:
             symbols: Lista de símbolos a obtener
             timeframe: Timeframe de las velas (e.g., '1h', '4h')
             user_id: ID del usuario para logs
             socket_callback: Callback opcional para emitir logs via socket
+            exchange_id: Exchange del que se obtienen (y con el que se indexan) las velas
+            market_type: Mercado cuyo contrato de features se registra en el manifest
+            refresh: Añadir las velas nuevas al snapshot (nueva versión)
             
         Returns:
-            Dict con {symbol: DataFrame} de datos históricos
+            (manifest del snapshot, Dict con {symbol: DataFrame} de datos históricos)
         """
-        data_collection = {}
-        
-        for symbol in symbols:
-            try:
-                # Usamos random_date=True para el entrenamiento y API pública
-                df = await self.exchange.get_historical_data(
+        def fetch_for(symbol: str):
+            async def fetch(window_since: Optional[int], count: int) -> pd.DataFrame:
+                return await self.exchange.get_historical_data(
                     symbol, 
                     timeframe, 
-                    limit=2000, 
-                    use_random_date=True, 
-                    user_id=user_id
+                    limit=count, 
+                    since=window_since, 
+                    user_id=user_id,
+                    exchange_id=exchange_id
                 )
-                
-                if not df.empty:
-                    data_collection[symbol] = df
-                    self.logger.info(f"Dataset de entrenamiento listo para {symbol}: {len(df)} velas.")
-                    if socket_callback:
-                        await socket_callback(f"📉 Loaded {len(df)} candles for {symbol}", "info")
-            except Exception as e:
-                self.logger.error(f"No se pudo obtener datos para {symbol}: {e}")
-                if socket_callback:
-                    await socket_callback(f"⚠️ Failed to load data for {symbol}: {e}", "warning")
+            return fetch
+
+        try:
+            features_hash = contract_hash(self.trainer.feature_contract(market_type))
+            manifest, data_collection = await self.snapshots.materialize(
+                exchange_id, symbols, timeframe, fetch_for, features_hash,
+                market_type=market_type, limit=2000, refresh=refresh
+            )
+        except Exception as e:
+            self.logger.error(f"No se pudo materializar el dataset de entrenamiento: {e}")
+            if socket_callback:
+                await socket_callback(f"⚠️ Failed to load training dataset: {e}", "warning")
+            return None, {}
+
+        for symbol, df in data_collection.items():
+            self.logger.info(f"Dataset de entrenamiento listo para {symbol}: {len(df)} velas.")
+            if socket_callback:
+                await socket_callback(f"📉 Loaded {len(df)} candles for {symbol}", "info")
+        missing = [s for s in symbols if s not in data_collection]
+        if missing and socket_callback:
+            await socket_callback(f"⚠️ Failed to load data for {', '.join(missing)}", "warning")
+        if manifest and socket_callback:
+            await socket_callback(f"🗂️ Dataset snapshot {manifest['dataset_id']} v{manifest['version']}", "info")
         
-        return data_collection
+        return manifest, data_collection
 
     async def _run_strategy_backtest(self, strategy_name: str, data: Dict[str, pd.DataFrame], market_type: str = "spot") -> Dict[str, Any]:
         """
         Ejecuta un backtest simulado para una estrategia específica usando su .pkl si existe.
-        Calcula PnL acumulado, tasa de acierto y número de operaciones.
+        Calcula PnL acumulado, tasa de acierto, número de operaciones y las métricas de
+        riesgo (drawdown, Sharpe/Sortino, profit factor) sobre los retornos de todos los símbolos.
         """
         try:
             # Load model and strategy from Memory
@@ -91,6 +124,7 @@ class MLService:
             total_pnl = 0.0
             trades_count = 0
             winning_trades = 0
+            returns_by_symbol = []
             
             for symbol, df in data.items():
                 processed = strategy.apply(df.copy())
@@ -118,35 +152,45 @@ class MLService:
                 total_pnl += strat_returns.sum()
                 trades_count += (predictions != 0).sum()
                 winning_trades += (strat_returns > 0).sum()
+                returns_by_symbol.append(strat_returns)
 
             if trades_count == 0: return None
 
+            # Símbolos encadenados en una sola serie (mismo timeframe para todos)
+            returns = pd.concat(returns_by_symbol)
             return {
                 "name": strategy_name,
                 "pnl": round(total_pnl * 100, 2), # Percentage
                 "trades": int(trades_count),
-                "win_rate": round((winning_trades / trades_count * 100), 2)
+                "win_rate": round((winning_trades / trades_count * 100), 2),
+                **backtest_metrics.metrics_from_returns(returns.to_numpy(), returns_by_symbol[0].index)
             }
         except Exception as e:
             self.logger.error(f"Error backtesting {strategy_name}: {e}")
             return None
 
-    async def train_all_strategies(self, symbols: List[str], timeframe: str, days: int, market_type: str = "spot", user_id: str = "default_user") -> Dict[str, Any]:
+    async def train_all_strategies(self, symbols: List[str], timeframe: str, days: int, market_type: str = "spot", user_id: str = "default_user", refresh_data: bool = False, exchange_id: str = "binance", log_callback=None, progress_callback=None) -> Dict[str, Any]:
         """
         Ciclo de entrenamiento masivo y agnóstico segmentado por mercado.
         Orquesta la obtención de datos + Entrenamiento de Modelos de Estategia.
+        log_callback(msg, type) recibe los mismos mensajes que el socket del usuario y
+        progress_callback(terminadas, total) el avance por estrategia (cola de entrenamiento).
         """
         self.logger.info(f"Iniciando orquestación de entrenamiento para {len(symbols)} activos (User: {user_id}).")
 
         # Callback para sockets
         async def socket_callback(msg: str, type: str = "info"):
+            if log_callback:
+                await log_callback(msg, type)
             if user_id and user_id != "default_user":
                 from api.src.adapters.driven.notifications.socket_service import socket_service
                 await socket_service.emit_to_user(user_id, "training_log", {"message": msg, "type": type})
 
-        # 1. Obtención de Datasets (con fechas aleatorias para robustez)
+        # 1. Obtención de Datasets (snapshot versionado; fechas aleatorias solo la primera vez)
         # Usar el método centralizado para obtener datos
-        data_collection = await self._fetch_training_data(symbols, timeframe, user_id, socket_callback)
+        manifest, data_collection = await self._fetch_training_data(
+            symbols, timeframe, user_id, socket_callback, exchange_id=exchange_id, market_type=market_type, refresh=refresh_data
+        )
 
         if not data_collection:
             await socket_callback("❌ Training failed: No data collected.", "error")
@@ -154,7 +198,7 @@ class MLService:
 
         try:
             # 2. Entrenar Modelos de Estrategia Individuales
-            trained_models = await self.trainer.train_all(data_collection, market_type=market_type, emit_callback=socket_callback)
+            trained_models = await self.trainer.train_all(data_collection, market_type=market_type, emit_callback=socket_callback, progress_callback=progress_callback)
             self.logger.info(f"Modelos de estrategia ({market_type}) entrenados: {len(trained_models)}")
             
             # 3. Entrenar Meta-Modelo (Selector) - YA NO ES AUTOMÁTICO
@@ -164,7 +208,8 @@ class MLService:
                 "status": "success",
                 "trained_count": len(trained_models),
                 "models_generated": trained_models,
-                "symbols_used": list(data_collection.keys())
+                "symbols_used": list(data_collection.keys()),
+                "dataset": {"id": manifest["dataset_id"], "version": manifest["version"], "contract_hash": manifest["contract_hash"]}
             }
         except Exception as e:
             self.logger.error(f"Fallo crítico en el proceso de entrenamiento: {e}")
@@ -184,16 +229,41 @@ class MLService:
             return {"strategy": "HOLD", "confidence": 0.0, "reason": "No data"}
             
         df = pd.DataFrame(candles)
-        
-        # Inferencia para estrategias específicas
-        if strategy_name != "auto":
-            target_strategies = [strategy_name]
-        else:
-            target_strategies = self.trainer.discover_strategies(market_type)
-            
-        final_results = {}
-        
-        for strat_name in target_strategies:
+        request = {"key": None, "strategy_name": strategy_name, "market_type": market_type, "current_position": current_position}
+        return self.predict_batch(symbol, timeframe, df, [request])[None]
+
+    def predict_batch(self, symbol: str, timeframe: str, df: pd.DataFrame, requests: List[Dict[str, Any]], stream_key: str = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        Inferencia de varios bots sobre la misma vela (mismo stream).
+
+        requests: [{"key", "strategy_name", "market_type", "current_position"}]. Los indicadores
+        se calculan una sola vez por (estrategia, mercado) y el contexto de posición de cada bot
+        se apila en una matriz para una única llamada a model.predict por estrategia.
+        Con stream_key (p. ej. exchange:symbol:timeframe) las estrategias con modo incremental
+        solo calculan la fila de la vela nueva; sin él, o si no lo soportan, se usa apply() completo.
+        Devuelve {key: resultado} con el mismo formato que predict().
+        """
+        if df.empty:
+            return {r["key"]: {"strategy": "HOLD", "confidence": 0.0, "reason": "No data"} for r in requests}
+
+        current_price = df.iloc[-1]['close']
+
+        # 1. Estrategias objetivo por bot y agrupación por (estrategia, mercado)
+        targets: Dict[Any, List[str]] = {}
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for req in requests:
+            market_type = req.get("market_type", "spot")
+            strategy_name = req.get("strategy_name", "auto")
+            if strategy_name != "auto":
+                targets[req["key"]] = [strategy_name]
+            else:
+                targets[req["key"]] = self.trainer.discover_strategies(market_type)
+            for strat_name in targets[req["key"]]:
+                groups.setdefault((strat_name, market_type), []).append(req)
+
+        # 2. Un apply + un predict por grupo
+        actions: Dict[tuple, Dict[Any, str]] = {}
+        for (strat_name, market_type), group in groups.items():
             try:
                 # Optimized for Sprint 2: Load from Memory
                 model = self.model_manager.get_model(strat_name, market_type)
@@ -204,57 +274,77 @@ class MLService:
                 if not StrategyClass: continue
                 strategy = StrategyClass()
                 
-                # S9: Pasar current_position a la estrategia
-                df_features = strategy.apply(df.copy(), current_position=current_position)
-                
-                # S9.3: Inyectar Contexto de Posición para el Modelo (Match Training)
-                pos = current_position or {}
-                in_pos = 1 if pos.get('qty', 0) > 0 else 0
-                avg_price = pos.get('avg_price', 0)
-                current_price = df.iloc[-1]['close']
-                current_pnl = (current_price - avg_price) / avg_price if avg_price > 0 else 0.0
+                # Los indicadores no dependen de la posición (ninguna estrategia la usa en apply):
+                # se calculan una vez y se comparten entre todos los bots del grupo
+                base_features = strategy.get_features()
+                latest = None
+                if stream_key is not None:
+                    latest = self.feature_cache.latest((stream_key, strat_name, market_type), strategy, df)
                 
-                df_features['in_position'] = in_pos
-                df_features['current_pnl'] = current_pnl
+                if latest is not None:
+                    last_features = np.array([[latest[c] for c in base_features]], dtype=np.float64)
+                else:
+                    df_features = strategy.apply(df.copy())
+                    if df_features.empty or not all(c in df_features.columns for c in base_features): continue
+                    last_features = df_features.iloc[[-1]][base_features].to_numpy()
                 
-                base_features = strategy.get_features() 
-                features = base_features + ['in_position', 'current_pnl']
+                # S9.3: Contexto de Posición por bot (Match Training), apilado en una matriz
+                context = np.array([self._position_context(r.get("current_position"), current_price) for r in group], dtype=np.float64)
+                X = np.hstack([np.repeat(last_features.astype(np.float64), len(group), axis=0), context])
+                if not isinstance(model, FlatForest):
+                    # sklearn valida los nombres de columnas; el bosque plano recibe la matriz directa
+                    X = pd.DataFrame(X, columns=base_features + ['in_position', 'current_pnl'])
                 
-                if df_features.empty or not all(c in df_features.columns for c in features): continue
+                preds = model.predict(X)
                 
-                last_row = df_features.iloc[[-1]][features]
-                pred = model.predict(last_row)[0]
+                group_actions = {}
+                for req, pred in zip(group, preds):
+                    action = "HOLD"
+                    if pred == BaseStrategy.SIGNAL_BUY: action = "BUY"
+                    elif pred == BaseStrategy.SIGNAL_SELL: action = "SELL"
+                    group_actions[req["key"]] = action
+                actions[(strat_name, market_type)] = group_actions
                 
-                action = "HOLD"
-                if pred == BaseStrategy.SIGNAL_BUY: action = "BUY"
-                elif pred == BaseStrategy.SIGNAL_SELL: action = "SELL"
-                
-                final_results[strat_name] = {"action": action}
-                
-            except: continue
+            except Exception as e:
+                self.logger.debug(f"Inferencia fallida para {strat_name} ({symbol} {timeframe}): {e}")
+                continue
+
+        # 3. Decisión final por bot
+        results = {}
+        for req in requests:
+            key = req["key"]
+            market_type = req.get("market_type", "spot")
+            strategy_name = req.get("strategy_name", "auto")
+            target_strategies = targets[key]
+
+            final_results = {
+                strat_name: {"action": actions[(strat_name, market_type)][key]}
+                for strat_name in target_strategies
+                if key in actions.get((strat_name, market_type), {})
+            }
             
-        # Determinar decisión final
-        decision = "HOLD"
-        strategy_used = strategy_name
-        
-        if strategy_name != "auto":
-            decision = final_results.get(strategy_name, {}).get("action", "HOLD")
-        else:
-            # CORRECCIÓN: Usar target_strategies
-            if target_strategies:
+            decision = "HOLD"
+            if strategy_name != "auto":
+                decision = final_results.get(strategy_name, {}).get("action", "HOLD")
+            elif target_strategies:
                 # Por ahora tomamos la primera, pero aquí podrías filtrar por la que tenga mayor 'confidence'
-                best_strat = target_strategies[0] 
-                decision = final_results.get(best_strat, {}).get("action", "HOLD")
-                strategy_used = best_strat
-            else:
-                decision = "HOLD"
-            
-        return {
-            "symbol": symbol,
-            "decision": decision,
-            "analysis": final_results,
-            "strategy_used": strategy_name
-        }
+                decision = final_results.get(target_strategies[0], {}).get("action", "HOLD")
+                
+            results[key] = {
+                "symbol": symbol,
+                "decision": decision,
+                "analysis": final_results,
+                "strategy_used": strategy_name
+            }
+        return results
+
+    @staticmethod
+    def _position_context(current_position: Dict, current_price: float):
+        pos = current_position or {}
+        in_pos = 1 if pos.get('qty', 0) > 0 else 0
+        avg_price = pos.get('avg_price', 0)
+        current_pnl = (current_price - avg_price) / avg_price if avg_price > 0 else 0.0
+        return in_pos, current_pnl
 
     async def get_models_status(self, market_type: str = "spot") -> List[Dict[str, Any]]:
         """
@@ -7,6 +7,7 @@ from api.src.application.services.cex_service import CEXService
 from api.src.application.services.dex_service import DEXService
 from bson import ObjectId
 from typing import Optional
+from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
 
 logger = logging.getLogger(__name__)
 
@@ -128,6 +129,8 @@ class MonitorService:
             }
         )
 
+        bot_routing_index.remove_trade(trade["_id"])
+
         # Actualizar balance virtual del usuario
         # Buscamos el openId del usuario
         user = await db.users.find_one({"_id": trade["userId"]})
@@ -156,7 +159,7 @@ class MonitorService:
         from api.src.infrastructure.telegram.telegram_bot_manager import bot_manager
         from api.src.adapters.driven.persistence.mongodb import get_app_config
 
-        active_users = socket_service.active_connections.keys()
+        active_users = socket_service.connected_users()
         if not active_users:
             return
 
@@ -2,6 +2,7 @@ import logging
 from datetime import datetime
 from bson import ObjectId
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
 
 class SimulationService:
     """
@@ -56,5 +57,6 @@ class SimulationService:
             {"_id": ObjectId(bot_id)},
             {"$set": {"position": updated_pos, "last_execution": trade_log}}
         )
+        bot_routing_index.patch_bot(bot_id, {"position": updated_pos, "last_execution": trade_log})
 
         return trade_log
@@ -0,0 +1,145 @@
+"""
+Unidades de trabajo del barrido de parámetros (sweep).
+
+Cada punto del barrido es (parámetros de la estrategia, hiperparámetros del RandomForest):
+la estrategia calcula sus patrones sobre el histórico, el modelo se entrena con el primer
+tramo (train_fraction) y se simula fuera de muestra sobre el resto con BacktestSimulator.
+
+Igual que strategy_tournament, son funciones de módulo picklables (ThreadPool o ProcessPool).
+Un job evalúa un bloque de puntos con una única caché de indicadores: los puntos que
+comparten parámetros de estrategia reutilizan los mismos patrones y los que solo difieren
+en algún parámetro reutilizan los indicadores comunes (p.ej. la media de 20 velas).
+"""
+import itertools
+import logging
+import random
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Type
+from sklearn.ensemble import RandomForestClassifier
+from api.src.domain.services import backtest_metrics
+from api.src.domain.services.backtest_simulator import BacktestSimulator
+from api.src.domain.services.indicator_cache import IndicatorCache, market_frame
+from api.src.domain.services.position_context import inject_backtest_context, inject_training_context
+from api.src.domain.strategies.base import BaseStrategy
+from api.src.application.services.strategy_tournament import calculate_accuracy
+
+logger = logging.getLogger("StrategySweep")
+
+# Hiperparámetros con los que StrategyTrainer entrena los modelos en producción
+DEFAULT_MODEL_PARAMS = {"n_estimators": 150, "max_depth": 10}
+CONTEXT_FEATURES = ['in_position', 'current_pnl']
+# Métricas por las que se puede ordenar el barrido
+RANK_METRICS = backtest_metrics.RANK_METRICS + ("accuracy",)
+RISK_METRICS = ("max_drawdown", "sharpe_ratio", "sortino_ratio", "profit_factor", "exposure_pct")
+
+Point = Tuple[Dict[str, Any], Dict[str, Any]]
+
+
+def expand_grid(space: Optional[Dict[str, List[Any]]]) -> List[Dict[str, Any]]:
+    """Producto cartesiano de {parámetro: [valores]} (un único punto vacío si no hay espacio)."""
+    if not space:
+        return [{}]
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def build_points(strategy_space: Dict[str, List[Any]] = None, model_space: Dict[str, List[Any]] = None,
+                 search: str = "grid", n_iter: int = 20, seed: int = 42) -> List[Point]:
+    """
+    Puntos del barrido. "grid" evalúa todas las combinaciones; "random" toma n_iter
+    combinaciones distintas al azar (reproducible con seed).
+    """
+    points = [(s, {**DEFAULT_MODEL_PARAMS, **m}) for s in expand_grid(strategy_space) for m in expand_grid(model_space)]
+    if search == "random" and n_iter < len(points):
+        points = random.Random(seed).sample(points, n_iter)
+    elif search not in ("grid", "random"):
+        raise ValueError(f"Búsqueda no soportada: {search}")
+    return points
+
+
+def chunk_points(points: List[Point], n_chunks: int) -> List[List[Point]]:
+    """Reparte los puntos en bloques contiguos, agrupando los que comparten parámetros de estrategia."""
+    ordered = sorted(points, key=lambda p: repr(sorted(p[0].items())))
+    size = max(1, -(-len(ordered) // max(1, n_chunks)))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def evaluate_sweep_points(
+    df: pd.DataFrame,
+    strat_name: str,
+    StrategyClass: Type[BaseStrategy],
+    points: List[Point],
+    initial_balance: float,
+    step_investment: float,
+    train_fraction: float = 0.7
+) -> List[Dict[str, Any]]:
+    """Evalúa un bloque de puntos del barrido. Devuelve una fila por punto (con 'error' si falla)."""
+    cache = IndicatorCache()
+    market = market_frame(df)
+    frames: Dict[str, Optional[Tuple[pd.DataFrame, List[str]]]] = {}
+    split = int(len(df) * train_fraction)
+    rows = []
+
+    for strategy_params, model_params in points:
+        row = {"strategy": strat_name, "strategy_params": strategy_params, "model_params": model_params}
+        try:
+            key = repr(sorted(strategy_params.items()))
+            if key not in frames:
+                strategy = StrategyClass(dict(strategy_params))
+                strategy.bind_indicators(cache, strat_name)
+                processed = strategy.apply(market.copy(deep=False))
+                features = strategy.get_features()
+                frames[key] = (processed, features) if all(c in processed.columns for c in features) else None
+            if frames[key] is None:
+                rows.append({**row, "error": "missing features"})
+                continue
+            processed, features = frames[key]
+            rows.append({**row, **fit_and_simulate(processed, features, model_params, split, initial_balance, step_investment)})
+        except Exception as e:
+            logger.warning(f"Punto {strategy_params} / {model_params} de {strat_name} falló: {e}")
+            rows.append({**row, "error": str(e)})
+
+    logger.info(f"Sweep {strat_name}: {len(points)} puntos, {cache.computed} indicadores calculados, {cache.hits} reutilizados")
+    return rows
+
+
+def fit_and_simulate(processed: pd.DataFrame, features: List[str], model_params: Dict[str, Any], split: int,
+                      initial_balance: float, step_investment: float) -> Dict[str, Any]:
+    """Entrena con el tramo inicial y simula fuera de muestra sobre el resto."""
+    model_features = features + CONTEXT_FEATURES
+
+    train = inject_training_context(processed.iloc[:split].dropna(subset=features + ['signal']))
+    if train.empty or train['signal'].nunique() < 2:
+        return {"error": "not enough training signals"}
+    model = RandomForestClassifier(**{"random_state": 42, **model_params})
+    model.fit(train[model_features], train['signal'])
+
+    test = inject_backtest_context(processed.iloc[split:].copy())
+    valid = test[model_features].dropna().index
+    if not len(valid):
+        return {"error": "empty test window"}
+    predictions = model.predict(test.loc[valid, model_features])
+    test['ai_signal'] = 0
+    test.loc[valid, 'ai_signal'] = predictions
+
+    result = BacktestSimulator(initial_balance=initial_balance, trade_amount=step_investment).run(test)
+    metrics = backtest_metrics.compute_metrics(result, test.index, test['close'].to_numpy(dtype=float), initial_balance)
+    return {
+        "profit_pct": result["profit_pct"],
+        "win_rate": result["win_rate"],
+        "total_trades": result["total_trades"],
+        "final_balance": result["final_balance"],
+        **{k: metrics[k] for k in RISK_METRICS},
+        "accuracy": round(calculate_accuracy(test.loc[valid, 'signal'].to_numpy(), predictions), 4),
+        "train_samples": len(train),
+        "test_samples": len(valid),
+    }
+
+
+def rank_results(rows: List[Dict[str, Any]], metric: str = "profit_pct") -> List[Dict[str, Any]]:
+    """Ordena de mejor a peor por la métrica (los puntos fallidos al final) y numera el ranking."""
+    valid = sorted((r for r in rows if "error" not in r), key=lambda r: backtest_metrics.rank_key(r, metric), reverse=True)
+    failed = [r for r in rows if "error" in r]
+    for rank, row in enumerate(valid, start=1):
+        row["rank"] = rank
+    return valid + failed
@@ -0,0 +1,119 @@
+"""
+Unidades de trabajo del Backtest Tournament.
+
+Son funciones de módulo (picklables) para poder ejecutarse tanto en un ThreadPool como
+en un ProcessPool: reciben el DataFrame, la clase de estrategia y la ruta del modelo,
+y no tocan el event loop ni la base de datos. Los modelos se obtienen del registro
+ModelManager (uno por proceso), que los carga una vez y los reutiliza entre peticiones.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional, Type
+from api.config import Config
+from api.src.domain.services import backtest_metrics
+from api.src.domain.services.backtest_simulator import BacktestSimulator
+from api.src.domain.services.position_context import inject_backtest_context
+from api.src.domain.strategies.base import BaseStrategy
+from api.src.infrastructure.concurrency import get_executor
+from api.src.infrastructure.ai.model_manager import ModelManager
+
+logger = logging.getLogger("StrategyTournament")
+
+
+def get_tournament_executor():
+    """Pool compartido del torneo, configurable vía TOURNAMENT_EXECUTOR / TOURNAMENT_WORKERS."""
+    return get_executor("tournament", Config.TOURNAMENT_EXECUTOR, Config.TOURNAMENT_WORKERS)
+
+
+def calculate_accuracy(y_true: Any, y_pred: Any) -> float:
+    """Compara la señal ideal de la estrategia con la predicción de la IA."""
+    if len(y_true) == 0: return 0.0
+    matches = (y_true == y_pred).sum()
+    return float(matches / len(y_true))
+
+
+def prepare_data_for_model(df: pd.DataFrame, strategy: BaseStrategy) -> pd.DataFrame:
+    """Indicadores de la estrategia + contexto de posición (S9)."""
+    df = strategy.apply(df)
+    return inject_backtest_context(df)
+
+
+def evaluate_backtest_strategy(
+    df: pd.DataFrame,
+    strat_name: str,
+    StrategyClass: Type[BaseStrategy],
+    model_path: str,
+    initial_balance: float,
+    step_investment: float,
+    tp: float = 0.03,
+    sl: float = 0.9
+) -> Optional[Dict[str, Any]]:
+    """
+    Simula una estrategia completa (apply + predict + Flip/DCA).
+    Devuelve el resultado de la simulación, con sus métricas de riesgo/retorno y la curva
+    de equity, o None si la estrategia no es evaluable.
+    """
+    model = ModelManager().load(model_path)
+
+    strategy_obj = StrategyClass()
+    features = strategy_obj.get_features()
+
+    df_processed = prepare_data_for_model(df.copy(), strategy_obj)
+
+    if df_processed.empty or not all(c in df_processed.columns for c in features):
+        logger.warning(f"⏩ Skipping {strat_name}: Missing features.")
+        return None
+
+    model_features = features + ['in_position', 'current_pnl']
+
+    valid_idx = df_processed[model_features].dropna().index
+    X = df_processed.loc[valid_idx, model_features]
+    df_processed.loc[valid_idx, 'ai_signal'] = model.predict(X)
+    df_processed['ai_signal'] = df_processed['ai_signal'].fillna(0)
+
+    simulator = BacktestSimulator(initial_balance=initial_balance, trade_amount=step_investment)
+    result = simulator.run(df_processed)
+
+    result["metrics"], equity = backtest_metrics.metrics_and_equity(
+        result, df_processed.index, df_processed['close'].to_numpy(dtype=float), initial_balance
+    )
+    times = backtest_metrics.epoch_seconds(df_processed.index).tolist()
+    result["equity_curve"] = [{"time": t, "value": v} for t, v in zip(times, np.round(equity, 2).tolist())]
+    return result
+
+
+def evaluate_model_accuracy(
+    df: pd.DataFrame,
+    strat_name: str,
+    StrategyClass: Type[BaseStrategy],
+    model_path: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Precisión del modelo frente a la señal técnica de su estrategia (select_best_model).
+    Devuelve None si el DataFrame procesado queda vacío o el contrato de features está roto.
+    """
+    model = ModelManager().load(model_path)
+    strategy = StrategyClass()
+
+    df_test = prepare_data_for_model(df.copy(), strategy).dropna()
+    if df_test.empty:
+        return None
+
+    features = strategy.get_features()
+    model_features = features + ['in_position', 'current_pnl']
+
+    missing = [c for c in model_features if c not in df_test.columns]
+    if missing:
+        logger.error(f"Contrato roto en {strat_name}: Faltan columnas {missing}")
+        return None
+
+    predictions = model.predict(df_test[model_features])
+    score = calculate_accuracy(df_test['signal'].values, predictions)
+
+    return {
+        "strategy": strat_name,
+        "accuracy": score,
+        "trades": int((predictions != 0).sum()),
+        "status": "active"
+    }
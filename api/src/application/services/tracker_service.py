@@ -6,6 +6,7 @@ from api.src.adapters.driven.persistence.mongodb import db, update_virtual_balan
 from api.src.application.services.cex_service import CEXService
 from api.src.application.services.dex_service import DEXService
 from api.src.adapters.driven.notifications.socket_service import socket_service
+from api.src.adapters.driven.persistence.bot_routing_index import bot_routing_index
 
 logger = logging.getLogger(__name__)
 
@@ -157,6 +158,7 @@ class TrackerService:
             update_fields["closedAt"] = datetime.utcnow()
 
         await db.trades.update_one({"_id": trade_id}, {"$set": update_fields})
+        bot_routing_index.upsert_trade({**trade, **update_fields})
         
         # Emitir por socket
         await socket_service.emit_to_user(user_id, "trade_update", {
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from api.config import Config
+
+logger = logging.getLogger("TrainingJobs")
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+LOG_LIMIT = 50 # últimos mensajes guardados por job
+
+# Parámetros que definen un entrenamiento (los que no están aquí no afectan al resultado)
+DEDUP_FIELDS = ("symbols", "timeframe", "days", "market", "exchange", "refresh_data")
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Representación pública de un job (API y socket)."""
+    view = {k: v for k, v in job.items() if k != "_id"}
+    view["id"] = str(job["_id"])
+    return view
+
+
+class TrainingJobQueue:
+    """
+    Cola de jobs de entrenamiento con un número acotado de workers (TRAINING_MAX_JOBS).
+
+    Cada job se persiste en la colección `training_jobs` (estado, parámetros, progreso,
+    últimos logs y resultado) y se emite a sus suscriptores por socket ("training_job").
+    Un job idéntico a otro en cola o en curso no se duplica: el usuario se suscribe al
+    existente. Cancelar un job en cola lo descarta; uno en curso se interrumpe entre
+    fases (el fit que ya esté corriendo en el pool de entrenamiento termina, pero no se
+    lanzan los siguientes). Al arrancar, los jobs que quedaron activos se vuelven a encolar.
+
+    Con varios workers de la API solo el principal ejecuta jobs. En los demás la cola es
+    `remote`: submit/cancel solo escriben en Mongo (el job, o cancel_requested) y el
+    principal los recoge cada TRAINING_POLL_SECONDS.
+    """
+
+    def __init__(self, db_adapter=None, ml_service_factory: Callable[[], Any] = None, max_workers: int = None,
+                 remote: bool = False, poll_seconds: float = None):
+        self._db = db_adapter
+        self.ml_service_factory = ml_service_factory
+        self.max_workers = max_workers or Config.TRAINING_MAX_JOBS
+        self.remote = remote
+        if poll_seconds is None:
+            poll_seconds = Config.TRAINING_POLL_SECONDS if Config.API_WORKERS > 1 else 0
+        self.poll_seconds = poll_seconds
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {} # jobs activos: id -> registro
+        self._by_key: Dict[str, str] = {} # dedup_key -> id del job activo
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: set = set()
+        self._workers: List[asyncio.Task] = []
+        self._seen: set = set() # ids registrados alguna vez en este proceso
+
+    @property
+    def db(self):
+        if self._db is None:
+            from api.src.adapters.driven.persistence.mongodb import db as db_global
+            self._db = db_global
+        return self._db
+
+    @staticmethod
+    def dedup_key(params: Dict[str, Any]) -> str:
+        normalized = {k: params.get(k) for k in DEDUP_FIELDS}
+        normalized["symbols"] = sorted(normalized["symbols"] or [])
+        return hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+    # --- CICLO DE VIDA ---
+
+    async def start(self):
+        await self._recover()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        if self.poll_seconds > 0:
+            self._workers.append(asyncio.create_task(self._poll_loop()))
+        logger.info(f"Cola de entrenamiento iniciada ({self.max_workers} workers, {self._queue.qsize()} jobs pendientes)")
+
+    async def stop(self):
+        # Los jobs interrumpidos quedan activos en Mongo y se reencolan en el próximo arranque
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _recover(self):
+        try:
+            pending = await self.db.training_jobs.find({"status": {"$in": list(ACTIVE_STATUSES)}}).sort("created_at", 1).to_list(None)
+        except PyMongoError as e:
+            logger.error(f"No se pudieron recuperar los jobs de entrenamiento: {e}")
+            return
+        for job in pending:
+            job_id = str(job["_id"])
+            if job_id in self._jobs:
+                continue
+            job.update(status=QUEUED, started_at=None)
+            self._register(job)
+            await self._persist(job, {"status": QUEUED, "started_at": None})
+            self._queue.put_nowait(job_id)
+
+    # --- API PÚBLICA ---
+
+    async def submit(self, params: Dict[str, Any], user_id: str = "default_user", requested_by: str = "user") -> Tuple[Dict[str, Any], bool]:
+        """Encola un entrenamiento. Devuelve (job, creado); si ya había uno idéntico activo, se reutiliza."""
+        key = self.dedup_key(params)
+        if self.remote:
+            return await self._submit_remote(key, params, user_id, requested_by)
+        existing = self._jobs.get(self._by_key.get(key))
+        if existing is not None:
+            if user_id not in existing["subscribers"]:
+                existing["subscribers"].append(user_id)
+                await self._add_subscriber(existing["_id"], user_id)
+            return job_view(existing), False
+
+        job = self._new_job(key, params, user_id, requested_by)
+        self._register(job)
+        try:
+            await self.db.training_jobs.insert_one(job)
+        except PyMongoError as e:
+            logger.error(f"No se pudo guardar el job {job['_id']}: {e}")
+        self._queue.put_nowait(str(job["_id"]))
+        logger.info(f"Job de entrenamiento {job['_id']} encolado ({len(params.get('symbols') or [])} símbolos, {requested_by})")
+        return job_view(job), True
+
+    async def _submit_remote(self, key: str, params: Dict[str, Any], user_id: str, requested_by: str) -> Tuple[Dict[str, Any], bool]:
+        """Worker secundario: dedup y alta directamente en Mongo; el principal lo ejecutará."""
+        existing = await self.db.training_jobs.find_one_and_update(
+            {"dedup_key": key, "status": {"$in": list(ACTIVE_STATUSES)}},
+            {"$addToSet": {"subscribers": user_id}},
+            return_document=ReturnDocument.AFTER
+        )
+        if existing is not None:
+            return job_view(existing), False
+        job = self._new_job(key, params, user_id, requested_by)
+        await self.db.training_jobs.insert_one(job)
+        logger.info(f"Job de entrenamiento {job['_id']} registrado para el worker principal ({requested_by})")
+        return job_view(job), True
+
+    @staticmethod
+    def _new_job(key: str, params: Dict[str, Any], user_id: str, requested_by: str) -> Dict[str, Any]:
+        return {
+            "_id": ObjectId(),
+            "dedup_key": key,
+            "status": QUEUED,
+            "params": {**params, "user_id": user_id},
+            "requested_by": requested_by,
+            "subscribers": [user_id],
+            "progress": {"stage": QUEUED, "done": 0, "total": 0, "percent": 0.0},
+            "logs": [],
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.remote:
+            if not ObjectId.is_valid(job_id):
+                return None
+            # El principal lo cancela en su siguiente sondeo
+            job = await self.db.training_jobs.find_one_and_update(
+                {"_id": ObjectId(job_id), "status": {"$in": list(ACTIVE_STATUSES)}},
+                {"$set": {"cancel_requested": True}},
+                return_document=ReturnDocument.AFTER
+            )
+            return job_view(job) if job else await self.get(job_id)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self.get(job_id)
+        self._cancel_requested.add(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        else:
+            await self._finish(job, CANCELLED)
+        return job_view(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job_view(job)
+        if not ObjectId.is_valid(job_id):
+            return None
+        stored = await self.db.training_jobs.find_one({"_id": ObjectId(job_id)})
+        return job_view(stored) if stored else None
+
+    async def list_jobs(self, user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = {"subscribers": user_id} if user_id else {}
+        jobs = await self.db.training_jobs.find(query).sort("created_at", -1).to_list(limit)
+        # Los activos se sirven desde memoria (progreso al día)
+        return [job_view(self._jobs.get(str(j["_id"]), j)) for j in jobs]
+
+    # --- JOBS DE OTROS WORKERS ---
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self._sync_remote_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sondeando jobs de entrenamiento: {e}")
+
+    async def _sync_remote_jobs(self):
+        """Adopta los jobs encolados por otros workers y aplica sus suscripciones y cancelaciones."""
+        docs = await self.db.training_jobs.find({"status": {"$in": list(ACTIVE_STATUSES)}}).sort("created_at", 1).to_list(None)
+        for doc in docs:
+            job_id = str(doc["_id"])
+            job = self._jobs.get(job_id)
+            if job is None:
+                if doc["status"] == QUEUED and job_id not in self._seen:
+                    await self._adopt(doc)
+                continue
+            job["subscribers"].extend(u for u in doc.get("subscribers", []) if u not in job["subscribers"])
+            if doc.get("cancel_requested") and job_id not in self._cancel_requested:
+                await self.cancel(job_id)
+
+    async def _adopt(self, doc: Dict[str, Any]):
+        twin = self._jobs.get(self._by_key.get(doc["dedup_key"]))
+        if twin is not None:
+            # Dos workers registraron el mismo entrenamiento a la vez: se queda el que ya está activo
+            self._seen.add(str(doc["_id"]))
+            for user_id in doc.get("subscribers", []):
+                if user_id not in twin["subscribers"]:
+                    twin["subscribers"].append(user_id)
+                    await self._add_subscriber(twin["_id"], user_id)
+            await self._persist(doc, {"status": CANCELLED, "error": f"duplicate of {twin['_id']}",
+                                      "finished_at": datetime.utcnow()})
+            return
+        if doc.get("cancel_requested"):
+            self._register(doc)
+            await self._finish(doc, CANCELLED)
+            return
+        self._register(doc)
+        self._queue.put_nowait(str(doc["_id"]))
+
+    # --- EJECUCIÓN ---
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] == QUEUED:
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error inesperado en el worker de entrenamiento ({job_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = str(job["_id"])
+        params = job["params"]
+
+        async def on_log(msg: str, level: str = "info"):
+            job["logs"] = (job["logs"] + [{"message": msg, "type": level, "at": datetime.utcnow()}])[-LOG_LIMIT:]
+            # El dueño ya recibe training_log desde MLService; el resto de suscriptores, desde aquí
+            for user_id in job["subscribers"]:
+                if user_id != params["user_id"]:
+                    await self._emit(user_id, "training_log", {"message": msg, "type": level, "job_id": job_id})
+
+        async def on_progress(done: int, total: int):
+            job["progress"] = {"stage": "training", "done": done, "total": total,
+                               "percent": round(done / total * 100, 1) if total else 0.0}
+            await self._update(job, {"logs": job["logs"]})
+
+        service = self.ml_service_factory() if self.ml_service_factory else self._default_service()
+        task = asyncio.create_task(service.train_all_strategies(
+            params["symbols"], params["timeframe"], params.get("days", 365), params.get("market", "spot"),
+            params["user_id"], params.get("refresh_data", False), exchange_id=params.get("exchange") or "binance",
+            log_callback=on_log, progress_callback=on_progress
+        ))
+        # Registrado antes de ceder el control: un cancel() a partir de aquí interrumpe la tarea
+        self._running[job_id] = task
+        job["progress"]["stage"] = "data"
+        try:
+            await self._update(job, {"status": RUNNING, "started_at": datetime.utcnow()})
+            result = await task
+        except asyncio.CancelledError:
+            task.cancel()
+            if job_id not in self._cancel_requested:
+                raise
+            await self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            await self._finish(job, FAILED, error=str(e))
+            return
+        finally:
+            self._running.pop(job_id, None)
+
+        if result.get("status") == "success":
+            await self._finish(job, COMPLETED, result=result)
+        else:
+            await self._finish(job, FAILED, result=result, error=result.get("message"))
+
+    async def _finish(self, job: Dict[str, Any], status: str, result: Dict[str, Any] = None, error: str = None):
+        job_id = str(job["_id"])
+        self._jobs.pop(job_id, None)
+        self._by_key.pop(job["dedup_key"], None)
+        self._cancel_requested.discard(job_id)
+        job["progress"]["stage"] = status
+        await self._update(job, {"status": status, "result": result, "error": error,
+                                 "finished_at": datetime.utcnow(), "logs": job["logs"]})
+        logger.info(f"Job de entrenamiento {job_id}: {status}")
+
+    def _register(self, job: Dict[str, Any]):
+        job_id = str(job["_id"])
+        self._jobs[job_id] = job
+        self._by_key[job["dedup_key"]] = job_id
+        self._seen.add(job_id)
+
+    async def _update(self, job: Dict[str, Any], fields: Dict[str, Any]):
+        """Aplica cambios al job, los persiste y notifica a los suscriptores."""
+        job.update(fields)
+        await self._persist(job, {**fields, "progress": job["progress"]})
+        view = job_view(job)
+        for user_id in job["subscribers"]:
+            await self._emit(user_id, "training_job", view)
+
+    async def _add_subscriber(self, job_id: ObjectId, user_id: str):
+        # $addToSet: no pisa los suscriptores que otro worker haya añadido en Mongo
+        try:
+            await self.db.training_jobs.update_one({"_id": job_id}, {"$addToSet": {"subscribers": user_id}})
+        except PyMongoError as e:
+            logger.error(f"No se pudo actualizar el job {job_id}: {e}")
+
+    async def _persist(self, job: Dict[str, Any], fields: Dict[str, Any]):
+        try:
+            await self.db.training_jobs.update_one({"_id": job["_id"]}, {"$set": fields})
+        except PyMongoError as e:
+            logger.error(f"No se pudo actualizar el job {job['_id']}: {e}")
+
+    @staticmethod
+    async def _emit(user_id: str, event: str, data: Dict[str, Any]):
+        if not user_id or user_id == "default_user":
+            return
+        from api.src.adapters.driven.notifications.socket_service import socket_service
+        await socket_service.emit_to_user(user_id, event, data)
+
+    @staticmethod
+    def _default_service():
+        from api.src.application.services.ml_service import MLService
+        from api.src.application.services.cex_service import CEXService
+        return MLService(exchange_adapter=CEXService())
+
+
+# Instancia compartida (main.py configura el MLService y arranca los workers)
+training_queue = TrainingJobQueue()
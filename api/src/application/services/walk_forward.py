@@ -0,0 +1,112 @@
+"""
+Evaluación walk-forward de los modelos de estrategia.
+
+El histórico se divide en folds consecutivos: cada fold entrena un RandomForest con las
+`train_size` velas anteriores a su ventana de test y simula las `test_size` velas de la
+ventana (siempre fuera de muestra). Las ventanas de test están alineadas a múltiplos de
+test_size * timeframe desde epoch, así que ampliar el histórico no desplaza los folds ya
+evaluados: sus resultados se reutilizan desde la caché y solo se entrenan los nuevos.
+
+Igual que strategy_tournament y strategy_sweep, evaluate_fold es una función de módulo
+picklable (ThreadPool o ProcessPool) que no toca el event loop ni la base de datos.
+"""
+import hashlib
+import json
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Type
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, timeframe_to_ms
+from api.src.domain.services.indicator_cache import market_frame
+from api.src.domain.strategies.base import BaseStrategy
+from api.src.application.services.strategy_sweep import fit_and_simulate
+
+logger = logging.getLogger("WalkForward")
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def build_folds(index: pd.DatetimeIndex, timeframe: str, train_size: int, test_size: int) -> List[Dict[str, Any]]:
+    """
+    Folds completos del histórico: ventanas de test de test_size velas que empiezan en un
+    múltiplo de test_size * timeframe y tienen al menos train_size velas previas.
+    """
+    ts = OHLCVStore._to_ms(index)
+    blocks = ts // (test_size * timeframe_to_ms(timeframe))
+    starts = np.flatnonzero(np.diff(blocks)) + 1  # primera vela de cada bloque (el primero puede estar incompleto)
+
+    folds = []
+    for start in starts:
+        end = start + test_size
+        if start < train_size or end > len(ts) or blocks[end - 1] != blocks[start]:
+            continue
+        folds.append({
+            "train_start": int(start - train_size),
+            "test_start": int(start),
+            "test_end": int(end),
+            "start_ms": int(ts[start]),
+            "end_ms": int(ts[end - 1]),
+        })
+    return folds
+
+
+def data_digest(window: pd.DataFrame) -> str:
+    """Digest de las velas de un fold: si el histórico cambia, el fold se reevalúa."""
+    digest = hashlib.sha1(OHLCVStore._to_ms(window.index).tobytes())
+    digest.update(np.ascontiguousarray(window[PRICE_COLUMNS].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def fold_key(exchange_id: str, symbol: str, timeframe: str, strat_name: str, strategy_params: Dict[str, Any],
+             model_params: Dict[str, Any], initial_balance: float, step_investment: float,
+             fold: Dict[str, Any], digest: str) -> str:
+    """Clave de caché de un fold: todo lo que determina su resultado."""
+    payload = {
+        "exchange": exchange_id.lower(), "symbol": symbol, "timeframe": timeframe, "strategy": strat_name,
+        "strategy_params": strategy_params, "model_params": model_params,
+        "initial_balance": initial_balance, "step_investment": step_investment,
+        "train_size": fold["test_start"] - fold["train_start"], "test_size": fold["test_end"] - fold["test_start"],
+        "start_ms": fold["start_ms"], "data": digest,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def evaluate_fold(
+    window: pd.DataFrame,
+    strat_name: str,
+    StrategyClass: Type[BaseStrategy],
+    train_size: int,
+    strategy_params: Dict[str, Any],
+    model_params: Dict[str, Any],
+    initial_balance: float,
+    step_investment: float
+) -> Dict[str, Any]:
+    """Entrena con las primeras train_size velas de la ventana y simula el resto."""
+    strategy = StrategyClass(dict(strategy_params))
+    processed = strategy.apply(market_frame(window))
+    features = strategy.get_features()
+    if not all(c in processed.columns for c in features):
+        return {"error": "missing features"}
+    return fit_and_simulate(processed, features, model_params, train_size, initial_balance, step_investment)
+
+
+def aggregate_folds(rows: List[Dict[str, Any]], initial_balance: float) -> Dict[str, Any]:
+    """
+    Agrega los folds de una estrategia. Cada fold arranca con initial_balance, así que el
+    PnL total es la suma de los PnL por fold; precisión y win rate se ponderan por muestras
+    de test y por operaciones respectivamente.
+    """
+    valid = [r for r in rows if "error" not in r]
+    pnl = [r["final_balance"] - initial_balance for r in valid]
+    samples = sum(r["test_samples"] for r in valid)
+    trades = sum(r["total_trades"] for r in valid)
+    return {
+        "folds": len(valid),
+        "failed_folds": len(rows) - len(valid),
+        "total_pnl": round(sum(pnl), 2),
+        "profit_pct": round(sum(pnl) / initial_balance * 100, 2) if initial_balance else 0.0,
+        "accuracy": round(sum(r["accuracy"] * r["test_samples"] for r in valid) / samples, 4) if samples else 0.0,
+        "total_trades": trades,
+        "win_rate": round(sum(r["win_rate"] * r["total_trades"] for r in valid) / trades, 2) if trades else 0.0,
+        "positive_folds": sum(1 for p in pnl if p > 0),
+    }
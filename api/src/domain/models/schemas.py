@@ -158,6 +158,38 @@ class StrategyOptimizationRequest(BaseModel):
     # Opcional: Feedback del usuario ("Hazla más conservadora")
     user_feedback: Optional[str] = None
 
+class SweepRequest(BaseModel):
+    symbol: str
+    strategy_name: str
+    exchange_id: str = "okx"
+    timeframe: str = "1h"
+    days: int = 30
+    market_type: str = "spot"
+    # Espacios de búsqueda {parámetro: [valores]}: config de la estrategia e hiperparámetros del RandomForest
+    strategy_space: Dict[str, List[Any]] = Field(default_factory=dict)
+    model_space: Dict[str, List[Any]] = Field(default_factory=dict)
+    search: str = "grid" # grid, random
+    n_iter: int = 20 # puntos evaluados en random search
+    metric: str = "profit_pct" # métrica de ranking
+    train_fraction: float = 0.7 # tramo inicial usado para entrenar (el resto es fuera de muestra)
+    initial_balance: float = 10000.0
+    trade_amount: Optional[float] = None
+    bot_id: Optional[str] = None # si se indica, la mejor configuración se guarda en su config.sweep (recomendación)
+
+class WalkForwardRequest(BaseModel):
+    symbol: str
+    strategy_name: Optional[str] = None # None: todas las estrategias del mercado
+    exchange_id: str = "okx"
+    timeframe: str = "1h"
+    days: int = 90
+    market_type: str = "spot"
+    strategy_params: Dict[str, Any] = Field(default_factory=dict)
+    model_params: Dict[str, Any] = Field(default_factory=dict)
+    train_size: int = 500 # velas de entrenamiento por fold
+    test_size: int = 100 # velas fuera de muestra por fold (ventanas alineadas en el tiempo)
+    initial_balance: float = 10000.0
+    trade_amount: Optional[float] = None
+
 class StrategyOptimizationResponse(BaseModel):
     original_code: str
     optimized_code: str
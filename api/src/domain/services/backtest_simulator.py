@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional
+from api.src.domain.strategies.base import BaseStrategy
+
+
+class BacktestSimulator:
+    """
+    Motor de simulación Flip/DCA sobre arrays NumPy.
+
+    Reemplaza el recorrido fila a fila con df.iloc[i] / iloc[i+1]: extrae una sola vez
+    'ai_signal', 'open' y 'close' como arrays y sólo visita las velas con señal != 0,
+    que son las únicas que pueden mutar el estado (balance, posiciones, trades).
+    Produce exactamente los mismos trades, balances y win rate que la simulación original.
+    """
+
+    def __init__(self, initial_balance: float = 1000.0, trade_amount: Optional[float] = None):
+        self.initial_balance = initial_balance
+        self.step_investment = trade_amount or (initial_balance * 0.2)
+
+    def run(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Simula sobre un DataFrame con columnas 'ai_signal', 'open' y 'close'."""
+        signals = df['ai_signal'].to_numpy(dtype=float, na_value=0.0)
+        opens = df['open'].to_numpy(dtype=float)
+        closes = df['close'].to_numpy(dtype=float)
+        return self.simulate(signals, opens, closes, df.index)
+
+    def simulate(self, signals: np.ndarray, opens: np.ndarray, closes: np.ndarray, index: pd.Index) -> Dict[str, Any]:
+        """
+        Máquina de estados Flip/DCA. La señal de la vela i se ejecuta al 'open' de la vela i+1.
+        """
+        initial_balance = self.initial_balance
+        step_investment = self.step_investment
+        balance = initial_balance
+
+        long_amount = 0
+        long_invested = 0
+        short_amount = 0
+        short_invested = 0
+
+        trades = []
+        win_count = 0
+        loss_count = 0
+
+        n = len(signals)
+        # Sólo las velas con señal pueden cambiar el estado; la última vela nunca se ejecuta.
+        event_idx = np.flatnonzero(signals[:max(n - 1, 0)] != BaseStrategy.SIGNAL_WAIT)
+        event_signals = signals[event_idx].tolist()
+        event_prices = opens[event_idx + 1].tolist()
+        event_times = self._epoch_seconds(index, event_idx + 1)
+
+        for pos in range(len(event_signals)):
+            signal = event_signals[pos]
+            price = event_prices[pos]
+            ts = event_times[pos]
+
+            if signal == BaseStrategy.SIGNAL_BUY:
+                if short_amount > 0:
+                    pnl = short_invested - (short_amount * price)
+                    balance += short_invested + pnl
+                    trades.append({
+                        "time": ts,
+                        "type": "BUY",
+                        "price": price,
+                        "amount": short_amount,
+                        "pnl": self._round(pnl),
+                        "label": "FLIP_CLOSE_SHORT"
+                    })
+                    if pnl > 0: win_count += 1
+                    else: loss_count += 1
+                    short_amount, short_invested = 0, 0
+
+                    if balance >= step_investment:
+                        amount_to_buy = step_investment / price
+                        long_amount, long_invested = amount_to_buy, step_investment
+                        balance -= step_investment
+                        trades.append({"time": ts, "type": "BUY", "price": price, "amount": amount_to_buy, "label": "FLIP_OPEN_LONG"})
+
+                elif balance >= step_investment:
+                    is_dca = long_amount > 0
+                    amount_to_buy = step_investment / price
+                    long_amount += amount_to_buy
+                    long_invested += step_investment
+                    balance -= step_investment
+                    trades.append({"time": ts, "type": "BUY", "price": price, "amount": amount_to_buy, "label": "DCA_LONG" if is_dca else "OPEN_LONG"})
+
+            elif signal == BaseStrategy.SIGNAL_SELL:
+                if long_amount > 0:
+                    pnl = (long_amount * price) - long_invested
+                    balance += (long_amount * price)
+                    trades.append({
+                        "time": ts,
+                        "type": "SELL",
+                        "price": price,
+                        "amount": long_amount,
+                        "pnl": self._round(pnl),
+                        "label": "FLIP_CLOSE_LONG"
+                    })
+                    if pnl > 0: win_count += 1
+                    else: loss_count += 1
+                    long_amount, long_invested = 0, 0
+
+                    if balance >= step_investment:
+                        amount_to_short = step_investment / price
+                        short_amount, short_invested = amount_to_short, step_investment
+                        balance -= step_investment
+                        trades.append({"time": ts, "type": "SELL", "price": price, "amount": amount_to_short, "label": "FLIP_OPEN_SHORT"})
+
+                elif balance >= step_investment:
+                    is_dca = short_amount > 0
+                    amount_to_short = step_investment / price
+                    short_amount += amount_to_short
+                    short_invested += step_investment
+                    balance -= step_investment
+                    trades.append({"time": ts, "type": "SELL", "price": price, "amount": amount_to_short, "label": "DCA_SHORT" if is_dca else "OPEN_SHORT"})
+
+        final_balance = balance
+        if long_amount > 0:
+            final_balance += (long_amount * closes[-1])
+        if short_amount > 0:
+            pnl_short = short_invested - (short_amount * closes[-1])
+            final_balance += short_invested + pnl_short
+
+        profit_pct = ((final_balance / initial_balance) - 1) * 100
+        win_rate = (win_count / (win_count + loss_count) * 100) if (win_count + loss_count) > 0 else 0
+
+        # Con al menos un trade los precios provienen de NumPy: se replica su redondeo.
+        round_final = self._round if trades else (lambda v: round(v, 2))
+
+        return {
+            "profit_pct": round_final(profit_pct),
+            "total_trades": len(trades),
+            "win_rate": round(win_rate, 2),
+            "final_balance": round_final(final_balance),
+            "trades": trades
+        }
+
+    @staticmethod
+    def _epoch_seconds(index: pd.Index, positions: np.ndarray) -> list:
+        """Equivalente vectorizado de int(index[i].timestamp()) para las posiciones dadas."""
+        if isinstance(index, pd.DatetimeIndex):
+            ticks_per_second = pd.Timedelta(seconds=1) // pd.Timedelta(1, unit=index.unit)
+            seconds = np.round(index.asi8[positions] / ticks_per_second, 6)
+            return np.trunc(seconds).astype(np.int64).tolist()
+        return [int(index[i].timestamp()) for i in positions.tolist()]
+
+    @staticmethod
+    def _round(value: float) -> float:
+        """Redondeo a 2 decimales con la semántica de np.float64 (la del motor fila a fila)."""
+        return float(round(np.float64(value), 2))
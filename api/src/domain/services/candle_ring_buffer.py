@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class CandleRingBuffer:
+    """
+    Buffer circular columnar de capacidad fija para velas OHLCV.
+
+    Los arrays se reservan una sola vez con el doble de la capacidad y cada vela se escribe
+    en su posición y en su espejo (+capacity): así la ventana viva siempre es un tramo
+    contiguo y `view()` no copia. append y la actualización de la última vela son O(1);
+    el DataFrame solo se construye al pedirlo y se reutiliza mientras no haya escrituras.
+    """
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = int(capacity)
+        self._ts = np.zeros(2 * self.capacity, dtype='datetime64[ns]')
+        self._values = np.zeros((len(OHLCV_COLUMNS), 2 * self.capacity), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        self._version = 0
+        self._frame: Optional[pd.DataFrame] = None
+        self._frame_version = -1
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, capacity: int = 500) -> 'CandleRingBuffer':
+        """Crea el buffer desde un DataFrame indexado por timestamp (warm-up)."""
+        buffer = cls(max(capacity, len(df)))
+        n = len(df)
+        buffer._ts[:n] = df.index.values.astype('datetime64[ns]')
+        buffer._ts[buffer.capacity:buffer.capacity + n] = buffer._ts[:n]
+        for i, col in enumerate(OHLCV_COLUMNS):
+            values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.zeros(n)
+            buffer._values[i, :n] = values
+            buffer._values[i, buffer.capacity:buffer.capacity + n] = values
+        buffer._size = n
+        buffer._version += 1
+        return buffer
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def empty(self) -> bool:
+        return self._size == 0
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        if not self._size:
+            return None
+        return pd.Timestamp(self._ts[self._start + self._size - 1])
+
+    def append(self, timestamp: pd.Timestamp, candle: Dict[str, float]):
+        """Añade una vela nueva; con el buffer lleno descarta la más antigua."""
+        if self._size < self.capacity:
+            slot = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        ts = np.datetime64(pd.Timestamp(timestamp).value, 'ns')
+        self._ts[slot] = self._ts[slot + self.capacity] = ts
+        for i, col in enumerate(OHLCV_COLUMNS):
+            value = float(candle.get(col, 0.0))
+            self._values[i, slot] = self._values[i, slot + self.capacity] = value
+        self._version += 1
+
+    def update_last(self, **values: float):
+        """Actualiza en sitio columnas de la última vela (re-cierre, ticks)."""
+        if not self._size:
+            return
+        slot = (self._start + self._size - 1) % self.capacity
+        for i, col in enumerate(OHLCV_COLUMNS):
+            if col in values:
+                self._values[i, slot] = self._values[i, slot + self.capacity] = float(values[col])
+        self._version += 1
+
+    def update_at(self, timestamp: pd.Timestamp, **values: float) -> bool:
+        """
+        Actualiza en sitio columnas de la vela con ese timestamp si sigue en la ventana
+        (p.ej. el cierre definitivo de una vela que llega después del primer tick de la
+        siguiente). Devuelve False si la vela ya salió del buffer.
+        """
+        if not self._size:
+            return False
+        ts = np.datetime64(pd.Timestamp(timestamp).value, 'ns')
+        window = self._ts[self._start:self._start + self._size]
+        pos = int(np.searchsorted(window, ts))
+        if pos == self._size or window[pos] != ts:
+            return False
+        slot = (self._start + pos) % self.capacity
+        for i, col in enumerate(OHLCV_COLUMNS):
+            if col in values:
+                self._values[i, slot] = self._values[i, slot + self.capacity] = float(values[col])
+        self._version += 1
+        return True
+
+    def apply_tick(self, bucket_ns: int, price: float) -> bool:
+        """
+        Agrega un tick a la vela de su bucket (inicio de vela en ns): en la frontera abre una
+        vela nueva, dentro del bucket actualiza high/low/close y los ticks de velas ya
+        cerradas se ignoran. Devuelve True si el buffer cambió.
+        """
+        if not self._size:
+            return False
+        last_ns = int(self._ts[self._start + self._size - 1].astype(np.int64))
+        if bucket_ns > last_ns:
+            # El volumen del ticker es de 24h: la vela abierta por ticks arranca en 0
+            self.append(bucket_ns, {'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0.0})
+        elif bucket_ns == last_ns:
+            slot = (self._start + self._size - 1) % self.capacity
+            high, low = self._values[1, slot], self._values[2, slot]
+            self.update_last(close=price, high=max(high, price), low=min(low, price))
+        else:
+            return False
+        return True
+
+    def last(self, column: str) -> float:
+        slot = (self._start + self._size - 1) % self.capacity
+        return float(self._values[OHLCV_COLUMNS.index(column), slot])
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """
+        Vistas de solo lectura (sin copia) de la ventana viva, en orden cronológico.
+        Solo son válidas hasta la siguiente escritura en el buffer.
+        """
+        window = slice(self._start, self._start + self._size)
+        arrays = {'timestamp': self._ts[window]}
+        arrays.update({col: self._values[i, window] for i, col in enumerate(OHLCV_COLUMNS)})
+        for array in arrays.values():
+            array.flags.writeable = False
+        return arrays
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame (copia) de la ventana viva, construido solo si hubo escrituras desde el último."""
+        if self._frame_version != self._version:
+            window = slice(self._start, self._start + self._size)
+            index = pd.DatetimeIndex(self._ts[window].copy(), name='timestamp')
+            self._frame = pd.DataFrame(self._values[:, window].T.copy(), index=index, columns=list(OHLCV_COLUMNS))
+            self._frame_version = self._version
+        return self._frame
@@ -25,7 +25,7 @@ class IExchangePort(ABC):
         pass
 
     @abstractmethod
-    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 15000, use_random_date: bool = False, user_id: str = "default_user", exchange_id: str = "binance") -> Any:
+    async def get_historical_data(self, symbol: str, timeframe: str, limit: int = 15000, use_random_date: bool = False, user_id: str = "default_user", exchange_id: str = "binance", since: Optional[int] = None) -> Any:
         """Fetch historical data as DataFrame."""
         pass
 
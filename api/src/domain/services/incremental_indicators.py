@@ -0,0 +1,115 @@
+import math
+from collections import deque
+from typing import Any, Dict, Optional
+import pandas as pd
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class Ewm:
+    """EWM vela a vela; mismos valores que Series.ewm(span=..., adjust=...).mean()."""
+
+    def __init__(self, span: float, adjust: bool = True):
+        self.alpha = 2.0 / (span + 1.0)
+        self.adjust = adjust
+        self._num = 0.0
+        self._den = 0.0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        if self.adjust:
+            # Media ponderada con pesos (1-alpha)^i, en forma recursiva
+            self._num = self._num * (1.0 - self.alpha) + x
+            self._den = self._den * (1.0 - self.alpha) + 1.0
+            self.value = self._num / self._den
+        elif math.isnan(self.value):
+            self.value = x
+        else:
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class RollingMean:
+    """Media móvil de ventana fija; NaN hasta completar la ventana, como Series.rolling(window).mean()."""
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self._values = deque(maxlen=self.window)
+
+    def update(self, x: float) -> float:
+        self._values.append(x)
+        if len(self._values) < self.window:
+            return math.nan
+        return sum(self._values) / self.window
+
+
+class Lag:
+    """Valor de hace `periods` velas (equivale a Series.shift(periods))."""
+
+    def __init__(self, periods: int):
+        self._values = deque(maxlen=int(periods) + 1)
+
+    def update(self, x: float) -> float:
+        self._values.append(x)
+        if len(self._values) < self._values.maxlen:
+            return math.nan
+        return self._values[0]
+
+
+def safe_div(a: float, b: float) -> float:
+    """División con la semántica de pandas/numpy: x/0 -> ±inf, 0/0 y NaN -> NaN."""
+    if math.isnan(a) or math.isnan(b):
+        return math.nan
+    if b == 0:
+        return math.nan if a == 0 else math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class IncrementalFeatureCache:
+    """
+    Estado incremental de features por (stream, estrategia) para la inferencia en vivo.
+
+    Si la vela nueva continúa la última procesada solo se avanza el estado (O(1) por vela,
+    independiente del tamaño del buffer); ante un hueco o un stream nuevo se recalienta
+    recorriendo el histórico una vez. Devuelve None para estrategias sin modo incremental,
+    que siguen usando apply() completo.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, tuple] = {}  # key -> (state, last_ts, features)
+
+    def latest(self, key: Any, strategy, df: pd.DataFrame) -> Optional[Dict[str, float]]:
+        if df.empty or 'timestamp' not in df.columns:
+            return None
+
+        timestamps = df['timestamp']
+        ts = timestamps.iloc[-1]
+        entry = self._entries.get(key)
+        if entry is not None:
+            state, last_ts, features = entry
+            if last_ts == ts:
+                return features
+            if len(df) > 1 and timestamps.iloc[-2] == last_ts:
+                last = df.iloc[-1]
+                candle = {c: float(last[c]) for c in OHLCV_FIELDS if c in df.columns}
+                features = strategy.update_features(state, candle)
+                if features is None:
+                    self._entries.pop(key, None)
+                    return None
+                self._entries[key] = (state, ts, features)
+                return features
+
+        warmed = strategy.warm_up(df)
+        if warmed is None:
+            return None
+        state, features = warmed
+        self._entries[key] = (state, ts, features)
+        return features
+
+    def discard(self, key: Any):
+        self._entries.pop(key, None)
+
+    def discard_stream(self, prefix: str):
+        """Olvida el estado de todos los streams cuyo stream_key (primer elemento) empieza por prefix."""
+        for key in [k for k in self._entries if isinstance(k, tuple) and str(k[0]).startswith(prefix)]:
+            del self._entries[key]
@@ -0,0 +1,55 @@
+from typing import Callable, Dict, Hashable, Tuple
+import numpy as np
+import pandas as pd
+
+MARKET_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def market_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Frame con solo las columnas OHLCV de df, sobre arrays de solo lectura. Se construye una
+    vez por dataset y cada estrategia recibe `market.copy(deep=False)`: sus columnas nuevas
+    quedan en su copia y cualquier escritura sobre las de mercado falla en vez de alterar
+    los datos que ven las demás estrategias.
+    """
+    columns = {}
+    for column in MARKET_COLUMNS:
+        if column in df.columns:
+            values = df[column].to_numpy(dtype=np.float64, copy=True)
+            values.flags.writeable = False
+            columns[column] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+class IndicatorCache:
+    """
+    Caché de indicadores por (dataset, indicador, parámetros).
+
+    Durante el entrenamiento todas las estrategias de un mismo símbolo comparten una
+    instancia: RSI(14), medias/desviaciones de 20 o EMAs se calculan una sola vez y las
+    demás estrategias reciben la misma Series. Sus valores son de solo lectura: asignarla
+    como columna es seguro, pero no se debe modificar en sitio.
+    """
+
+    def __init__(self):
+        self._values: Dict[Tuple[Hashable, str, tuple], pd.Series] = {}
+        self.computed = 0
+        self.hits = 0
+
+    def get(self, dataset_key: Hashable, name: str, params: tuple, compute: Callable[[], pd.Series]) -> pd.Series:
+        key = (dataset_key, name, params)
+        value = self._values.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        value = compute()
+        value.values.flags.writeable = False
+        self._values[key] = value
+        self.computed += 1
+        return value
+
+    def keys(self):
+        return list(self._values.keys())
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from api.src.domain.strategies.base import BaseStrategy
+
+# Profit Guard: una señal contraria con PnL menor a -0.5% se re-etiqueta como WAIT
+PROFIT_GUARD_THRESHOLD = -0.005
+
+
+def _last_entry_state(signals: np.ndarray, prices: np.ndarray, events: np.ndarray, price_offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Propaga hacia adelante el estado de la última entrada (flip) anterior a cada vela.
+
+    Args:
+        signals: Señales originales de la estrategia.
+        prices: Cierres usados como precio de entrada.
+        events: Máscara booleana de velas que abren/flipean posición.
+        price_offset: Desfase entre la vela de la señal y la vela cuyo cierre fija el precio.
+
+    Returns:
+        (in_position, side, avg_price) por vela, considerando sólo eventos estrictamente anteriores.
+    """
+    n = len(signals)
+    positions = np.where(events, np.arange(n), -1)
+    last_event = np.maximum.accumulate(positions)
+    # Estado visible en la vela i: el del último evento en [0, i-1]
+    prev_event = np.concatenate(([-1], last_event[:-1]))[:n]
+
+    in_position = prev_event >= 0
+    safe_event = np.where(in_position, prev_event, 0)
+    side = np.where(in_position, signals[safe_event], BaseStrategy.SIGNAL_WAIT)
+    avg_price = np.where(in_position, prices[np.minimum(safe_event + price_offset, n - 1)], 0.0)
+    return in_position, side, avg_price
+
+
+def _directional_pnl(close: np.ndarray, avg_price: np.ndarray, side: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        long_pnl = (close - avg_price) / avg_price
+        short_pnl = (avg_price - close) / avg_price
+    return np.where(side == BaseStrategy.SIGNAL_BUY, long_pnl, short_pnl)
+
+
+def inject_training_context(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inyección de Contexto (Long/Short flipping) para entrenamiento.
+
+    La posición se abre/flipea al cierre de la vela con señal (desde la vela 1). Si la señal
+    es contraria a la posición y el PnL es negativo (Profit Guard), se re-etiqueta como WAIT (0)
+    para enseñar a la IA a esperar o promediar en lugar de flippear en pérdida.
+    """
+    df = df.copy()
+    signals = df['signal'].to_numpy()
+    close = df['close'].to_numpy(dtype=float)
+
+    events = np.isin(signals, (BaseStrategy.SIGNAL_BUY, BaseStrategy.SIGNAL_SELL))
+    if len(events):
+        events[0] = False  # La primera vela nunca se evalúa
+
+    in_position, side, avg_price = _last_entry_state(signals, close, events, price_offset=0)
+    pnl = _directional_pnl(close, avg_price, side)
+
+    current_pnl = np.where(in_position, pnl, 0.0)
+    is_reversal = in_position & (
+        ((side == BaseStrategy.SIGNAL_BUY) & (signals == BaseStrategy.SIGNAL_SELL)) |
+        ((side == BaseStrategy.SIGNAL_SELL) & (signals == BaseStrategy.SIGNAL_BUY))
+    )
+    guarded = is_reversal & (current_pnl < PROFIT_GUARD_THRESHOLD)
+
+    df['in_position'] = in_position.astype(np.int64)
+    df['current_pnl'] = current_pnl
+    if guarded.any():
+        new_signals = signals.copy()
+        new_signals[guarded] = BaseStrategy.SIGNAL_WAIT
+        df['signal'] = new_signals
+    return df
+
+
+def inject_backtest_context(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contexto de posición (S9) para inferencia en backtest.
+
+    La señal de la vela i-1 abre/flipea la posición al cierre de la vela i; el PnL sólo
+    se calcula con precio medio positivo. Opera in-place sobre el DataFrame recibido.
+    """
+    n = len(df)
+    close = df['close'].to_numpy(dtype=float)
+    if 'signal' in df.columns:
+        signals = df['signal'].to_numpy()
+        events = np.isin(signals, (BaseStrategy.SIGNAL_BUY, BaseStrategy.SIGNAL_SELL))
+    else:
+        signals = np.zeros(n)
+        events = np.zeros(n, dtype=bool)
+    if n:
+        events[-1] = False  # La señal de la última vela no tiene vela siguiente
+
+    in_position, side, avg_price = _last_entry_state(signals, close, events, price_offset=1)
+    pnl = _directional_pnl(close, avg_price, side)
+
+    df['in_position'] = in_position.astype(np.int64)
+    df['current_pnl'] = np.where(in_position & (avg_price > 0), pnl, 0.0)
+    return df
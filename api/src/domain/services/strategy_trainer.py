@@ -1,10 +1,17 @@
 import os
+import asyncio
 import importlib
 import pandas as pd
 import joblib
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
 from sklearn.ensemble import RandomForestClassifier
+from api.config import Config
+from api.src.domain.services.position_context import inject_training_context
+from api.src.domain.services.indicator_cache import IndicatorCache, market_frame
+from api.src.infrastructure.ai.flat_forest import export_forest
+from api.src.infrastructure.concurrency import get_executor, run_jobs
 
 # Configure logger
 logger = logging.getLogger("StrategyTrainer")
@@ -16,12 +23,15 @@ class StrategyTrainer:
     Motor de entrenamiento que carga estrategias dinámicamente y genera 
     modelos capaces de operar en cualquier símbolo (Agnósticos).
     """
-    def __init__(self, strategies_dir: str = "api/src/domain/strategies", models_dir: str = "api/data/models"):
+    def __init__(self, strategies_dir: str = "api/src/domain/strategies", models_dir: str = "api/data/models", executor: Executor = None, n_jobs: int = None):
         # Adjust paths to be relative to project root if needed
         # Assuming running from project root e:\antigravity\signaalKei_platform
         self.strategies_dir = strategies_dir
         self.models_dir = models_dir
         self._class_cache = {} # Cache para evitar recargas constantes
+        # Pool de entrenamiento (por defecto el compartido) y n_jobs de cada RandomForest.fit
+        self.executor = executor
+        self.n_jobs = n_jobs if n_jobs is not None else Config.TRAINING_N_JOBS
         os.makedirs(self.models_dir, exist_ok=True)
 
     def discover_strategies(self, market_type: str = None) -> List[str]:
@@ -97,13 +107,68 @@ class StrategyTrainer:
             logger.error(f"Error loading strategy {strategy_name}: {e}")
             return None
 
+    def feature_contract(self, market_type: str = "spot") -> Dict[str, List[str]]:
+        """Features de entrada de cada estrategia cargable del mercado ({estrategia: [features]})."""
+        contract = {}
+        for strategy_name in self.discover_strategies(market_type):
+            StrategyClass = self.load_strategy_class(strategy_name, market_type)
+            if StrategyClass:
+                contract[strategy_name] = list(StrategyClass().get_features())
+        return contract
+
     async def train_agnostic_model(self, strategy_name: str, symbols_data: Dict[str, pd.DataFrame], market_type: str = "spot", emit_callback=None):
         """
         Entrena un modelo global para una estrategia usando datos de múltiples activos.
-        Segmentado por market_type.
+        Segmentado por market_type. El fit corre en el pool de entrenamiento, fuera del event loop.
+        """
+        if emit_callback: await emit_callback(f"Starting training for {strategy_name}...", "info")
+        loop = asyncio.get_running_loop()
+        success, events = await loop.run_in_executor(self._get_executor(), train_strategy_job, *self._job_args(strategy_name, symbols_data, market_type))
+        if emit_callback:
+            for msg, level in events:
+                await emit_callback(msg, level)
+        return success
+
+    def fit_agnostic_model(self, strategy_name: str, symbols_data: Dict[str, pd.DataFrame], market_type: str = "spot", n_jobs: int = None, events: List[Tuple[str, str]] = None) -> bool:
+        """
+        Núcleo síncrono del entrenamiento (apply + contexto de posición + fit + persistencia).
+        Los mensajes de progreso se acumulan en `events` como (mensaje, nivel).
         """
+        events = events if events is not None else []
+        cache = IndicatorCache()
+        try:
+            frames = [self.strategy_frame(strategy_name, market_type, symbol, market_frame(df), cache) for symbol, df in symbols_data.items()]
+        except Exception as e:
+            logger.error(f"Error en entrenamiento de {strategy_name}: {e}")
+            events.append((f"Error training {strategy_name}: {e}", "error"))
+            return False
+        if any(frame is None for frame in frames):
+            return False
+        return self.fit_strategy_frames(strategy_name, frames, market_type, n_jobs=n_jobs, events=events)
+
+    def strategy_frame(self, strategy_name: str, market_type: str, symbol: str, df: pd.DataFrame, cache: IndicatorCache = None) -> Optional[pd.DataFrame]:
+        """
+        Patrones de una estrategia sobre un símbolo: apply() + dropna(), reducido a las columnas
+        que usa el entrenamiento. Los indicadores comunes salen de `cache` (compartida por símbolo)
+        y `df` es el market_frame del símbolo, compartido entre estrategias: cada una trabaja sobre
+        una copia superficial (sin duplicar datos) a la que solo añade columnas.
+        Devuelve None si la estrategia no se puede cargar.
+        """
+        # Importación dinámica del módulo de estrategia
+        StrategyClass = self.load_strategy_class(strategy_name, market_type)
+        if not StrategyClass: return None
+        
+        strategy = StrategyClass()
+        strategy.bind_indicators(cache, symbol)
+        logger.info(f"Procesando patrones de {symbol} con {strategy_name}...")
+        processed = strategy.apply(df.copy(deep=False)).dropna()
+        columns = [c for c in dict.fromkeys(strategy.get_features() + ['signal', 'close']) if c in processed.columns]
+        return processed[columns]
+
+    def fit_strategy_frames(self, strategy_name: str, frames: List[pd.DataFrame], market_type: str = "spot", n_jobs: int = None, events: List[Tuple[str, str]] = None) -> bool:
+        """Entrena y persiste el modelo de una estrategia a partir de sus patrones por símbolo."""
+        events = events if events is not None else []
         try:
-            # Importación dinámica del módulo de estrategia
             StrategyClass = self.load_strategy_class(strategy_name, market_type)
             if not StrategyClass: return False
             
@@ -111,22 +176,14 @@ class StrategyTrainer:
             
             msg_start = f"[StrategyTrainer] Using Virtual Balance Validation for {strategy_name} (No Exchange Ops)"
             print(msg_start)
-            if emit_callback: await emit_callback(f"Starting training for {strategy_name}...", "info")
 
-            datasets = []
-            for symbol, df in symbols_data.items():
-                logger.info(f"Procesando patrones de {symbol} con {strategy_name}...")
-                processed = strategy.apply(df.copy()).dropna()
-                if not processed.empty:
-                    # Rename 'signal' to 'label' if strategy outputs 'signal' 
-                    # Use 'signal' as label 
-                    datasets.append(processed)
+            datasets = [frame for frame in frames if frame is not None and not frame.empty]
 
             if not datasets: 
                 msg = f"[StrategyTrainer] No valid data found for {strategy_name}"
                 logger.warning(msg)
                 print(msg)
-                if emit_callback: await emit_callback(msg, "warning")
+                events.append((msg, "warning"))
                 return False
 
             # Combinación de datos de todos los símbolos (Entrenamiento Agnóstico)
@@ -147,7 +204,7 @@ class StrategyTrainer:
             if not ml_features:
                  msg = f"[StrategyTrainer] Strategy {strategy_name} returned empty features list."
                  logger.error(msg)
-                 if emit_callback: await emit_callback(msg, "error")
+                 events.append((msg, "error"))
                  return False
 
             # Verify features exist in dataset
@@ -156,7 +213,7 @@ class StrategyTrainer:
                 msg = f"[StrategyTrainer] Missing features for {strategy_name}: {missing_cols}"
                 logger.error(msg)
                 print(msg)
-                if emit_callback: await emit_callback(msg, "error")
+                events.append((msg, "error"))
                 return False
 
             X = full_dataset[ml_features]
@@ -165,10 +222,12 @@ class StrategyTrainer:
             # Entrenamiento del clasificador con mayor profundidad para captar las reglas de PnL
             msg_train = f"[StrategyTrainer] Training {strategy_name} on {len(X)} samples with features: {ml_features}..."
             print(msg_train)
-            if emit_callback: await emit_callback(msg_train, "info")
+            events.append((msg_train, "info"))
             
-            model = RandomForestClassifier(n_estimators=150, max_depth=10, random_state=42)
+            model = RandomForestClassifier(n_estimators=150, max_depth=10, random_state=42, n_jobs=n_jobs)
             model.fit(X, y)
+            # El modelo persistido no arrastra la configuración de paralelismo del fit
+            model.set_params(n_jobs=None)
 
             # Persistencia segmentada por mercado
             market_dir = os.path.join(self.models_dir, market_type.lower()).replace('\\', '/')
@@ -176,85 +235,121 @@ class StrategyTrainer:
 
             model_file = os.path.join(market_dir, f"{strategy_name}.pkl").replace('\\', '/')
             joblib.dump(model, model_file)
+            # Copia en arrays planos para servirla con mmap (compartida entre procesos)
+            export_forest(model, model_file)
             
             logger.info(f"Modelo {strategy_name}.pkl generado exitosamente.")
             msg_success = f"[StrategyTrainer] Saved model: {strategy_name}.pkl"
             print(msg_success)
-            if emit_callback: await emit_callback(msg_success, "success")
+            events.append((msg_success, "success"))
             
             return True
         except Exception as e:
             logger.error(f"Error en entrenamiento de {strategy_name}: {e}")
             print(f"[StrategyTrainer] Error training {strategy_name}: {e}")
-            if emit_callback: await emit_callback(f"Error training {strategy_name}: {e}", "error")
+            events.append((f"Error training {strategy_name}: {e}", "error"))
             return False
 
-    async def train_all(self, symbols_data: Dict[str, pd.DataFrame], market_type: str = "spot", emit_callback=None):
-        """Entrena todas las estrategias disponibles."""
+    async def train_all(self, symbols_data: Dict[str, pd.DataFrame], market_type: str = "spot", emit_callback=None, progress_callback=None):
+        """
+        Entrena todas las estrategias disponibles en paralelo (pool de entrenamiento).
+
+        Fase 1: un job por símbolo aplica todas las estrategias con una caché de indicadores
+        compartida (cada indicador distinto se calcula una vez por símbolo).
+        Fase 2: un job por estrategia entrena su modelo con los patrones de todos los símbolos.
+        El progreso de cada estrategia se emite por emit_callback a medida que termina, y
+        progress_callback(terminadas, total) recibe el avance de la fase 2.
+        """
         strategies = self.discover_strategies(market_type)
         print(f"[StrategyTrainer] Found {len(strategies)} strategies to train for {market_type}: {strategies}")
         if emit_callback: await emit_callback(f"Found {len(strategies)} strategies for {market_type}", "info")
         
+        # Fase 1: features compartidas por símbolo
+        if emit_callback: await emit_callback(f"Computing features for {len(symbols_data)} symbols...", "info")
+        feature_jobs = [
+            (symbol, strategy_frames_job, (self.strategies_dir, self.models_dir, strategies, market_type, symbol, df))
+            for symbol, df in symbols_data.items()
+        ]
+        frames: Dict[str, List[Optional[pd.DataFrame]]] = {strat: [] for strat in strategies}
+        for symbol, outcome, error in await run_jobs(self._get_executor(), feature_jobs):
+            if error is not None:
+                logger.error(f"Error calculando features de {symbol}: {error}")
+                continue
+            for strat in strategies:
+                frames[strat].append(outcome.get(strat))
+
+        # Fase 2: un fit por estrategia
         results = {}
+        jobs = []
         for strat in strategies:
-            success = await self.train_agnostic_model(strat, symbols_data, market_type, emit_callback)
+            if emit_callback: await emit_callback(f"Starting training for {strat}...", "info")
+            jobs.append((strat, fit_strategy_job, (self.strategies_dir, self.models_dir, strat, frames[strat], market_type, self.n_jobs)))
+
+        async def _on_result(strat, outcome, error):
+            success, events = outcome if error is None else (False, [(f"Error training {strat}: {error}", "error")])
             results[strat] = "Success" if success else "Failed"
+            if emit_callback:
+                for msg, level in events:
+                    await emit_callback(msg, level)
+            if progress_callback:
+                await progress_callback(len(results), len(jobs))
+
+        await run_jobs(self._get_executor(), jobs, _on_result)
+        results = {strat: results[strat] for strat in strategies}
         print(f"[StrategyTrainer] Training complete. Results: {results}")
         if emit_callback: await emit_callback("Training complete", "success")
         return results
 
+    def _get_executor(self) -> Executor:
+        return self.executor or get_training_executor()
+
+    def _job_args(self, strategy_name: str, symbols_data: Dict[str, pd.DataFrame], market_type: str) -> tuple:
+        return (self.strategies_dir, self.models_dir, strategy_name, symbols_data, market_type, self.n_jobs)
+
     def _inject_position_context(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Inyección de Contexto (Long/Short flipping).
         Enseña a la IA que si hay pérdida, no debe flippear (Profit Guard), debe esperar o promediar.
+        Calculado sobre arrays NumPy por el módulo compartido position_context.
         """
-        df = df.copy()
-        df['in_position'] = 0
-        df['current_pnl'] = 0.0
-        
-        avg_price = 0.0
-        in_pos = False
-        current_side = None
-        
-        for i in range(1, len(df)):
-            current_close = df.iloc[i]['close']
-            # Obtener la señal original de la estrategia técnica
-            original_signal = df.iloc[i]['signal']
-            
-            if in_pos:
-                df.at[df.index[i], 'in_position'] = 1
-                
-                # Calcular PnL según dirección
-                if current_side == "BUY":
-                    pnl = (current_close - avg_price) / avg_price
-                else:
-                    pnl = (avg_price - current_close) / avg_price
-                    
-                df.at[df.index[i], 'current_pnl'] = pnl
-
-                # PROFIT GUARD TRAINING:
-                # Si la señal es contraria pero el PnL es negativo, enseñamos a ESPERAR (0)
-                is_reversal = (current_side == "BUY" and original_signal == 2) or \
-                              (current_side == "SELL" and original_signal == 1)
-
-                if is_reversal and pnl < -0.005: # -0.5% margen
-                    df.at[df.index[i], 'signal'] = 0 # WAIT
-
-                # Actualizar estado si hubo flip exitoso (o entrada inicial)
-                if original_signal == 1:
-                    current_side = "BUY"
-                    avg_price = current_close
-                elif original_signal == 2:
-                    current_side = "SELL"
-                    avg_price = current_close
-            else:
-                if original_signal == 1:
-                    in_pos = True
-                    current_side = "BUY"
-                    avg_price = current_close
-                elif original_signal == 2:
-                    in_pos = True
-                    current_side = "SELL"
-                    avg_price = current_close
-                    
-        return df
+        return inject_training_context(df)
+
+
+def get_training_executor() -> Executor:
+    """Pool compartido de entrenamiento, configurable vía TRAINING_EXECUTOR / TRAINING_WORKERS."""
+    return get_executor("training", Config.TRAINING_EXECUTOR, Config.TRAINING_WORKERS)
+
+
+def train_strategy_job(strategies_dir: str, models_dir: str, strategy_name: str, symbols_data: Dict[str, pd.DataFrame], market_type: str, n_jobs: int = None) -> Tuple[bool, List[Tuple[str, str]]]:
+    """
+    Unidad de trabajo picklable para el pool de entrenamiento (hilo o proceso).
+    Devuelve (éxito, eventos de progreso) para que el event loop los emita.
+    """
+    events: List[Tuple[str, str]] = []
+    trainer = StrategyTrainer(strategies_dir=strategies_dir, models_dir=models_dir)
+    success = trainer.fit_agnostic_model(strategy_name, symbols_data, market_type, n_jobs=n_jobs, events=events)
+    return success, events
+
+
+def strategy_frames_job(strategies_dir: str, models_dir: str, strategy_names: List[str], market_type: str, symbol: str, df: pd.DataFrame) -> Dict[str, Optional[pd.DataFrame]]:
+    """Fase 1 del entrenamiento: patrones de todas las estrategias sobre un símbolo con indicadores compartidos."""
+    trainer = StrategyTrainer(strategies_dir=strategies_dir, models_dir=models_dir)
+    cache = IndicatorCache()
+    market = market_frame(df)
+    frames = {}
+    for name in strategy_names:
+        try:
+            frames[name] = trainer.strategy_frame(name, market_type, symbol, market, cache)
+        except Exception as e:
+            logger.error(f"Error aplicando {name} sobre {symbol}: {e}")
+            frames[name] = None
+    logger.info(f"Features de {symbol}: {cache.computed} indicadores calculados, {cache.hits} reutilizados")
+    return frames
+
+
+def fit_strategy_job(strategies_dir: str, models_dir: str, strategy_name: str, frames: List[Optional[pd.DataFrame]], market_type: str, n_jobs: int = None) -> Tuple[bool, List[Tuple[str, str]]]:
+    """Fase 2 del entrenamiento: fit + persistencia de una estrategia. Devuelve (éxito, eventos)."""
+    events: List[Tuple[str, str]] = []
+    trainer = StrategyTrainer(strategies_dir=strategies_dir, models_dir=models_dir)
+    success = trainer.fit_strategy_frames(strategy_name, frames, market_type, n_jobs=n_jobs, events=events)
+    return success, events
@@ -1,6 +1,6 @@
 import pandas as pd
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Dict, List, Optional
 
 class BaseStrategy(ABC):
     """
@@ -13,9 +13,14 @@ class BaseStrategy(ABC):
     SIGNAL_BUY = 1    # LONG / Compra
     SIGNAL_SELL = 2   # SHORT / Venta
 
+    # Columnas de mercado: solo los indicadores calculados sobre ellas se comparten entre estrategias
+    MARKET_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
     def __init__(self, config: dict = None):
         self.config = config or {}
         self.name = self.__class__.__name__
+        self._indicator_cache = None
+        self._dataset_key = None
 
     @abstractmethod
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
@@ -32,4 +37,72 @@ class BaseStrategy(ABC):
         Retorna la lista exacta de columnas (features) que el modelo de IA 
         debe usar como entrada para predecir la señal estándar.
         """
-        pass
\ No newline at end of file
+        pass
+
+    # --- INDICADORES COMPARTIDOS (CACHÉ POR DATASET) ---
+
+    def bind_indicators(self, cache: Optional[Any], dataset_key: Any = None):
+        """Asocia la caché de indicadores del dataset que se pasará a apply() (None para desactivarla)."""
+        self._indicator_cache = cache
+        self._dataset_key = dataset_key
+
+    def indicator(self, df: pd.DataFrame, name: str, column: str, params: tuple, compute) -> pd.Series:
+        """Devuelve compute() pasando por la caché si la entrada es una columna de mercado."""
+        cache = getattr(self, '_indicator_cache', None)
+        if cache is None or column not in self.MARKET_COLUMNS:
+            return compute()
+        return cache.get(self._dataset_key, name, (column,) + tuple(params), compute)
+
+    def sma(self, df: pd.DataFrame, window: int, column: str = 'close') -> pd.Series:
+        return self.indicator(df, 'sma', column, (window,), lambda: df[column].rolling(window=window).mean())
+
+    def rolling_std(self, df: pd.DataFrame, window: int, column: str = 'close') -> pd.Series:
+        return self.indicator(df, 'std', column, (window,), lambda: df[column].rolling(window=window).std())
+
+    def rolling_max(self, df: pd.DataFrame, window: int, column: str = 'high') -> pd.Series:
+        return self.indicator(df, 'max', column, (window,), lambda: df[column].rolling(window=window).max())
+
+    def rolling_min(self, df: pd.DataFrame, window: int, column: str = 'low') -> pd.Series:
+        return self.indicator(df, 'min', column, (window,), lambda: df[column].rolling(window=window).min())
+
+    def ema(self, df: pd.DataFrame, span: int, column: str = 'close', adjust: bool = True) -> pd.Series:
+        return self.indicator(df, 'ema', column, (span, adjust), lambda: df[column].ewm(span=span, adjust=adjust).mean())
+
+    def rsi(self, df: pd.DataFrame, period: int = 14, column: str = 'close') -> pd.Series:
+        """RSI con medias simples de ganancias/pérdidas (la variante que usan las estrategias)."""
+        def compute():
+            delta = df[column].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            return 100 - (100 / (1 + (gain / loss)))
+        return self.indicator(df, 'rsi', column, (period,), compute)
+
+    # --- MODO INCREMENTAL (OPCIONAL, INFERENCIA EN VIVO) ---
+
+    def incremental_state(self) -> Optional[Dict[str, Any]]:
+        """
+        Estado inicial (ventanas rolling, EWMs) para calcular features vela a vela.
+        None indica que la estrategia no soporta el modo incremental y se recalcula con apply().
+        """
+        return None
+
+    def update_features(self, state: Dict[str, Any], candle: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """
+        Avanza el estado con una vela cerrada y devuelve la fila de features más reciente
+        (mismas columnas que get_features y mismos valores que apply() en la última fila).
+        None, como en incremental_state, indica que no hay modo incremental.
+        """
+        return None
+
+    def warm_up(self, df: pd.DataFrame) -> Optional[tuple]:
+        """Recorre el histórico una vez para construir el estado. Devuelve (estado, última fila) o None."""
+        state = self.incremental_state()
+        if state is None:
+            return None
+        features = {c: float('nan') for c in self.get_features()}
+        columns = [c for c in ('open', 'high', 'low', 'close', 'volume') if c in df.columns]
+        for candle in df[columns].to_dict('records'):
+            features = self.update_features(state, candle)
+            if features is None:
+                return None
+        return state, features
@@ -12,9 +12,9 @@ class TrendEma(BaseStrategy):
         self.slow = 21
 
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
-        df['ema_f'] = df['close'].ewm(span=self.fast).mean()
-        df['ema_s'] = df['close'].ewm(span=self.slow).mean()
-        df['vol_sma'] = df['volume'].rolling(window=20).mean()
+        df['ema_f'] = self.ema(df, self.fast)
+        df['ema_s'] = self.ema(df, self.slow)
+        df['vol_sma'] = self.sma(df, 20, column='volume')
 
         # Features
         df['ema_diff'] = (df['ema_f'] - df['ema_s']) / df['ema_s']
@@ -16,11 +16,7 @@ class SniperStrategy(BaseStrategy):
 
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
         # 1. Cálculo de RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.rsi_period).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = self.rsi(df, self.rsi_period)
 
         # 2. Cálculo de Volatilidad (ATR resumido)
         df['tr'] = df[['high', 'low', 'close']].max(axis=1) - df[['high', 'low', 'close']].min(axis=1)
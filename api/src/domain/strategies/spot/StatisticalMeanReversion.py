@@ -26,20 +26,16 @@ class StatisticalMeanReversion(BaseStrategy):
             return df
 
         # 1. Indicadores de Volatilidad (Bandas de Bollinger)
-        df['sma'] = df['close'].rolling(window=self.period).mean()
-        df['std'] = df['close'].rolling(window=self.period).std()
+        df['sma'] = self.sma(df, self.period)
+        df['std'] = self.rolling_std(df, self.period)
         df['upper_band'] = df['sma'] + (df['std'] * self.std_dev)
         df['lower_band'] = df['sma'] - (df['std'] * self.std_dev)
         
         # 2. Indicador de Momentum (RSI)
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.rsi_period).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = self.rsi(df, self.rsi_period)
 
         # 3. Filtro de Tendencia Macro
-        df['ema_200'] = df['close'].ewm(span=self.ema_trend, adjust=False).mean()
+        df['ema_200'] = self.ema(df, self.ema_trend, adjust=False)
         df['trend_direction'] = 0
         df.loc[df['close'] > df['ema_200'], 'trend_direction'] = 1  # Alcista
         df.loc[df['close'] < df['ema_200'], 'trend_direction'] = -1 # Bajista
@@ -12,8 +12,8 @@ class BollingerBandsStrategy(BaseStrategy):
         window = self.config.get('window', 20)
         std_dev = self.config.get('std_dev', 2)
 
-        df['bb_mid'] = df['close'].rolling(window=window).mean()
-        df['bb_std'] = df['close'].rolling(window=window).std()
+        df['bb_mid'] = self.sma(df, window)
+        df['bb_std'] = self.rolling_std(df, window)
         df['bb_upper'] = df['bb_mid'] + (df['bb_std'] * std_dev)
         df['bb_lower'] = df['bb_mid'] - (df['bb_std'] * std_dev)
 
@@ -10,8 +10,8 @@ class DonchianBreakoutStrategy(BaseStrategy):
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
         window = self.config.get('window', 20)
         
-        df['donchian_high'] = df['high'].rolling(window=window).max().shift(1) # Shift para evitar look-ahead bias
-        df['donchian_low'] = df['low'].rolling(window=window).min().shift(1)
+        df['donchian_high'] = self.rolling_max(df, window).shift(1) # Shift para evitar look-ahead bias
+        df['donchian_low'] = self.rolling_min(df, window).shift(1)
 
         df['signal'] = self.SIGNAL_WAIT
         
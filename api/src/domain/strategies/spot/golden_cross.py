@@ -13,8 +13,8 @@ class GoldenCrossStrategy(BaseStrategy):
         short_window = self.config.get('short_window', 50)
         long_window = self.config.get('long_window', 200)
 
-        df['sma_fast'] = df['close'].rolling(window=short_window).mean()
-        df['sma_slow'] = df['close'].rolling(window=long_window).mean()
+        df['sma_fast'] = self.sma(df, short_window)
+        df['sma_slow'] = self.sma(df, long_window)
 
         df['signal'] = self.SIGNAL_WAIT
         
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 from typing import List
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.incremental_indicators import Ewm
 
 class MACDStrategy(BaseStrategy):
     """
@@ -14,8 +15,8 @@ class MACDStrategy(BaseStrategy):
         slow = self.config.get('slow', 26)
         signal_smooth = self.config.get('signal', 9)
 
-        exp1 = df['close'].ewm(span=fast, adjust=False).mean()
-        exp2 = df['close'].ewm(span=slow, adjust=False).mean()
+        exp1 = self.ema(df, fast, adjust=False)
+        exp2 = self.ema(df, slow, adjust=False)
         df['macd'] = exp1 - exp2
         df['macd_signal'] = df['macd'].ewm(span=signal_smooth, adjust=False).mean()
         df['macd_hist'] = df['macd'] - df['macd_signal']
@@ -32,5 +33,18 @@ class MACDStrategy(BaseStrategy):
 
         return df
 
+    def incremental_state(self):
+        return {
+            'fast': Ewm(self.config.get('fast', 12), adjust=False),
+            'slow': Ewm(self.config.get('slow', 26), adjust=False),
+            'signal': Ewm(self.config.get('signal', 9), adjust=False)
+        }
+
+    def update_features(self, state, candle):
+        close = candle['close']
+        macd = state['fast'].update(close) - state['slow'].update(close)
+        macd_signal = state['signal'].update(macd)
+        return {'macd': macd, 'macd_signal': macd_signal, 'macd_hist': macd - macd_signal}
+
     def get_features(self) -> List[str]:
         return ['macd', 'macd_signal', 'macd_hist']
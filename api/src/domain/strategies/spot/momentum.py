@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 from typing import List
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.incremental_indicators import Lag
 
 class MomentumStrategy(BaseStrategy):
     """
@@ -25,5 +26,12 @@ class MomentumStrategy(BaseStrategy):
 
         return df
 
+    def incremental_state(self):
+        return {'lag': Lag(self.config.get('period', 10))}
+
+    def update_features(self, state, candle):
+        close = candle['close']
+        return {'roc': ((close / state['lag'].update(close)) - 1) * 100}
+
     def get_features(self) -> List[str]:
         return ['roc']
@@ -1,5 +1,6 @@
 import pandas as pd
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.incremental_indicators import Lag, RollingMean, safe_div
 
 class RsiReversion(BaseStrategy):
     """
@@ -13,10 +14,7 @@ class RsiReversion(BaseStrategy):
         self.overbought = int(self.config.get('overbought', 75))
 
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.rsi_period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.rsi_period).mean()
-        df['rsi'] = 100 - (100 / (1 + (gain / loss)))
+        df['rsi'] = self.rsi(df, self.rsi_period)
         
         # Rate of Change (ROC) como feature adicional
         df['roc'] = df['close'].pct_change(periods=5)
@@ -31,5 +29,19 @@ class RsiReversion(BaseStrategy):
         
         return df
 
+    def incremental_state(self):
+        return {'prev_close': None, 'gain': RollingMean(self.rsi_period), 'loss': RollingMean(self.rsi_period), 'lag': Lag(5)}
+
+    def update_features(self, state, candle):
+        close = candle['close']
+        delta = close - state['prev_close'] if state['prev_close'] is not None else float('nan')
+        state['prev_close'] = close
+        gain = state['gain'].update(delta if delta > 0 else 0.0)
+        loss = state['loss'].update(-delta if delta < 0 else 0.0)
+        return {
+            'rsi': 100 - (100 / (1 + safe_div(gain, loss))),
+            'roc': close / state['lag'].update(close) - 1
+        }
+
     def get_features(self):
         return ['rsi', 'roc']
\ No newline at end of file
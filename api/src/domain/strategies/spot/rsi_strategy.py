@@ -14,11 +14,7 @@ class RSIStrategy(BaseStrategy):
         upper_bound = self.config.get('upper', 70)
 
         # Cálculo manual de RSI vectorizado
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = self.rsi(df, period)
 
         df['signal'] = self.SIGNAL_WAIT
         
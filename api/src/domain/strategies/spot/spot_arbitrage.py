@@ -18,14 +18,14 @@ class SpotArbitrage(BaseStrategy):
             return df
 
         # 1. Cálculos Estadísticos
-        df['mean'] = df['close'].rolling(window=self.period).mean()
-        df['std'] = df['close'].rolling(window=self.period).std()
+        df['mean'] = self.sma(df, self.period)
+        df['std'] = self.rolling_std(df, self.period)
         
         # Z-Score: (Precio - Media) / Desviación
         df['z_score'] = (df['close'] - df['mean']) / df['std']
         
         # Reemplazar infinitos (cuando std es 0) por NaN
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
+        df = df.replace([np.inf, -np.inf], np.nan)
 
         # 2. Features dinámicas
         df['deviation_pct'] = (df['close'] - df['mean']) / df['mean']
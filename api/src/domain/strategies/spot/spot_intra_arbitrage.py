@@ -16,12 +16,12 @@ class SpotIntraExchangeArbitrage(BaseStrategy):
         if len(df) < self.period: return df
 
         # Lógica de Z-Score
-        df['avg'] = df['close'].rolling(self.period).mean()
-        df['std'] = df['close'].rolling(self.period).std()
+        df['avg'] = self.sma(df, self.period)
+        df['std'] = self.rolling_std(df, self.period)
         df['z_score'] = (df['close'] - df['avg']) / df['std']
         
         # Reemplazar infinitos (cuando std es 0) por NaN
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
+        df = df.replace([np.inf, -np.inf], np.nan)
 
         # Features dinámicas para que la IA entienda el contexto
         df['volatility_index'] = df['std'] / df['avg']
@@ -12,8 +12,8 @@ class StochasticStrategy(BaseStrategy):
         k_period = self.config.get('k_period', 14)
         d_period = self.config.get('d_period', 3)
         
-        low_min = df['low'].rolling(window=k_period).min()
-        high_max = df['high'].rolling(window=k_period).max()
+        low_min = self.rolling_min(df, k_period)
+        high_max = self.rolling_max(df, k_period)
         
         df['stoch_k'] = 100 * ((df['close'] - low_min) / (high_max - low_min))
         df['stoch_d'] = df['stoch_k'].rolling(window=d_period).mean()
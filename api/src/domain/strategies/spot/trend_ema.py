@@ -1,5 +1,6 @@
 import pandas as pd
 from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.incremental_indicators import Ewm, RollingMean, safe_div
 
 class TrendEma(BaseStrategy):
     """
@@ -12,9 +13,9 @@ class TrendEma(BaseStrategy):
         self.slow = 21
 
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
-        df['ema_f'] = df['close'].ewm(span=self.fast).mean()
-        df['ema_s'] = df['close'].ewm(span=self.slow).mean()
-        df['vol_sma'] = df['volume'].rolling(window=20).mean()
+        df['ema_f'] = self.ema(df, self.fast)
+        df['ema_s'] = self.ema(df, self.slow)
+        df['vol_sma'] = self.sma(df, 20, column='volume')
         
         # Features
         df['ema_diff'] = (df['ema_f'] - df['ema_s']) / df['ema_s']
@@ -30,5 +31,14 @@ class TrendEma(BaseStrategy):
         
         return df
 
+    def incremental_state(self):
+        return {'ema_f': Ewm(self.fast), 'ema_s': Ewm(self.slow), 'vol_sma': RollingMean(20)}
+
+    def update_features(self, state, candle):
+        ema_f = state['ema_f'].update(candle['close'])
+        ema_s = state['ema_s'].update(candle['close'])
+        vol_sma = state['vol_sma'].update(candle['volume'])
+        return {'ema_diff': (ema_f - ema_s) / ema_s, 'vol_ratio': safe_div(candle['volume'], vol_sma)}
+
     def get_features(self):
         return ['ema_diff', 'vol_ratio']
\ No newline at end of file
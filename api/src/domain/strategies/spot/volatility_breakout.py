@@ -11,8 +11,8 @@ class VolatilityBreakout(BaseStrategy):
         self.period = 20
 
     def apply(self, df: pd.DataFrame, current_position: dict = None) -> pd.DataFrame:
-        df['upper_channel'] = df['high'].rolling(window=self.period).max()
-        df['lower_channel'] = df['low'].rolling(window=self.period).min()
+        df['upper_channel'] = self.rolling_max(df, self.period)
+        df['lower_channel'] = self.rolling_min(df, self.period)
         
         # ATR para medir expansión de volatilidad
         df['tr'] = pd.concat([df['high'] - df['low'], 
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import shutil
+import contextlib
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+FOREST_SUFFIX = ".forest"
+# v2: leaves point to themselves (block traversal without masks)
+FORMAT_VERSION = 2
+ARRAYS = ("feature", "threshold", "children", "missing_left", "value", "roots", "classes")
+# Pointer file naming the current version directory inside the artifact
+POINTER = "current"
+
+
+def forest_dir_for(model_path: str) -> str:
+    """Flat artifact stored next to the .pkl: spot/macd.pkl -> spot/macd.forest/"""
+    return os.path.splitext(model_path)[0] + FOREST_SUFFIX
+
+
+def current_version(path: str) -> Optional[str]:
+    """Version directory the artifact's pointer file refers to, or None if there is none."""
+    try:
+        with open(os.path.join(path, POINTER)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(path, version) if version else None
+
+
+class FlatForest:
+    """
+    RandomForestClassifier exported to flat NumPy node arrays (all trees concatenated).
+
+    The arrays are saved as plain .npy files and loaded with mmap_mode='r', so every
+    process on the host maps the same pages from the OS page cache instead of owning
+    an unpickled copy of the trees. Predictions match scikit-learn exactly (same
+    float32 input cast, NaN routing, leaf normalization and tree summation order).
+
+    Leaves are self-loops (both children point to the leaf and its feature is 0), so
+    inference advances every (tree, row) pair in lockstep for max_depth steps with
+    a handful of gathers, without per-tree Python work or input validation.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = arrays["classes"]
+        self.n_features_in_ = int(meta["n_features"])
+        self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object) if meta.get("feature_names") else None
+        self.n_estimators = len(self.roots)
+        self.max_depth = int(meta["max_depth"])
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        features, thresholds, children, missing, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count, dtype=np.int32) + offset
+            leaf = tree.children_left == -1
+            # Global node indices; leaves point to themselves
+            left = np.where(leaf, nodes, tree.children_left + offset).astype(np.int32)
+            right = np.where(leaf, nodes, tree.children_right + offset).astype(np.int32)
+            children.append(np.stack([left, right], axis=1))
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            missing.append(np.asarray(tree.missing_go_to_left, dtype=np.uint8))
+            # scikit-learn >= 1.4 stores fractions and returns them as is; older versions
+            # store counts and normalize in predict_proba
+            proba = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            if not np.allclose(normalizer, 1.0):
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer
+            values.append(proba)
+            roots.append(offset)
+            offset += tree.node_count
+
+        arrays = {
+            "feature": np.concatenate(features),
+            "threshold": np.concatenate(thresholds),
+            "children": np.concatenate(children),
+            "missing_left": np.concatenate(missing),
+            "value": np.concatenate(values),
+            "roots": np.asarray(roots, dtype=np.int64),
+            "classes": np.asarray(model.classes_),
+        }
+        names = getattr(model, "feature_names_in_", None)
+        meta = {
+            "format": FORMAT_VERSION,
+            "n_features": int(model.n_features_in_),
+            "feature_names": [str(n) for n in names] if names is not None else None,
+            "max_depth": max(int(e.tree_.max_depth) for e in model.estimators_),
+        }
+        return cls(arrays, meta)
+
+    def save(self, path: str):
+        """
+        Writes the arrays to a new version directory inside `path`, then swaps the pointer
+        file with os.replace. Readers always find a complete version; the previous one is
+        kept for processes that are still loading it and removed on the next save.
+        """
+        os.makedirs(path, exist_ok=True)
+        version = f"v{time.time_ns()}-{os.getpid()}"
+        version_path = os.path.join(path, version)
+        pointer_tmp = os.path.join(path, f"{POINTER}.tmp-{os.getpid()}")
+        previous = current_version(path)
+        try:
+            os.makedirs(version_path)
+            arrays = {"feature": self.feature, "threshold": self.threshold, "children": self.children,
+                      "missing_left": self.missing_left, "value": self.value, "roots": self.roots, "classes": self.classes_}
+            for name, array in arrays.items():
+                np.save(os.path.join(version_path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            meta = {"format": FORMAT_VERSION, "n_features": self.n_features_in_,
+                    "feature_names": list(self.feature_names_in_) if self.feature_names_in_ is not None else None,
+                    "max_depth": self.max_depth}
+            with open(os.path.join(version_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            with open(pointer_tmp, "w") as f:
+                f.write(version)
+            os.replace(pointer_tmp, os.path.join(path, POINTER))
+        except BaseException:
+            shutil.rmtree(version_path, ignore_errors=True)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(pointer_tmp)
+            raise
+        self._prune(path, keep={version, os.path.basename(previous) if previous else None})
+
+    @staticmethod
+    def _prune(path: str, keep: set):
+        """Removes versions older than the kept ones (and files of the pre-pointer layout)."""
+        newest = max(name for name in keep if name)
+        for name in os.listdir(path):
+            if name in keep or name.startswith(POINTER):
+                continue
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                # Newer versions belong to another process that is still writing
+                if name < newest:
+                    shutil.rmtree(full, ignore_errors=True)
+            else:
+                with contextlib.suppress(OSError):
+                    os.remove(full)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "FlatForest":
+        version_path = current_version(path)
+        if version_path is None:
+            raise FileNotFoundError(f"no current version in flat forest artifact {path}")
+        with open(os.path.join(version_path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported flat forest format {meta.get('format')} (expected {FORMAT_VERSION})")
+        arrays = {name: np.load(os.path.join(version_path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False) for name in ARRAYS}
+        return cls(arrays, meta)
+
+    @staticmethod
+    def nbytes(path: str) -> int:
+        version_path = current_version(path)
+        return sum(os.path.getsize(os.path.join(version_path, f)) for f in os.listdir(version_path))
+
+    # --- INFERENCIA ---
+
+    def _as_array(self, X: Any) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names_in_ is not None:
+                X = X[list(self.feature_names_in_)]
+            X = X.to_numpy()
+        # scikit-learn evaluates the trees on float32
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X: Any) -> np.ndarray:
+        """Leaf index reached by each row in each tree, shape (n_estimators, n_rows)."""
+        X = self._as_array(X)
+        n = len(X)
+        flat_X = X.ravel()
+        # Offset of each row in the flattened X, repeated per tree
+        row_offset = np.tile(np.arange(n, dtype=np.int64) * X.shape[1], self.n_estimators)
+        node = np.repeat(self.roots, n)
+        for _ in range(self.max_depth):
+            x = flat_X[row_offset + self.feature[node]]
+            go_right = np.where(np.isnan(x), self.missing_left[node] == 0, x > self.threshold[node])
+            node = self.children[node, go_right.view(np.int8)]
+        return node.reshape(self.n_estimators, n)
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        leaves = self.apply(X)
+        # Sequential tree-by-tree accumulation, like RandomForestClassifier (sum() would use
+        # pairwise summation and could differ in the last bit)
+        proba = np.cumsum(self.value[leaves], axis=0)[-1]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X: Any) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def export_forest(model, model_path: str) -> Optional[str]:
+    """Exports the flat artifact next to model_path if the model is a fitted forest classifier."""
+    if not hasattr(model, "estimators_") or not hasattr(model, "classes_"):
+        return None
+    path = forest_dir_for(model_path)
+    FlatForest.from_sklearn(model).save(path)
+    return path
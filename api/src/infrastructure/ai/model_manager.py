@@ -1,15 +1,28 @@
 import os
 import joblib
 import logging
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from threading import Lock
+from api.config import Config
+from api.src.infrastructure.ai.flat_forest import POINTER, FlatForest, export_forest, forest_dir_for
 
 logger = logging.getLogger(__name__)
 
 class ModelManager:
+    """
+    Unified model registry (Singleton).
+
+    Models are loaded lazily on first use and kept in an LRU bounded by
+    MODEL_CACHE_MAX_MB (accounted by artifact size on disk). Every lookup checks
+    the file mtime, so retrained models are picked up without an explicit reload.
+    Entries are keyed by file path, so any layout (market, user...) is supported.
+    With MODEL_MMAP, forests exported next to the .pkl (<name>.forest/) are served from
+    memory-mapped flat arrays, shared by every process on the host.
+    """
     _instance = None
     _lock = Lock()
-    
+
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             with cls._lock:
@@ -21,83 +34,155 @@ class ModelManager:
     def __init__(self):
         if self._initialized:
             return
-            
-        self.models: Dict[str, Any] = {} # Key: "market_type/strategy_name"
+
         self.models_dir = "api/data/models"
+        self.max_bytes = int(Config.MODEL_CACHE_MAX_MB * 1024 * 1024)
+        # Key: absolute path -> (model, mtime, size_bytes), oldest first
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = Lock()
+        self.total_bytes = 0
+        self.available: Dict[str, str] = {} # Key: "market_type/strategy_name" -> path
         self._initialized = True
         logger.info("ModelManager initialized (Singleton)")
 
+    @property
+    def loaded_models(self) -> List[str]:
+        """Paths of the models currently resident in memory (LRU order)."""
+        with self._cache_lock:
+            return list(self._cache.keys())
+
     def load_all_models(self, models_dir: str = None):
-        """Recursively loads all .pkl models from the directory into memory."""
+        """
+        Indexes the .pkl models available under the directory without loading them.
+        Models are loaded on first use; cached entries whose file changed are reloaded.
+        """
         target_dir = models_dir or self.models_dir
         if not os.path.exists(target_dir):
             logger.warning(f"Models directory not found: {target_dir}")
             return
 
-        logger.info(f"Loading models from {target_dir}...")
-        
-        count = 0
+        available = {}
         # Walk through directory to find models (supporting subdirs like 'spot', 'futures')
         for root, _, files in os.walk(target_dir):
             for file in files:
                 if file.endswith(".pkl"):
                     full_path = os.path.join(root, file)
-                    try:
-                        # Construct key: e.g., "spot/rsi_strategy" or just "rsi_strategy"
-                        rel_path = os.path.relpath(full_path, target_dir)
-                        # Normalize key to forward slashes and remove extension
-                        key = rel_path.replace("\\", "/").replace(".pkl", "")
-                        
-                        model = joblib.load(full_path)
-                        self.models[key] = model
-                        count += 1
-                        logger.debug(f"Loaded model: {key}")
-                    except Exception as e:
-                        logger.error(f"Failed to load model {file}: {e}")
-        
-        logger.info(f"ModelManager: {count} models loaded into RAM.")
-
-    def get_model(self, strategy_name: str, market_type: str = "spot") -> Optional[Any]:
+                    # Construct key: e.g., "spot/rsi_strategy" or just "rsi_strategy"
+                    rel_path = os.path.relpath(full_path, target_dir)
+                    key = rel_path.replace("\\", "/").replace(".pkl", "")
+                    available[key] = full_path
+
+        self.available = available
+        logger.info(f"ModelManager: {len(available)} models available in {target_dir} (lazy loading).")
+
+    def resolve_path(self, strategy_name: str, market_type: str = "spot", models_dir: str = None) -> Optional[str]:
+        """Market-specific model (market_type/strategy) with fallback to the root directory."""
+        target_dir = models_dir or self.models_dir
+        path_specific = os.path.join(target_dir, market_type.lower(), f"{strategy_name}.pkl")
+        if os.path.exists(path_specific):
+            return path_specific
+        path_root = os.path.join(target_dir, f"{strategy_name}.pkl")
+        if os.path.exists(path_root):
+            return path_root
+        return None
+
+    def get_model(self, strategy_name: str, market_type: str = "spot", models_dir: str = None) -> Optional[Any]:
         """
-        Retrieves a loaded model. 
+        Retrieves a model, loading it on first use.
         Tries specific path first (market_type/strategy), then root (strategy).
         """
-        # 1. Try specific: "spot/RSI_Strategy"
-        key_specific = f"{market_type.lower()}/{strategy_name}"
-        if key_specific in self.models:
-            return self.models[key_specific]
-            
-        # 2. Try root/generic: "RSI_Strategy"
-        if strategy_name in self.models:
-            return self.models[strategy_name]
-            
+        path = self.resolve_path(strategy_name, market_type, models_dir)
+        if path is None:
+            return None
+        try:
+            return self.load(path)
+        except Exception as e:
+            logger.error(f"Failed to load model {path}: {e}")
+            return None
+
+    def load(self, path: str) -> Any:
+        """Returns the model stored at `path` through the cache (reloads if the file changed)."""
+        key = os.path.abspath(path)
+        source = self._flat_source(key)
+        stat = os.stat(os.path.join(source, POINTER) if source else key)
+
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] == stat.st_mtime:
+                self._cache.move_to_end(key)
+                return entry[0]
+
+        # Deserialize outside the lock so other models keep being served
+        model = None
+        if source:
+            try:
+                model, size = FlatForest.load(source, mmap_mode="r"), FlatForest.nbytes(source)
+            except ValueError as e:
+                # Artifact from an older format: rebuilt from the .pkl
+                logger.info(f"Stale flat artifact for {key}: {e}")
+                source, stat = None, os.stat(key)
+        if model is None:
+            model, size = joblib.load(key), stat.st_size
+            if Config.MODEL_MMAP:
+                model, size, stat = self._migrate_to_flat(key, model, size, stat)
+
+        with self._cache_lock:
+            self._evict(key)
+            self._cache[key] = (model, stat.st_mtime, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._cache) > 1:
+                oldest = next(iter(self._cache))
+                self._evict(oldest)
+                logger.debug(f"Model evicted (LRU): {oldest}")
+        logger.debug(f"Loaded model: {key} ({size / 1024:.0f} KB{', mmap' if isinstance(model, FlatForest) else ''})")
+        return model
+
+    def _flat_source(self, pkl_path: str) -> Optional[str]:
+        """Flat artifact of the model if enabled and not older than its .pkl."""
+        if not Config.MODEL_MMAP:
+            return None
+        forest_dir = forest_dir_for(pkl_path)
+        pointer = os.path.join(forest_dir, POINTER)
+        if os.path.exists(pointer) and os.path.getmtime(pointer) >= os.path.getmtime(pkl_path):
+            return forest_dir
         return None
 
+    def _migrate_to_flat(self, pkl_path: str, model: Any, size: int, stat):
+        """Exports a pickled forest to the flat format once, so the next loads use mmap."""
+        try:
+            source = export_forest(model, pkl_path)
+        except OSError as e:
+            # Another process is exporting it right now: serve the .pkl this time
+            logger.debug(f"Flat export skipped for {pkl_path}: {e}")
+            return model, size, stat
+        if not source:
+            return model, size, stat
+        logger.info(f"Model exported to flat arrays (mmap): {source}")
+        return FlatForest.load(source, mmap_mode="r"), FlatForest.nbytes(source), os.stat(os.path.join(source, POINTER))
+
     def reload_model(self, strategy_name: str, market_type: str = "spot") -> bool:
-        """Reloads a specific model from disk without restarting."""
-        # Check specific path
-        path_specific = os.path.join(self.models_dir, market_type.lower(), f"{strategy_name}.pkl")
-        path_root = os.path.join(self.models_dir, f"{strategy_name}.pkl")
-        
-        target_path = None
-        key = None
-        
-        if os.path.exists(path_specific):
-            target_path = path_specific
-            key = f"{market_type.lower()}/{strategy_name}"
-        elif os.path.exists(path_root):
-            target_path = path_root
-            key = strategy_name
-            
-        if target_path:
-            try:
-                model = joblib.load(target_path)
-                self.models[key] = model
-                logger.info(f"Model reloaded: {key}")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to reload model {key}: {e}")
-                return False
-        
-        logger.warning(f"Model file not found for reload: {strategy_name}")
-        return False
+        """Drops the cached copy of a model and loads it again from disk."""
+        path = self.resolve_path(strategy_name, market_type)
+        if path is None:
+            logger.warning(f"Model file not found for reload: {strategy_name}")
+            return False
+
+        with self._cache_lock:
+            self._evict(os.path.abspath(path))
+        try:
+            self.load(path)
+            logger.info(f"Model reloaded: {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to reload model {path}: {e}")
+            return False
+
+    def clear(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self.total_bytes = 0
+
+    def _evict(self, key: str):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("Concurrency")
+
+__all__ = ['get_executor', 'shutdown_executors', 'run_jobs']
+
+_executors: Dict[str, Executor] = {}
+_lock = Lock()
+
+
+def get_executor(name: str, kind: str = "thread", workers: int = 4) -> Executor:
+    """
+    Devuelve (o crea una sola vez) un pool con nombre para trabajo CPU-bound.
+    kind: "thread" para cargas NumPy/sklearn que liberan el GIL, "process" para aislar CPU.
+    """
+    with _lock:
+        if name not in _executors:
+            workers = max(1, int(workers))
+            if kind == "process":
+                _executors[name] = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            logger.info(f"Pool '{name}' creado ({kind}, {workers} workers)")
+        return _executors[name]
+
+
+def shutdown_executors(wait: bool = False):
+    """Cierra todos los pools (shutdown de la API)."""
+    with _lock:
+        for name, executor in _executors.items():
+            executor.shutdown(wait=wait, cancel_futures=True)
+        _executors.clear()
+
+
+async def run_jobs(
+    executor: Executor,
+    jobs: Iterable[Tuple[str, Callable, tuple]],
+    on_result: Optional[Callable[[str, Any, Optional[BaseException]], Awaitable[None]]] = None
+) -> List[Tuple[str, Any, Optional[BaseException]]]:
+    """
+    Ejecuta jobs (key, fn, args) en el pool sin bloquear el event loop.
+
+    Los resultados se entregan a on_result a medida que terminan (streaming) y se
+    devuelven en el orden original de los jobs como (key, result, error).
+    """
+    loop = asyncio.get_running_loop()
+    jobs = list(jobs)
+
+    async def _run(position: int, key: str, fn: Callable, args: tuple):
+        try:
+            result = await loop.run_in_executor(executor, fn, *args)
+            return position, key, result, None
+        except Exception as e:
+            return position, key, None, e
+
+    tasks = [asyncio.ensure_future(_run(i, key, fn, args)) for i, (key, fn, args) in enumerate(jobs)]
+    ordered: List[Optional[Tuple[str, Any, Optional[BaseException]]]] = [None] * len(tasks)
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            position, key, result, error = await next_done
+            ordered[position] = (key, result, error)
+            if on_result:
+                try:
+                    await on_result(key, result, error)
+                except Exception as e:
+                    logger.error(f"Error en callback de resultado para {key}: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return ordered
@@ -0,0 +1,62 @@
+"""
+Locks de fichero entre procesos, portables.
+
+En POSIX se usa flock (compartido/exclusivo, el kernel lo libera si el proceso muere).
+En Windows no existe fcntl: se usa msvcrt.locking sobre el primer byte, que solo ofrece
+locks exclusivos, así que los compartidos se degradan a exclusivos.
+"""
+import os
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+__all__ = ['lock_fd', 'unlock_fd', 'try_lock_file']
+
+_RETRY_SECONDS = 0.05
+
+
+def lock_fd(fd: int, exclusive: bool = True, blocking: bool = True) -> bool:
+    """Toma el lock sobre fd. Con blocking=False devuelve False si otro proceso lo tiene."""
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    os.lseek(fd, 0, os.SEEK_SET)  # msvcrt bloquea a partir de la posición actual
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+        time.sleep(_RETRY_SECONDS)
+
+
+def unlock_fd(fd: int):
+    """Libera el lock (cerrar el descriptor también lo libera)."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def try_lock_file(path: str) -> Optional[int]:
+    """
+    Lock exclusivo no bloqueante sobre un fichero. Devuelve el descriptor (mantenerlo abierto
+    conserva el lock) o None si otro proceso lo tiene.
+    """
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    if not lock_fd(fd, exclusive=True, blocking=False):
+        os.close(fd)
+        return None
+    return fd
@@ -6,3 +6,22 @@ def event_loop():
     loop = asyncio.get_event_loop_policy().new_event_loop()
     yield loop
     loop.close()
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="Ejecuta también los tests marcados como benchmark (miden tiempos)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: comparativas de tiempo; solo con --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Las comparativas de tiempo dependen de la máquina: fuera de la suite por defecto
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: usar --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+
+def random_walk(n: int, seed: int):
+    """Cierres de un paseo aleatorio log-normal y su generador, para derivar más columnas."""
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), rng
+
+
+def open_from_close(close: np.ndarray) -> np.ndarray:
+    """Apertura de cada vela = cierre de la anterior."""
+    open_ = np.roll(close, 1)
+    open_[0] = close[0]
+    return open_
+
+
+def make_ohlcv(n: int = 400, seed: int = 7, start: str = '2024-01-01', freq: str = 'h') -> pd.DataFrame:
+    """Velas OHLCV deterministas por semilla, indexadas por timestamp."""
+    close, rng = random_walk(n, seed)
+    open_ = open_from_close(close)
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) * 1.002,
+        'low': np.minimum(open_, close) * 0.998,
+        'close': close,
+        'volume': rng.random(n) * 1000
+    }, index=pd.date_range(start=start, periods=n, freq=freq, name='timestamp'))
@@ -0,0 +1,104 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from api.src.domain.services import backtest_metrics
+from api.src.domain.services.backtest_simulator import BacktestSimulator
+from api.src.domain.strategies.base import BaseStrategy
+from api.tests.helpers import open_from_close, random_walk
+
+
+def make_run(n: int = 400, seed: int = 3, trade_amount: float = 1000.0):
+    close, _ = random_walk(n, seed)
+    open_ = open_from_close(close)
+    signals = np.zeros(n)
+    signals[10::40] = BaseStrategy.SIGNAL_BUY
+    signals[30::40] = BaseStrategy.SIGNAL_SELL
+    signals[35::80] = BaseStrategy.SIGNAL_SELL  # DCA short
+    df = pd.DataFrame({'open': open_, 'close': close, 'ai_signal': signals},
+                      index=pd.date_range(start='2024-01-01', periods=n, freq='h'))
+    return df, BacktestSimulator(initial_balance=10000.0, trade_amount=trade_amount).run(df)
+
+
+def reference_equity(df: pd.DataFrame, initial_balance: float, trade_amount: float) -> np.ndarray:
+    """Equity vela a vela re-simulando el prefijo de señales (lento, solo para comparar)."""
+    equity = []
+    for i in range(len(df)):
+        # Las señales hasta la vela i-1 se ejecutan como mucho al open de la vela i
+        prefix = df.iloc[:i + 1].copy()
+        prefix.iloc[-1, prefix.columns.get_loc('ai_signal')] = 0
+        equity.append(BacktestSimulator(initial_balance, trade_amount).run(prefix)["final_balance"])
+    return np.array(equity)
+
+
+def test_equity_curve_marks_to_market_like_the_simulator():
+    df, result = make_run()
+    labels = {t["label"] for t in result["trades"]}
+    assert {"FLIP_CLOSE_LONG", "FLIP_CLOSE_SHORT", "DCA_SHORT"} <= labels
+
+    metrics, equity = backtest_metrics.metrics_and_equity(result, df.index, df['close'].to_numpy(), 10000.0)
+    np.testing.assert_allclose(equity, reference_equity(df, 10000.0, 1000.0), atol=0.01)
+    assert equity[-1] == pytest.approx(result["final_balance"], abs=0.01)
+
+
+def test_metrics_match_pandas_reference():
+    df, result = make_run()
+    metrics, equity = backtest_metrics.metrics_and_equity(result, df.index, df['close'].to_numpy(), 10000.0)
+    curve = pd.Series(equity)
+
+    drawdown = (1 - curve / curve.cummax()).max() * 100
+    returns = curve.pct_change().dropna()
+    sharpe = returns.mean() / returns.std() * np.sqrt(365 * 24)
+    pnl = pd.Series([t["pnl"] for t in result["trades"] if "pnl" in t])
+
+    assert metrics["max_drawdown"] == round(drawdown, 2)
+    assert metrics["sharpe_ratio"] == pytest.approx(sharpe, abs=1e-4)
+    assert metrics["profit_factor"] == pytest.approx(pnl[pnl > 0].sum() / -pnl[pnl < 0].sum(), abs=1e-4)
+    # Cada posición dura 20 velas (flip cada 20) y hay posición desde la vela 11 hasta el final
+    assert metrics["avg_trade_bars"] == metrics["max_trade_bars"] == 20 and metrics["avg_trade_hours"] == 20.0
+    assert metrics["closed_positions"] == sum(1 for t in result["trades"] if "pnl" in t)
+    assert metrics["exposure_pct"] == round((len(df) - 11) / len(df) * 100, 2)
+    assert metrics["profit_pct"] == result["profit_pct"] and metrics["win_rate"] == result["win_rate"]
+
+
+def test_metrics_without_trades_or_losses():
+    df, _ = make_run(n=50)
+    empty = backtest_metrics.compute_metrics({"trades": [], "total_trades": 0, "win_rate": 0, "profit_pct": 0.0},
+                                             df.index, df['close'].to_numpy(), 10000.0)
+    assert empty["max_drawdown"] == 0.0 and empty["sharpe_ratio"] == 0.0 and empty["exposure_pct"] == 0.0
+    assert empty["profit_factor"] is None and empty["sortino_ratio"] is None
+
+    rows = [{"strategy": "a", "profit_factor": None}, {"strategy": "b", "profit_factor": 1.2}]
+    assert [r["strategy"] for r in sorted(rows, key=lambda r: backtest_metrics.rank_key(r, "profit_factor"), reverse=True)] == ["b", "a"]
+
+
+def test_strategy_without_losses_ranks_first():
+    df, _ = make_run(n=50)
+    closes = df['close'].to_numpy()
+    t0, t1 = backtest_metrics.epoch_seconds(df.index)[[5, 10]]
+    winner = {"trades": [
+        {"label": "OPEN_LONG", "amount": 1.0, "price": 100.0, "time": int(t0)},
+        {"label": "FLIP_CLOSE_LONG", "amount": 1.0, "price": 110.0, "time": int(t1), "pnl": 10.0},
+    ], "total_trades": 2, "win_rate": 100.0, "profit_pct": 0.1}
+    metrics = backtest_metrics.compute_metrics(winner, df.index, closes, 10000.0)
+    assert metrics["profit_factor"] == backtest_metrics.RATIO_CAP
+
+    flat = backtest_metrics.return_metrics(np.full(20, 100.0), 8760.0)
+    rising = backtest_metrics.return_metrics(np.linspace(100.0, 120.0, 20), 8760.0)
+    assert flat["sortino_ratio"] is None and rising["sortino_ratio"] == backtest_metrics.RATIO_CAP
+
+    rows = [{"strategy": "none", "profit_factor": None}, {"strategy": "good", "profit_factor": 1.1},
+            {"strategy": "bad", "profit_factor": 0.5}, {"strategy": "lossless", "profit_factor": metrics["profit_factor"]}]
+    ranked = sorted(rows, key=lambda r: backtest_metrics.rank_key(r, "profit_factor"), reverse=True)
+    assert [r["strategy"] for r in ranked] == ["lossless", "good", "bad", "none"]
+
+
+@pytest.mark.benchmark
+def test_metrics_are_sub_millisecond():
+    df, result = make_run(n=1000)
+    closes = df['close'].to_numpy()
+    backtest_metrics.compute_metrics(result, df.index, closes, 10000.0)
+    start = time.perf_counter()
+    for _ in range(200):
+        backtest_metrics.compute_metrics(result, df.index, closes, 10000.0)
+    assert (time.perf_counter() - start) / 200 < 0.005  # holgado para CI; en local ~0.4 ms
@@ -0,0 +1,151 @@
+import unittest
+import time
+import pytest
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.backtest_simulator import BacktestSimulator
+from api.tests.helpers import open_from_close, random_walk
+
+
+def legacy_simulate_with_reversal(df_processed, initial_balance=1000.0, trade_amount=None):
+    """Copia literal del bucle fila a fila original (referencia de paridad)."""
+    balance = initial_balance
+    step_investment = trade_amount or (initial_balance * 0.2)
+    long_amount = 0
+    long_invested = 0
+    short_amount = 0
+    short_invested = 0
+    trades = []
+    win_count = 0
+    loss_count = 0
+
+    for i in range(len(df_processed) - 1):
+        current_row = df_processed.iloc[i]
+        next_row = df_processed.iloc[i+1]
+        signal = current_row['ai_signal']
+        price = next_row['open']
+        timestamp = next_row.name
+        if signal == 0:
+            continue
+        if signal == BaseStrategy.SIGNAL_BUY:
+            if short_amount > 0:
+                pnl = short_invested - (short_amount * price)
+                balance += short_invested + pnl
+                trades.append({"time": int(timestamp.timestamp()), "type": "BUY", "price": price, "amount": short_amount, "pnl": round(pnl, 2), "label": "FLIP_CLOSE_SHORT"})
+                if pnl > 0: win_count += 1
+                else: loss_count += 1
+                short_amount, short_invested = 0, 0
+                if balance >= step_investment:
+                    amount_to_buy = step_investment / price
+                    long_amount, long_invested = amount_to_buy, step_investment
+                    balance -= step_investment
+                    trades.append({"time": int(timestamp.timestamp()), "type": "BUY", "price": price, "amount": amount_to_buy, "label": "FLIP_OPEN_LONG"})
+            elif balance >= step_investment:
+                is_dca = long_amount > 0
+                amount_to_buy = step_investment / price
+                long_amount += amount_to_buy
+                long_invested += step_investment
+                balance -= step_investment
+                trades.append({"time": int(timestamp.timestamp()), "type": "BUY", "price": price, "amount": amount_to_buy, "label": "DCA_LONG" if is_dca else "OPEN_LONG"})
+        elif signal == BaseStrategy.SIGNAL_SELL:
+            if long_amount > 0:
+                pnl = (long_amount * price) - long_invested
+                balance += (long_amount * price)
+                trades.append({"time": int(timestamp.timestamp()), "type": "SELL", "price": price, "amount": long_amount, "pnl": round(pnl, 2), "label": "FLIP_CLOSE_LONG"})
+                if pnl > 0: win_count += 1
+                else: loss_count += 1
+                long_amount, long_invested = 0, 0
+                if balance >= step_investment:
+                    amount_to_short = step_investment / price
+                    short_amount, short_invested = amount_to_short, step_investment
+                    balance -= step_investment
+                    trades.append({"time": int(timestamp.timestamp()), "type": "SELL", "price": price, "amount": amount_to_short, "label": "FLIP_OPEN_SHORT"})
+            elif balance >= step_investment:
+                is_dca = short_amount > 0
+                amount_to_short = step_investment / price
+                short_amount += amount_to_short
+                short_invested += step_investment
+                balance -= step_investment
+                trades.append({"time": int(timestamp.timestamp()), "type": "SELL", "price": price, "amount": amount_to_short, "label": "DCA_SHORT" if is_dca else "OPEN_SHORT"})
+
+    final_balance = balance
+    if long_amount > 0:
+        final_balance += (long_amount * df_processed.iloc[-1]['close'])
+    if short_amount > 0:
+        pnl_short = short_invested - (short_amount * df_processed.iloc[-1]['close'])
+        final_balance += short_invested + pnl_short
+    profit_pct = ((final_balance / initial_balance) - 1) * 100
+    win_rate = (win_count / (win_count + loss_count) * 100) if (win_count + loss_count) > 0 else 0
+    return {
+        "profit_pct": round(profit_pct, 2),
+        "total_trades": len(trades),
+        "win_rate": round(win_rate, 2),
+        "final_balance": round(final_balance, 2),
+        "trades": trades
+    }
+
+
+def make_backtest_frame(n: int, seed: int, signal_density: float = 0.3) -> pd.DataFrame:
+    close, rng = random_walk(n, seed)
+    open_ = open_from_close(close)
+    signals = rng.choice(
+        [BaseStrategy.SIGNAL_WAIT, BaseStrategy.SIGNAL_BUY, BaseStrategy.SIGNAL_SELL],
+        size=n,
+        p=[1 - signal_density, signal_density / 2, signal_density / 2]
+    ).astype(float)
+    idx = pd.date_range(start='2024-01-01', periods=n, freq='min')
+    return pd.DataFrame({'open': open_, 'close': close, 'ai_signal': signals}, index=idx)
+
+
+class TestBacktestSimulatorParity(unittest.TestCase):
+    """El motor vectorizado debe producir exactamente lo mismo que el bucle con iloc."""
+
+    def assert_parity(self, df, initial_balance, trade_amount):
+        expected = legacy_simulate_with_reversal(df, initial_balance=initial_balance, trade_amount=trade_amount)
+        result = BacktestSimulator(initial_balance=initial_balance, trade_amount=trade_amount).run(df)
+        self.assertEqual(result, expected)
+
+    def test_parity_random_signals(self):
+        for seed in range(5):
+            df = make_backtest_frame(600, seed)
+            self.assert_parity(df, 10000.0, None)
+            self.assert_parity(df, 10000.0, 1500.0)
+            self.assert_parity(df, 1000.0, 999.0)
+
+    def test_parity_sparse_and_dense(self):
+        self.assert_parity(make_backtest_frame(800, 11, signal_density=0.02), 10000.0, 2000.0)
+        self.assert_parity(make_backtest_frame(800, 12, signal_density=1.0), 10000.0, 500.0)
+
+    def test_parity_edge_cases(self):
+        # Sin señales, una sola vela y posición abierta al final
+        df = make_backtest_frame(50, 3, signal_density=0.0)
+        self.assert_parity(df, 10000.0, None)
+        self.assert_parity(df.iloc[:1], 10000.0, None)
+        df_open = make_backtest_frame(20, 4, signal_density=0.0)
+        df_open.iloc[5, df_open.columns.get_loc('ai_signal')] = BaseStrategy.SIGNAL_SELL
+        self.assert_parity(df_open, 10000.0, 2000.0)
+
+    def test_parity_long_run(self):
+        self.assert_parity(make_backtest_frame(20000, 42), 10000.0, 100.0)
+
+    @pytest.mark.benchmark
+    def test_benchmark_against_row_loop(self):
+        df = make_backtest_frame(20000, 42)
+
+        t0 = time.perf_counter()
+        legacy_simulate_with_reversal(df, initial_balance=10000.0, trade_amount=100.0)
+        legacy_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        BacktestSimulator(initial_balance=10000.0, trade_amount=100.0).run(df)
+        vector_s = time.perf_counter() - t0
+
+        self.assertLess(vector_s, legacy_s)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import joblib
+import os
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock
+from api.src.application.services.ml_service import MLService
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.tests.helpers import make_ohlcv
+
+STRATEGIES = ["rsi_reversion", "macd"]
+
+
+class CountingModel:
+    """Envuelve un modelo entrenado y cuenta las llamadas a predict (y filas por llamada)."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return self.model.predict(X)
+
+
+@pytest.fixture
+def service(tmp_path):
+    trainer = StrategyTrainer(models_dir=str(tmp_path))
+    data = {"BTC/USDT": make_ohlcv(seed=1), "ETH/USDT": make_ohlcv(seed=2)}
+    for name in STRATEGIES:
+        assert asyncio.run(trainer.train_agnostic_model(name, data, "spot"))
+
+    models = {name: CountingModel(joblib.load(os.path.join(str(tmp_path), "spot", f"{name}.pkl"))) for name in STRATEGIES}
+    ml = MLService(exchange_adapter=MagicMock(), trainer=trainer)
+    ml.model_manager = MagicMock(get_model=lambda name, market_type="spot": models.get(name))
+    return ml, models
+
+
+def test_batch_matches_per_bot_predict(service):
+    ml, models = service
+    candles = make_ohlcv(seed=3).reset_index()
+    last_close = candles['close'].iloc[-1]
+    positions = [
+        {"qty": 0, "avg_price": 0},
+        {"qty": 1, "avg_price": last_close * 0.9},
+        {"qty": 2, "avg_price": last_close * 1.1},
+    ]
+    requests = [
+        {"key": f"bot{i}", "strategy_name": STRATEGIES[i % 2], "market_type": "spot", "current_position": pos}
+        for i, pos in enumerate(positions * 4)
+    ]
+
+    expected = {
+        r["key"]: ml.predict("BTC/USDT", "1h", candles.to_dict('records'), market_type="spot",
+                             strategy_name=r["strategy_name"], current_position=r["current_position"])
+        for r in requests
+    }
+    for model in models.values():
+        model.calls.clear()
+
+    batch = ml.predict_batch("BTC/USDT", "1h", candles, requests)
+
+    assert batch == expected
+    # Un único predict por estrategia con una fila por bot
+    assert {name: m.calls for name, m in models.items()} == {"rsi_reversion": [6], "macd": [6]}
+
+
+def test_batch_without_data_holds(service):
+    ml, _ = service
+    result = ml.predict_batch("BTC/USDT", "1h", pd.DataFrame(), [{"key": "a", "strategy_name": "macd"}])
+    assert result == {"a": {"strategy": "HOLD", "confidence": 0.0, "reason": "No data"}}
+
+
+def test_incremental_stream_matches_full_recompute(service):
+    ml, _ = service
+    candles = make_ohlcv(seed=4).reset_index()
+    requests = [{"key": name, "strategy_name": name, "market_type": "spot",
+                 "current_position": {"qty": 1, "avg_price": 100.0}} for name in STRATEGIES]
+
+    for end in range(350, 400):
+        window = candles.iloc[:end]
+        full = ml.predict_batch("BTC/USDT", "1h", window, requests)
+        live = ml.predict_batch("BTC/USDT", "1h", window, requests, stream_key="binance:BTC/USDT:1h")
+        assert live == full
@@ -0,0 +1,142 @@
+import pytest
+from bson import ObjectId
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.src.adapters.driven.persistence.bot_routing_index import BotRoutingIndex
+from api.src.application.services.bot_service import SignalBotService
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        self._it = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def make_db(bots, trades, users):
+    db = MagicMock()
+    db.bot_instances.find = MagicMock(return_value=FakeCursor(bots))
+    db.trades.find = MagicMock(return_value=FakeCursor(trades))
+    db.users.find = MagicMock(return_value=FakeCursor(users))
+    return db
+
+
+def bot(symbol="BTC/USDT", timeframe="1h", exchange="OKX", status="active"):
+    return {"_id": ObjectId(), "symbol": symbol, "timeframe": timeframe, "exchangeId": exchange, "status": status}
+
+
+@pytest.mark.asyncio
+async def test_index_routes_bots_and_trades():
+    user_id = ObjectId()
+    bots = [bot(), bot(timeframe="15m"), bot(exchange=None), bot(symbol="ETH/USDT")]
+    trades = [
+        {"_id": ObjectId(), "symbol": "BTC/USDT", "exchangeId": "okx", "status": "open", "userId": user_id},
+        {"_id": ObjectId(), "symbol": "BTC/USDT", "status": "active", "userId": user_id},
+    ]
+    index = BotRoutingIndex(db_adapter=make_db(bots, trades, [{"_id": user_id, "openId": "u-1"}]))
+    await index.load()
+
+    assert [b["_id"] for b in index.bots_for("okx", "BTC/USDT", "1h")] == [bots[0]["_id"]]
+    assert [b["_id"] for b in index.bots_for("binance", "BTC/USDT", "1h")] == [bots[2]["_id"]]
+    assert [t["_id"] for t in index.trades_for("okx", "BTC/USDT")] == [trades[0]["_id"]]
+    assert [t["_id"] for t in index.trades_for("binance", "BTC/USDT")] == [trades[1]["_id"]]
+    assert index.user_open_id(user_id) == "u-1"
+
+    # CRUD: pausar, mover de timeframe y borrar
+    index.patch_bot(str(bots[0]["_id"]), {"status": "paused"})
+    assert index.bots_for("okx", "BTC/USDT", "1h") == []
+    index.patch_bot(bots[1]["_id"], {"timeframe": "4h", "position": {"qty": 1}})
+    assert index.bots_for("okx", "BTC/USDT", "15m") == []
+    assert index.bots_for("okx", "BTC/USDT", "4h")[0]["position"] == {"qty": 1}
+    index.patch_bot(bots[1]["_id"], {"side": "BUY"}, inc={"total_pnl": 2.5})
+    index.patch_bot(bots[1]["_id"], {}, inc={"total_pnl": -1.0})
+    assert index.bots_for("okx", "BTC/USDT", "4h")[0]["total_pnl"] == 1.5
+    index.remove_bot(str(bots[3]["_id"]))
+    assert index.bots_for("okx", "ETH/USDT", "1h") == []
+
+    index.upsert_trade({**trades[0], "status": "closed"})
+    assert index.trades_for("okx", "BTC/USDT") == []
+
+
+@pytest.mark.asyncio
+async def test_change_stream_events_update_index():
+    index = BotRoutingIndex(db_adapter=make_db([], [], []))
+    doc = bot()
+    await index._on_bot_change({"operationType": "insert", "fullDocument": doc})
+    assert len(index.bots_for("okx", "BTC/USDT", "1h")) == 1
+    await index._on_bot_change({"operationType": "delete", "documentKey": {"_id": doc["_id"]}})
+    assert index.bots_for("okx", "BTC/USDT", "1h") == []
+
+
+@pytest.mark.asyncio
+async def test_market_events_do_not_read_mongo():
+    user_id = ObjectId()
+    bots = [{**bot(exchange="okx"), "user_id": "u-1"}]
+    trades = [{"_id": ObjectId(), "botId": "b1", "symbol": "BTC/USDT", "exchangeId": "okx", "status": "open",
+               "userId": user_id, "entryPrice": 100.0, "side": "BUY"}]
+    index = BotRoutingIndex(db_adapter=make_db(bots, trades, [{"_id": user_id, "openId": "u-1"}]))
+    await index.load()
+
+    service = SignalBotService(cex_service=MagicMock(), dex_service=MagicMock(), ml_service=MagicMock(),
+                               stream_service=MagicMock(), engine=MagicMock(), routing_index=index)
+    service.buffer_service = MagicMock(update_with_candle=AsyncMock(), get_latest_data=MagicMock(return_value=None))
+
+    hot_db = MagicMock()
+    hot_db.trades.update_one = AsyncMock()
+    hot_db.bot_instances.find = MagicMock(side_effect=AssertionError("DB read on candle event"))
+    hot_db.trades.find = MagicMock(side_effect=AssertionError("DB read on ticker event"))
+    hot_db.users.find_one = AsyncMock(side_effect=AssertionError("DB read on ticker event"))
+    socket = MagicMock(emit_to_user=AsyncMock(), publish=AsyncMock())
+
+    with patch('api.src.application.services.bot_service.db', hot_db), \
+         patch('api.src.adapters.driven.notifications.socket_service.socket_service', socket):
+        await service.handle_market_update("ticker_update", {"symbol": "BTC/USDT", "exchange": "okx", "ticker": {"last": 110.0}})
+        await service.handle_market_update("candle_update", {"symbol": "BTC/USDT", "timeframe": "1h", "exchange": "okx", "candle": {
+            "timestamp": 1_700_000_000_000, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0}})
+
+    hot_db.trades.update_one.assert_awaited_once()
+    published = [(c.args[0], c.args[1], c.kwargs["owners"]) for c in socket.publish.await_args_list]
+    assert published == [("bot:b1", "bot_update", ["u-1"]), ("candles:okx:BTC/USDT:1h", "candle_update", {"u-1"})]
+    assert socket.publish.await_args_list[0].args[2]["pnl"] == 10.0
+    service.buffer_service.update_with_candle.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_update_bot_route_refreshes_index():
+    from api.src.adapters.driving.api.routers import bot_router
+    from api.src.adapters.driving.api.routers.bot_router import UpdateBotSchema, update_bot
+
+    doc = {**bot(exchange="okx"), "userId": "u-1"}
+    db = make_db([dict(doc)], [], [])
+
+    async def find_one(query):
+        return dict(doc) if query["_id"] == doc["_id"] else None
+
+    async def update_one(query, update):
+        doc.update(update["$set"])
+        return MagicMock(modified_count=1)
+
+    db.bot_instances.find_one = find_one
+    db.bot_instances.update_one = update_one
+    index = BotRoutingIndex(db_adapter=db)
+    await index.load()
+
+    with patch.object(bot_router.repo, 'collection', db.bot_instances), \
+         patch('api.src.adapters.driven.persistence.mongodb_bot_repository.bot_routing_index', index), \
+         patch.object(bot_router, 'socket_service', MagicMock(emit_to_user=AsyncMock())):
+        await update_bot(str(doc["_id"]), UpdateBotSchema(timeframe="4h"), current_user={"openId": "u-1"})
+        assert index.bots_for("okx", "BTC/USDT", "1h") == []
+        assert [b["_id"] for b in index.bots_for("okx", "BTC/USDT", "4h")] == [doc["_id"]]
+
+        await update_bot(str(doc["_id"]), UpdateBotSchema(status="paused"), current_user={"openId": "u-1"})
+        assert index.bots_for("okx", "BTC/USDT", "4h") == []
@@ -0,0 +1,213 @@
+import pytest
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import DuplicateKeyError
+from api.src.adapters.driven.persistence.bot_routing_index import BotRoutingIndex
+from api.src.application.services.bot_service import SignalBotService
+from api.src.application.services.bot_sharding import HashRing, ShardCoordinator, stream_key
+from api.src.domain.services.incremental_indicators import IncrementalFeatureCache
+
+
+def matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = doc.get(field)
+            if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif doc.get(field) != cond:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """Lo justo de Motor para el coordinador: upserts condicionales con DuplicateKeyError."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and matches(doc, query):
+            doc.update(update["$set"])
+        elif doc is not None and upsert:
+            raise DuplicateKeyError("E11000 duplicate key")
+        elif doc is None and upsert:
+            self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and matches(doc, query):
+            del self.docs[query["_id"]]
+
+    async def find_one(self, query):
+        return next((d for d in self.docs.values() if matches(d, query)), None)
+
+    def find(self, query):
+        return FakeCursor([d for d in self.docs.values() if matches(d, query)])
+
+
+def fake_db():
+    db = MagicMock()
+    db.bot_workers = FakeCollection()
+    db.bot_shards = FakeCollection()
+    return db
+
+
+STREAMS = [("okx", f"COIN{i}/USDT") for i in range(60)] + [("binance", "BTC/USDT")]
+
+
+def make_worker(db, name):
+    running = set()
+
+    async def acquire(ex, symbol):
+        running.add((ex, symbol))
+
+    async def release(ex, symbol):
+        running.discard((ex, symbol))
+
+    worker = ShardCoordinator(db_adapter=db, worker_id=name, heartbeat_seconds=3600, worker_ttl=30)
+    worker._streams, worker._on_acquire, worker._on_release = (lambda: STREAMS), acquire, release
+    return worker, running
+
+
+def assert_partition(workers):
+    owners = Counter(s for w in workers for s in w.owned)
+    assert all(count == 1 for count in owners.values())  # nunca dos workers con el mismo stream
+    return set(owners)
+
+
+def test_ring_spreads_keys_and_only_moves_the_removed_node_keys():
+    keys = [stream_key(*s) for s in STREAMS] + [f"okx:X{i}/USDT" for i in range(1000)]
+    ring = HashRing(["w1", "w2", "w3", "w4"], vnodes=64)
+    owners = {k: ring.owner(k) for k in keys}
+    load = Counter(owners.values())
+    assert set(load) == {"w1", "w2", "w3", "w4"} and min(load.values()) > len(keys) * 0.15
+
+    smaller = HashRing(["w1", "w2", "w4"], vnodes=64)
+    moved = [k for k in keys if smaller.owner(k) != owners[k]]
+    assert moved and all(owners[k] == "w3" for k in moved)
+    assert HashRing([]).owner("okx:BTC/USDT") is None
+
+
+@pytest.mark.asyncio
+async def test_streams_are_partitioned_and_rebalanced_when_a_worker_dies():
+    db = fake_db()
+    workers = [make_worker(db, f"w{i}") for i in range(3)]
+    # Todos se registran antes del reparto (el primero en llegar no se queda con todo)
+    for _ in range(2):
+        for worker, _ in workers:
+            await worker.sync()
+    assert assert_partition([w for w, _ in workers]) == set(STREAMS)
+    assert all(running == w.owned and running for w, running in workers)
+    assert {d["workerId"] for d in db.bot_shards.docs.values()} == {"w0", "w1", "w2"}
+
+    # w2 deja de latir: tras el TTL sus streams pasan a w0/w1 aunque su asignación siga en Mongo
+    dead, _ = workers.pop()
+    db.bot_workers.docs["w2"]["heartbeatAt"] = datetime.utcnow() - timedelta(seconds=60)
+    orphaned = set(dead.owned)
+    for worker, _ in workers:
+        acquired, released = await worker.sync()
+        assert released == []
+    assert assert_partition([w for w, _ in workers]) == set(STREAMS)
+    assert orphaned <= workers[0][0].owned | workers[1][0].owned
+
+    # Un worker nuevo: primero lo liberan sus dueños vivos, luego lo reclama
+    newcomer = make_worker(db, "w3")
+    workers.append(newcomer)
+    await newcomer[0].sync()
+    assert newcomer[0].owned == set()  # los dueños actuales siguen vivos
+    for worker, _ in workers:
+        await worker.sync()
+        assert_partition([w for w, _ in workers])
+    await newcomer[0].sync()
+    assert newcomer[0].owned and assert_partition([w for w, _ in workers]) == set(STREAMS)
+
+    # Salida ordenada: libera todo y deja de contar como vivo
+    await newcomer[0].stop()
+    assert newcomer[1] == set() and "w3" not in db.bot_workers.docs
+    for worker, _ in workers[:2]:
+        await worker.sync()
+    assert assert_partition([w for w, _ in workers]) == set(STREAMS)
+
+
+@pytest.mark.asyncio
+async def test_signal_bot_service_only_runs_its_streams():
+    user_id = ObjectId()
+    bots = [
+        {"_id": ObjectId(), "symbol": "BTC/USDT", "timeframe": "1h", "exchangeId": "OKX", "status": "active"},
+        {"_id": ObjectId(), "symbol": "BTC/USDT", "timeframe": "15m", "exchangeId": "okx", "status": "active"},
+        {"_id": ObjectId(), "symbol": "ETH/USDT", "timeframe": "1h", "exchangeId": "okx", "status": "paused"},
+    ]
+    trades = [{"_id": ObjectId(), "symbol": "SOL/USDT", "status": "open", "userId": user_id}]
+    index = BotRoutingIndex(db_adapter=MagicMock())
+    for b in bots:
+        index.upsert_bot(b)
+    for t in trades:
+        index.upsert_trade(t)
+
+    stream_service = MagicMock()
+    stream_service.subscribe_candles = AsyncMock()
+    stream_service.subscribe_ticker = AsyncMock()
+    stream_service.unsubscribe = AsyncMock()
+    service = SignalBotService(cex_service=MagicMock(), dex_service=MagicMock(), ml_service=MagicMock(),
+                               stream_service=stream_service, engine=MagicMock(), routing_index=index)
+    service.buffer_service.initialize_buffer = AsyncMock()
+
+    assert service.streams() == {("okx", "BTC/USDT"), ("binance", "SOL/USDT")}
+    await service.start_stream("okx", "BTC/USDT")
+    assert sorted(c.args[2] for c in stream_service.subscribe_candles.call_args_list) == ["15m", "1h"]
+    stream_service.subscribe_ticker.assert_awaited_once_with("okx", "BTC/USDT")
+
+    service._last_analyzed_per_bot = {"okx:BTC/USDT:1h": 1, "okx:ETH/USDT:1h": 2}
+    cache = service.ml_service.feature_cache = IncrementalFeatureCache()
+    cache._entries = {("okx:BTC/USDT:1h", "macd", "spot"): None, ("okx:BTC/USDT:15m", "macd", "spot", "{}"): None,
+                      ("okx:ETH/USDT:1h", "macd", "spot"): None}
+    await service.stop_stream("okx", "BTC/USDT")
+    stream_service.unsubscribe.assert_awaited_once_with("okx", "BTC/USDT")
+    assert service._last_analyzed_per_bot == {"okx:ETH/USDT:1h": 2}
+    assert list(cache._entries) == [("okx:ETH/USDT:1h", "macd", "spot")]
+
+
+@pytest.mark.asyncio
+async def test_a_stalled_worker_stops_the_streams_it_lost():
+    db = fake_db()
+    (w0, running0), (w1, running1) = make_worker(db, "w0"), make_worker(db, "w1")
+    for _ in range(2):
+        await w0.sync()
+        await w1.sync()
+    before = set(w0.owned)
+    assert before and assert_partition([w0, w1]) == set(STREAMS)
+
+    # w0 se cuelga más que el TTL: w1 lo da por muerto y reclama sus streams
+    db.bot_workers.docs["w0"]["heartbeatAt"] = datetime.utcnow() - timedelta(seconds=60)
+    await w1.sync()
+    assert w1.owned == running1 == set(STREAMS)
+
+    # Al despertar, w0 ve su heartbeat caducado y para todo antes de volver a latir
+    acquired, released = await w0.sync()
+    assert set(released) == before and running0 == set() and acquired == []
+    assert assert_partition([w0, w1]) == set(STREAMS)
+
+    # Con heartbeat vigente, un lease reasignado también se detecta
+    stream = sorted(w1.owned)[0]
+    w0.owned.add(stream)
+    running0.add(stream)
+    acquired, released = await w0.sync()
+    assert stream in released and stream not in running0 and stream not in w0.owned
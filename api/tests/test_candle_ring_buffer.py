@@ -0,0 +1,173 @@
+import asyncio
+import pytest
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from unittest.mock import MagicMock
+from api.src.domain.services.candle_ring_buffer import CandleRingBuffer
+from api.src.application.services.buffer_service import DataBufferService
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def legacy_update(buffer_df, candle):
+    """Copia de la lógica original de DataBufferService.update_with_candle (pd.concat + recorte)."""
+    new_ts = pd.to_datetime(candle['timestamp'], unit='ms')
+    if buffer_df is None or buffer_df.empty:
+        df = pd.DataFrame([candle])
+        df['timestamp'] = new_ts
+        return df.set_index('timestamp')
+    last_ts = buffer_df.index[-1]
+    if new_ts > last_ts:
+        new_row = pd.DataFrame([candle])
+        new_row['timestamp'] = new_ts
+        buffer_df = pd.concat([buffer_df, new_row.set_index('timestamp')])
+        if len(buffer_df) > 500:
+            buffer_df = buffer_df.iloc[-500:]
+    elif new_ts == last_ts:
+        for col in COLUMNS:
+            if col in candle:
+                buffer_df.at[new_ts, col] = candle[col]
+    return buffer_df
+
+
+def candle_stream(n, seed):
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000_000
+    for _ in range(n):
+        # Mezcla de velas nuevas, re-cierres de la última y velas atrasadas (ignoradas)
+        ts += int(rng.choice([0, 60_000, 60_000, 60_000, -60_000]))
+        close = float(100 + rng.normal())
+        yield {'timestamp': ts, 'open': close - 0.1, 'high': close + 0.5, 'low': close - 0.5, 'close': close, 'volume': float(rng.random())}
+
+
+class TestCandleRingBuffer(unittest.TestCase):
+    def test_matches_concat_buffer(self):
+        legacy, ring = None, CandleRingBuffer(500)
+        for candle in candle_stream(3000, seed=3):
+            legacy = legacy_update(legacy, candle)
+            new_ts = pd.to_datetime(candle['timestamp'], unit='ms')
+            last_ts = ring.last_timestamp
+            if last_ts is None or new_ts > last_ts:
+                ring.append(new_ts, candle)
+            elif new_ts == last_ts:
+                ring.update_last(**{c: candle[c] for c in COLUMNS})
+
+        self.assertEqual(len(ring), 500)
+        expected = legacy[COLUMNS].set_axis(legacy.index.astype('datetime64[ns]'))
+        pd.testing.assert_frame_equal(ring.to_frame(), expected, check_freq=False)
+
+    def test_view_is_zero_copy_and_frame_is_cached(self):
+        df = pd.DataFrame({c: np.arange(10, dtype=float) for c in COLUMNS},
+                          index=pd.date_range('2024-01-01', periods=10, freq='min', name='timestamp'))
+        ring = CandleRingBuffer.from_frame(df, capacity=8 + 2)
+        for i in range(15):
+            ring.append(df.index[-1] + pd.Timedelta(minutes=i + 1), {c: 10.0 + i for c in COLUMNS})
+
+        view = ring.view()
+        self.assertFalse(view['close'].flags.owndata)
+        self.assertFalse(view['close'].flags.writeable)
+        np.testing.assert_array_equal(view['close'], np.arange(15, 25, dtype=float))
+        self.assertTrue(np.all(np.diff(view['timestamp'].astype(np.int64)) > 0))
+
+        frame = ring.to_frame()
+        self.assertIs(ring.to_frame(), frame)
+        ring.update_last(close=99.0)
+        self.assertIsNot(ring.to_frame(), frame)
+        self.assertEqual(ring.to_frame()['close'].iloc[-1], 99.0)
+        # El DataFrame entregado antes no cambia bajo el consumidor
+        self.assertEqual(frame['close'].iloc[-1], 24.0)
+
+    @pytest.mark.benchmark
+    def test_append_is_faster_than_concat(self):
+        candles = list(candle_stream(2000, seed=5))
+        start = time.perf_counter()
+        legacy = None
+        for candle in candles:
+            legacy = legacy_update(legacy, candle)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ring = CandleRingBuffer(500)
+        for candle in candles:
+            new_ts = pd.to_datetime(candle['timestamp'], unit='ms')
+            last_ts = ring.last_timestamp
+            if last_ts is None or new_ts > last_ts:
+                ring.append(new_ts, candle)
+            elif new_ts == last_ts:
+                ring.update_last(**{c: candle[c] for c in COLUMNS})
+        ring_time = time.perf_counter() - start
+
+        self.assertLess(ring_time, legacy_time)
+
+
+class TestTickAggregation(unittest.TestCase):
+    def setUp(self):
+        DataBufferService._instance = None
+        self.service = DataBufferService(stream_service=MagicMock(), cex_service=MagicMock())
+        base = pd.Timestamp('2024-01-01 00:00')
+        for tf, step in (('1m', '1min'), ('15m', '15min'), ('1h', '1h')):
+            candle = {'timestamp': int(base.value // 1_000_000), 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.0, 'volume': 5.0}
+            asyncio.run(self.service.update_with_candle('okx', 'BTC/USDT', tf, candle))
+        asyncio.run(self.service.update_with_candle('okx', 'ETH/USDT', '1m', dict(candle)))
+
+    def tearDown(self):
+        DataBufferService._instance = None
+
+    def tick(self, when, price, symbol='BTC/USDT'):
+        ms = int(pd.Timestamp(when).value // 1_000_000)
+        asyncio.run(self.service.update_with_ticker({'exchange': 'okx', 'symbol': symbol, 'ticker': {'last': price, 'timestamp': ms}}))
+
+    def test_ticks_open_bars_on_each_timeframe_boundary(self):
+        self.tick('2024-01-01 00:00:30', 102.0)  # dentro de la vela actual en todos los timeframes
+        self.tick('2024-01-01 00:01:10', 98.0)   # nueva vela de 1m
+        self.tick('2024-01-01 00:15:00', 103.0)  # nueva vela de 1m y de 15m
+        self.tick('2024-01-01 00:14:59', 50.0)   # tick atrasado de velas ya cerradas: ignorado en 1m y 15m
+
+        m1 = self.service.get_latest_data('okx', 'BTC/USDT', '1m')
+        self.assertEqual([str(t) for t in m1.index], ['2024-01-01 00:00:00', '2024-01-01 00:01:00', '2024-01-01 00:15:00'])
+        self.assertEqual(m1['high'].tolist(), [102.0, 98.0, 103.0])
+        self.assertEqual(m1['open'].tolist()[1:], [98.0, 103.0])
+
+        m15 = self.service.get_latest_data('okx', 'BTC/USDT', '15m')
+        self.assertEqual(len(m15), 2)
+        self.assertEqual(m15.iloc[0][['open', 'high', 'low', 'close', 'volume']].tolist(), [100.0, 102.0, 98.0, 98.0, 5.0])
+        self.assertEqual(m15.iloc[1][['open', 'close', 'volume']].tolist(), [103.0, 103.0, 0.0])
+
+        # En 1h todo cae en la misma vela, incluido el tick "atrasado"
+        h1 = self.service.get_latest_data('okx', 'BTC/USDT', '1h')
+        self.assertEqual(len(h1), 1)
+        self.assertEqual(h1.iloc[0][['high', 'low', 'close']].tolist(), [103.0, 50.0, 50.0])
+
+        # Otros símbolos no se tocan
+        eth = self.service.get_latest_data('okx', 'ETH/USDT', '1m')
+        self.assertEqual(eth['close'].tolist(), [100.0])
+
+    def test_closed_candle_overrides_tick_bar(self):
+        self.tick('2024-01-01 00:01:10', 98.0)
+        confirmed = {'timestamp': int(pd.Timestamp('2024-01-01 00:01').value // 1_000_000), 'open': 99.0, 'high': 99.5, 'low': 97.0, 'close': 98.5, 'volume': 7.0}
+        asyncio.run(self.service.update_with_candle('okx', 'BTC/USDT', '1m', confirmed))
+        m1 = self.service.get_latest_data('okx', 'BTC/USDT', '1m')
+        self.assertEqual(m1.iloc[-1].tolist(), [99.0, 99.5, 97.0, 98.5, 7.0])
+
+
+    def test_late_closing_candle_overrides_bar_already_followed_by_a_tick(self):
+        self.tick('2024-01-01 00:00:40', 102.0)
+        self.tick('2024-01-01 00:01:05', 98.0)  # primer tick del bucket siguiente: abre la vela de 00:01
+        closing = {'timestamp': int(pd.Timestamp('2024-01-01 00:00').value // 1_000_000), 'open': 100.0, 'high': 102.5, 'low': 99.0, 'close': 101.0, 'volume': 12.0}
+        asyncio.run(self.service.update_with_candle('okx', 'BTC/USDT', '1m', closing))
+
+        m1 = self.service.get_latest_data('okx', 'BTC/USDT', '1m')
+        self.assertEqual(len(m1), 2)
+        self.assertEqual(m1.iloc[0].tolist(), [100.0, 102.5, 99.0, 101.0, 12.0])
+        self.assertEqual(m1.iloc[1][['open', 'close', 'volume']].tolist(), [98.0, 98.0, 0.0])
+
+        # Una vela que ya salió de la ventana no se inserta
+        old = dict(closing, timestamp=int(pd.Timestamp('2023-12-31 23:59').value // 1_000_000))
+        asyncio.run(self.service.update_with_candle('okx', 'BTC/USDT', '1m', old))
+        self.assertEqual(len(self.service.get_latest_data('okx', 'BTC/USDT', '1m')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
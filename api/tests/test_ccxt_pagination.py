@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from ccxt.base.exchange import Exchange
+from api.src.adapters.driven.exchange.ccxt_adapter import CcxtAdapter
+
+TF_MS = 60_000
+NOW = 1_700_000_000_000 // TF_MS * TF_MS
+
+
+class FakeExchange:
+    """fetch_ohlcv con tope por llamada, latencia y conteo de peticiones en vuelo."""
+    parse_timeframe = staticmethod(Exchange.parse_timeframe)
+
+    def __init__(self, cap: int, listed_at: int = 0):
+        self.cap = cap
+        self.listed_at = listed_at
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def milliseconds(self):
+        return NOW
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if since is None:
+            since = NOW - (min(limit, self.cap) - 1) * TF_MS
+        start = max(since, self.listed_at)
+        return [[ts, 1.0, 2.0, 0.5, ts / 1e9, 10.0]
+                for ts in range(start, min(start + min(limit, self.cap) * TF_MS, NOW + TF_MS), TF_MS)]
+
+
+def make_adapter(fake):
+    adapter = CcxtAdapter()
+    adapter.exchanges['binance'] = fake
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_range_is_complete_and_deduplicated():
+    # El exchange devuelve menos velas que la página asumida: se continúa desde la última
+    fake = FakeExchange(cap=700)
+    adapter = make_adapter(fake)
+    since = NOW - 30 * 1440 * TF_MS
+
+    df = await adapter.fetch_ohlcv_range('BTC/USDT', '1m', since, NOW + TF_MS, max_in_flight=4)
+
+    assert len(df) == 30 * 1440 + 1
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+    assert df.index[0].value // 1_000_000 == since
+    assert 1 < fake.max_in_flight <= 4
+
+
+@pytest.mark.asyncio
+async def test_get_historical_data_paginates_large_limits():
+    fake = FakeExchange(cap=1000)
+    adapter = make_adapter(fake)
+
+    df = await adapter.get_historical_data('BTC/USDT', '1m', limit=5000)
+    assert len(df) == 5000
+    assert df.index[-1].value // 1_000_000 == NOW
+    assert fake.calls == 5
+
+    small = await adapter.get_historical_data('BTC/USDT', '1m', limit=200)
+    assert len(small) == 200 and fake.calls == 6
+
+
+@pytest.mark.asyncio
+async def test_range_before_listing_returns_available_history():
+    listed_at = NOW - 1500 * TF_MS
+    fake = FakeExchange(cap=1000, listed_at=listed_at)
+    adapter = make_adapter(fake)
+
+    df = await adapter.fetch_ohlcv_range('NEW/USDT', '1m', NOW - 4000 * TF_MS, NOW + TF_MS)
+    assert len(df) == 1501
+    assert df.index[0].value // 1_000_000 == listed_at
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from api.src.adapters.driven.persistence.dataset_snapshots import DatasetSnapshotStore, NPY, PARQUET
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, timeframe_to_ms
+from api.src.application.services.ml_service import MLService
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+
+TF = '1h'
+TF_MS = timeframe_to_ms(TF)
+SYMBOLS = ["BTC/USDT", "ETH/USDT"]
+
+
+class FakeExchange:
+    """Exchange determinista: una vela por hueco del timeframe hasta la vela en formación."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def fetch(self, since, limit):
+        self.calls.append((since, limit))
+        now_open = (int(time.time() * 1000) // TF_MS) * TF_MS
+        if since is None:
+            since = now_open - (limit - 1) * TF_MS
+        ts = np.arange(since, min(since + limit * TF_MS, now_open + TF_MS), TF_MS, dtype=np.int64)
+        close = 100 + (ts // TF_MS % 1000) / 10
+        return pd.DataFrame({'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': ts % 97 * 1.0},
+                            index=pd.DatetimeIndex(pd.to_datetime(ts, unit='ms'), name='timestamp'))
+
+
+def fixed_since(hours_ago: int):
+    now_open = (int(time.time() * 1000) // TF_MS) * TF_MS
+    return lambda: now_open - hours_ago * TF_MS
+
+
+def failing_fetch(symbol):
+    async def fetch(since, limit):
+        raise AssertionError(f"exchange call for {symbol}")
+    return fetch
+
+
+@pytest.mark.parametrize("data_format", [NPY, PARQUET])
+def test_snapshot_reuse_append_and_contract(tmp_path, data_format):
+    if data_format == PARQUET:
+        pytest.importorskip("pyarrow")
+    store = DatasetSnapshotStore(str(tmp_path / "datasets"), OHLCVStore(str(tmp_path / "ohlcv")), data_format=data_format)
+    exchange = FakeExchange()
+
+    manifest, data = asyncio.run(store.materialize("binance", SYMBOLS, TF, lambda s: exchange.fetch, "c1",
+                                                  limit=200, since_fn=fixed_since(300)))
+    assert manifest["version"] == 1 and manifest["contract_hash"] == "c1"
+    assert {s: len(df) for s, df in data.items()} == {s: 200 for s in SYMBOLS}
+    assert manifest["symbols"]["BTC/USDT"]["rows"] == 200
+    assert manifest["symbols"]["BTC/USDT"]["end"] == int(data["BTC/USDT"].index[-1].value // 1_000_000)
+
+    # Reentrenar: misma versión, sin llamadas al exchange (ni al almacén de velas)
+    fresh = DatasetSnapshotStore(str(tmp_path / "datasets"), OHLCVStore(str(tmp_path / "empty")), data_format=data_format)
+    reused, again = asyncio.run(fresh.materialize("binance", list(reversed(SYMBOLS)), TF, failing_fetch, "c1", limit=200))
+    assert reused["version"] == 1
+    for symbol in SYMBOLS:
+        pd.testing.assert_frame_equal(again[symbol], data[symbol])
+
+    # Refresh: solo se añade la cola de velas cerradas como parte nueva
+    appended, grown = asyncio.run(fresh.materialize("binance", SYMBOLS, TF, lambda s: exchange.fetch, "c1", refresh=True))
+    entry = appended["symbols"]["ETH/USDT"]
+    assert appended["version"] == 2 and len(entry["parts"]) == 2
+    assert entry["parts"][0] == manifest["symbols"]["ETH/USDT"]["parts"][0]
+    assert entry["rows"] == len(grown["ETH/USDT"]) == 300  # hasta la última vela cerrada (la vela en formación queda fuera)
+    assert grown["ETH/USDT"].index.is_unique and grown["ETH/USDT"].index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(grown["ETH/USDT"].iloc[:200], data["ETH/USDT"])
+
+    # Cambio de contrato de features: versión nueva con las mismas partes, sin descargas
+    recontracted, _ = asyncio.run(fresh.materialize("binance", SYMBOLS, TF, failing_fetch, "c2"))
+    assert recontracted["version"] == 3 and recontracted["contract_hash"] == "c2"
+    assert recontracted["symbols"] == appended["symbols"]
+    assert store.versions("binance", TF, SYMBOLS) == [1, 2, 3]
+    old = store.read(store.load_manifest("binance", TF, SYMBOLS, 1))
+    pd.testing.assert_frame_equal(old["BTC/USDT"], data["BTC/USDT"])
+
+    # Futuros con los mismos símbolos: dataset propio, sin tocar las versiones de spot
+    futures, _ = asyncio.run(store.materialize("binance", SYMBOLS, TF, lambda s: exchange.fetch, "c2", market_type="futures",
+                                               limit=200, since_fn=fixed_since(300)))
+    assert futures["version"] == 1 and futures["dataset_id"] != manifest["dataset_id"]
+    assert store.versions("binance", TF, SYMBOLS) == [1, 2, 3]
+    assert store.versions("binance", TF, SYMBOLS, "futures") == [1]
+
+
+def test_training_data_reuses_snapshot(tmp_path):
+    exchange = FakeExchange()
+
+    async def get_historical_data(symbol, timeframe, limit, since, **kwargs):
+        return await exchange.fetch(since, limit)
+
+    adapter = MagicMock(get_historical_data=AsyncMock(side_effect=get_historical_data))
+    snapshots = DatasetSnapshotStore(str(tmp_path / "datasets"), OHLCVStore(str(tmp_path / "ohlcv")))
+    ml = MLService(exchange_adapter=adapter, trainer=StrategyTrainer(models_dir=str(tmp_path / "models")), snapshots=snapshots)
+
+    manifest, data = asyncio.run(ml._fetch_training_data(SYMBOLS, TF))
+    assert manifest["version"] == 1 and set(data) == set(SYMBOLS)
+    assert manifest["contract_hash"] and manifest["market_type"] == "spot"
+    calls = adapter.get_historical_data.await_count
+
+    manifest, again = asyncio.run(ml._fetch_training_data(SYMBOLS, TF))
+    assert manifest["version"] == 1
+    assert adapter.get_historical_data.await_count == calls
+    for symbol in SYMBOLS:
+        pd.testing.assert_frame_equal(again[symbol], data[symbol])
@@ -0,0 +1,92 @@
+import json
+import pytest
+from api.src.adapters.driven.notifications import event_bus
+from api.src.adapters.driven.notifications.event_bus import LocalEventBus, UnixSocketEventBus, create_event_bus
+from api.src.adapters.driven.notifications.socket_service import SocketService
+from api.tests.test_socket_service import FakeWebSocket, settle
+
+
+async def start_worker(path: str) -> SocketService:
+    """Un "worker": su propio SocketService unido al bus del socket Unix."""
+    service = SocketService(max_queue=32, send_timeout=30, coalesce_ms=0, bus=UnixSocketEventBus(path))
+    await service.start()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_events_reach_sockets_held_by_other_workers(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    workers = [await start_worker(path) for _ in range(3)]
+    try:
+        assert [w.bus.is_hub for w in workers] == [True, False, False]
+        await settle(lambda: len(workers[0].bus._peers) == 2)
+
+        sockets = {}
+        for i, worker in enumerate(workers):
+            sockets[i] = FakeWebSocket()
+            await worker.connect(sockets[i], "u" if i < 2 else "x")
+
+        # Emitido desde el worker sin conexiones de "u": llega a los workers que las tienen
+        await workers[2].emit_to_user("u", "trade_update", {"id": 1, "price": 1.5})
+        await workers[1].broadcast("telegram_log", {"message": "hola"})
+        await workers[0].publish("bot:b1", "bot_update", {"pnl": 2.0}, owners={"u"}, private=True)
+        await settle(lambda: len(sockets[0].sent) == 3 and len(sockets[1].sent) == 3 and len(sockets[2].sent) == 1)
+
+        for ws in (sockets[0], sockets[1]):
+            assert sorted(ws.events()) == ["bot_update", "telegram_log", "trade_update"]
+            trade = next(json.loads(m) for m in ws.sent if json.loads(m)["event"] == "trade_update")
+            assert trade["data"] == {"id": 1, "price": 1.5}
+        assert sockets[2].events() == ["telegram_log"]
+    finally:
+        for worker in workers:
+            await worker.stop()
+
+
+@pytest.mark.asyncio
+async def test_a_peer_takes_over_when_the_hub_dies(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    hub, a, b = [await start_worker(path) for _ in range(3)]
+    try:
+        ws = FakeWebSocket()
+        await b.connect(ws, "u")
+        await hub.stop()
+
+        await settle(lambda: a.bus.is_hub or b.bus.is_hub, timeout=5)
+        new_hub = a if a.bus.is_hub else b
+        await settle(lambda: len(new_hub.bus._peers) == 1, timeout=5)
+
+        await a.emit_to_user("u", "trade_update", {"id": 2})
+        await settle(lambda: ws.events() == ["trade_update"])
+    finally:
+        for worker in (hub, a, b):
+            await worker.stop()
+
+
+@pytest.mark.asyncio
+async def test_presence_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    first, second = await start_worker(path), await start_worker(path)
+    try:
+        await second.connect(FakeWebSocket(), "u")
+        second.bus.publish({"op": "presence", "node": second.node_id, "users": list(second.active_connections)})
+        await settle(lambda: first.connected_users() == {"u"})
+        assert first.active_connections == {}
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_local_bus_delivers_synchronously():
+    service = SocketService(max_queue=8, send_timeout=30, bus=LocalEventBus())
+    ws = FakeWebSocket()
+    await service.connect(ws, "u")
+    await service.emit_to_user("u", "trade_update", {"id": 1})
+    assert service.active_connections["u"][0].pending == 1  # ya encolado, sin saltos por el bus
+    assert service.connected_users() == {"u"}
+
+
+def test_unix_bus_falls_back_to_local_without_unix_sockets(monkeypatch, tmp_path):
+    assert isinstance(create_event_bus("unix", str(tmp_path / "bus.sock")), UnixSocketEventBus)
+    monkeypatch.setattr(event_bus, "unix_bus_available", lambda: False)
+    assert isinstance(create_event_bus("unix", str(tmp_path / "bus.sock")), LocalEventBus)
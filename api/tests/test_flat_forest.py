@@ -0,0 +1,81 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from api.src.infrastructure.ai.flat_forest import POINTER, FlatForest, current_version
+
+FEATURES = ['rsi', 'roc', 'in_position', 'current_pnl']
+
+
+def make_dataset(n, n_classes, seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, len(FEATURES))), columns=FEATURES)
+    score = X['rsi'] + 0.5 * X['roc'] ** 2 - X['current_pnl']
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+class TestFlatForest(unittest.TestCase):
+    def test_matches_sklearn_exactly(self):
+        for n_classes, seed in ((2, 1), (3, 2)):
+            X, y = make_dataset(4000, n_classes, seed)
+            # Mismos hiperparámetros que StrategyTrainer.train_agnostic_model
+            model = RandomForestClassifier(n_estimators=150, max_depth=10, random_state=42).fit(X, y)
+            flat = FlatForest.from_sklearn(model)
+
+            X_test, _ = make_dataset(2000, n_classes, seed + 10)
+            X_test.iloc[::11, 0] = np.nan
+            np.testing.assert_array_equal(flat.predict_proba(X_test), model.predict_proba(X_test))
+            np.testing.assert_array_equal(flat.predict(X_test), model.predict(X_test))
+            # Sin DataFrame (hot path) y fila a fila
+            np.testing.assert_array_equal(flat.predict(X_test.to_numpy()), model.predict(X_test))
+            for i in range(0, 50, 7):
+                self.assertEqual(flat.predict(X_test.iloc[[i]])[0], model.predict(X_test.iloc[[i]])[0])
+
+    def test_save_swaps_versions_without_a_missing_window(self):
+        X, y = make_dataset(500, 2, seed=4)
+        flat = FlatForest.from_sklearn(RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "macd.forest")
+            versions = []
+            for _ in range(3):
+                flat.save(path)
+                versions.append(current_version(path))
+            # Se conserva la versión anterior para lectores en curso; las más viejas se borran
+            self.assertEqual(sorted(os.listdir(path)), sorted([POINTER] + [os.path.basename(v) for v in versions[1:]]))
+            np.testing.assert_array_equal(FlatForest.load(path).predict(X), flat.predict(X))
+
+            # Una escritura fallida no toca la versión actual ni deja restos
+            with mock.patch("api.src.infrastructure.ai.flat_forest.np.save", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    flat.save(path)
+            self.assertEqual(current_version(path), versions[-1])
+            self.assertEqual(len(os.listdir(path)), 3)
+
+    @pytest.mark.benchmark
+    def test_single_row_latency(self):
+        X, y = make_dataset(4000, 3, seed=3)
+        model = RandomForestClassifier(n_estimators=150, max_depth=10, random_state=42).fit(X, y)
+        flat = FlatForest.from_sklearn(model)
+        row_df = X.iloc[[-1]]
+        row = row_df.to_numpy()
+
+        def bench(fn, repeat=30):
+            fn()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            return (time.perf_counter() - start) / repeat
+
+        sklearn_time = bench(lambda: model.predict(row_df))
+        flat_time = bench(lambda: flat.predict(row))
+        self.assertLess(flat_time, sklearn_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api.src.domain.services.incremental_indicators import IncrementalFeatureCache
+from api.src.domain.strategies.spot.macd import MACDStrategy
+from api.src.domain.strategies.spot.momentum import MomentumStrategy
+from api.src.domain.strategies.spot.rsi_reversion import RsiReversion
+from api.src.domain.strategies.spot.trend_ema import TrendEma
+from api.src.domain.strategies.spot.bollinger_bands import BollingerBandsStrategy
+from api.src.domain.strategies.futures.rsi_reversion import RsiReversion as FuturesRsiReversion
+from api.tests.helpers import random_walk
+
+INCREMENTAL = [MACDStrategy, MomentumStrategy, RsiReversion, TrendEma, FuturesRsiReversion]
+
+
+def make_candles(n: int = 300, seed: int = 11) -> pd.DataFrame:
+    close, rng = random_walk(n, seed)
+    # Tramo plano para cubrir divisiones 0/0 (RSI sin ganancias ni pérdidas)
+    close[100:120] = close[99]
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': close,
+        'high': close * 1.002,
+        'low': close * 0.998,
+        'close': close,
+        'volume': rng.random(n) * 1000
+    })
+
+
+@pytest.mark.parametrize("strategy_class", INCREMENTAL, ids=lambda c: f"{c.__module__.split('.')[-2]}.{c.__name__}")
+def test_incremental_matches_full_apply(strategy_class):
+    df = make_candles()
+    strategy = strategy_class()
+    features = strategy.get_features()
+    cache = IncrementalFeatureCache()
+
+    for end in range(5, len(df) + 1):
+        window = df.iloc[:end]
+        latest = cache.latest("okx:BTC/USDT:1h", strategy, window)
+        expected = strategy.apply(window.copy()).iloc[-1][features].to_numpy(dtype=np.float64)
+        got = np.array([latest[c] for c in features])
+        np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=f"vela {end}")
+
+
+def test_gap_rewarms_and_same_candle_is_cached():
+    df = make_candles()
+    strategy = MACDStrategy()
+    cache = IncrementalFeatureCache()
+
+    first = cache.latest("k", strategy, df.iloc[:100])
+    assert cache.latest("k", strategy, df.iloc[:100]) is first
+
+    # Hueco de velas: se recalienta desde el histórico recibido
+    latest = cache.latest("k", strategy, df.iloc[:150])
+    expected = strategy.apply(df.iloc[:150].copy()).iloc[-1]
+    assert latest['macd'] == pytest.approx(expected['macd'], rel=1e-9)
+
+
+def test_strategies_without_incremental_mode_fall_back():
+    cache = IncrementalFeatureCache()
+    assert cache.latest("k", BollingerBandsStrategy(), make_candles()) is None
+    assert cache.latest("k", MACDStrategy(), make_candles().drop(columns=['timestamp'])) is None
+
+
+def test_strategy_with_state_but_no_update_falls_back():
+    class StateOnly(BollingerBandsStrategy):
+        def incremental_state(self):
+            return {}
+
+    cache = IncrementalFeatureCache()
+    assert cache.latest("k", StateOnly(), make_candles()) is None
@@ -0,0 +1,46 @@
+import pandas as pd
+from api.src.domain.services.indicator_cache import IndicatorCache, market_frame
+from api.src.domain.services.strategy_trainer import StrategyTrainer, strategy_frames_job
+from api.tests.helpers import make_ohlcv
+
+SYMBOLS = [f"SYM{i}/USDT" for i in range(10)]
+
+
+def test_shared_indicators_match_per_strategy_apply(tmp_path):
+    trainer = StrategyTrainer(models_dir=str(tmp_path))
+    # Solo estrategias cargables desde spot/ (el descubrimiento también lista las de la raíz)
+    strategies = [name for name in trainer.discover_strategies("spot") if trainer.load_strategy_class(name, "spot")]
+    assert len(strategies) >= 16
+    data = {symbol: make_ohlcv(seed=i) for i, symbol in enumerate(SYMBOLS)}
+    originals = {symbol: df.copy() for symbol, df in data.items()}
+
+    cache = IndicatorCache()
+    for symbol, df in data.items():
+        market = market_frame(df)
+        for name in strategies:
+            shared = trainer.strategy_frame(name, "spot", symbol, market, cache)
+
+            strategy = trainer.load_strategy_class(name, "spot")()
+            legacy = strategy.apply(df.copy()).dropna()
+            pd.testing.assert_frame_equal(shared, legacy[shared.columns], check_freq=False)
+
+    # Las estrategias nunca modifican el dataset compartido
+    for symbol, df in data.items():
+        pd.testing.assert_frame_equal(df, originals[symbol])
+
+    # Cada indicador distinto se calcula una vez por símbolo y el resto son reutilizaciones
+    keys = cache.keys()
+    assert cache.computed == len(keys) == len(set(keys))
+    assert {symbol for symbol, _, _ in keys} == set(SYMBOLS)
+    assert ('SYM0/USDT', 'rsi', ('close', 14)) in keys
+    assert cache.hits >= 5 * len(SYMBOLS)
+    # Los indicadores se comparten sin copia y no se pueden alterar en sitio
+    assert all(not cache.get(*key, compute=None).values.flags.writeable for key in keys)
+
+
+def test_frames_job_reuses_indicators_across_strategies(tmp_path):
+    names = ["rsi_reversion", "rsi_strategy", "StatisticalMeanReversion", "bollinger_bands", "spot_arbitrage"]
+    frames = strategy_frames_job("api/src/domain/strategies", str(tmp_path), names, "spot", "BTC/USDT", make_ohlcv(n=500))
+    assert set(frames) == set(names)
+    assert all(frame is not None and not frame.empty for frame in frames.values())
+    assert list(frames["rsi_reversion"].columns) == ['rsi', 'roc', 'signal', 'close']
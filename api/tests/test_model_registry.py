@@ -0,0 +1,94 @@
+import os
+import joblib
+import pytest
+from api.src.infrastructure.ai.model_manager import ModelManager
+
+
+class DummyModel:
+    def __init__(self, tag, payload_kb=64):
+        self.tag = tag
+        self.payload = b"x" * (payload_kb * 1024)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    manager = ModelManager()
+    saved = (manager.models_dir, manager.max_bytes)
+    manager.clear()
+    manager.models_dir = str(tmp_path)
+    yield manager
+    manager.clear()
+    manager.models_dir, manager.max_bytes = saved
+
+
+def dump(path, model):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+
+
+def test_lazy_load_and_market_fallback(registry, tmp_path):
+    dump(str(tmp_path / "spot" / "macd.pkl"), DummyModel("spot-macd"))
+    dump(str(tmp_path / "rsi.pkl"), DummyModel("root-rsi"))
+
+    registry.load_all_models()
+    assert set(registry.available) == {"spot/macd", "rsi"}
+    assert registry.loaded_models == []
+
+    model = registry.get_model("macd", "spot")
+    assert model.tag == "spot-macd"
+    assert registry.get_model("macd", "spot") is model
+    assert registry.get_model("rsi", "futures").tag == "root-rsi"
+    assert registry.get_model("missing", "spot") is None
+    assert len(registry.loaded_models) == 2
+
+
+def test_lru_eviction_keeps_memory_bounded(registry, tmp_path):
+    paths = [str(tmp_path / "spot" / f"s{i}.pkl") for i in range(5)]
+    for i, path in enumerate(paths):
+        dump(path, DummyModel(i))
+    size = os.path.getsize(paths[0])
+    registry.max_bytes = int(size * 2.5)
+
+    for name in ("s0", "s1", "s0", "s2"):
+        registry.get_model(name, "spot")
+
+    # s1 era el menos usado recientemente
+    assert [os.path.basename(p) for p in registry.loaded_models] == ["s0.pkl", "s2.pkl"]
+    assert registry.total_bytes <= registry.max_bytes
+
+
+def test_reloads_when_file_changes(registry, tmp_path):
+    path = str(tmp_path / "spot" / "macd.pkl")
+    dump(path, DummyModel("v1"))
+    assert registry.load(path).tag == "v1"
+
+    dump(path, DummyModel("v2"))
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+    assert registry.load(path).tag == "v2"
+    assert len(registry.loaded_models) == 1
+
+
+def test_forest_served_from_shared_mmap_arrays(registry, tmp_path):
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from api.src.infrastructure.ai.flat_forest import FlatForest, forest_dir_for
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(3000, 4)), columns=["a", "b", "c", "d"])
+    y = np.where(X["a"] + X["b"] ** 2 > 0.8, 1, np.where(X["c"] < -0.5, 2, 0))
+    model = RandomForestClassifier(n_estimators=30, max_depth=10, random_state=42).fit(X, y)
+    path = str(tmp_path / "spot" / "forest.pkl")
+    dump(path, model)
+
+    # Un .pkl sin artefacto plano se exporta en la primera carga
+    flat = registry.get_model("forest", "spot")
+    assert isinstance(flat, FlatForest)
+    assert isinstance(flat.threshold, np.memmap) and not flat.threshold.flags.writeable
+    assert os.path.isdir(forest_dir_for(path))
+
+    X_test = pd.DataFrame(rng.normal(size=(500, 4)), columns=["a", "b", "c", "d"])
+    X_test.iloc[::7, 1] = np.nan
+    np.testing.assert_array_equal(flat.predict(X_test), model.predict(X_test))
+    np.testing.assert_array_equal(flat.predict_proba(X_test), model.predict_proba(X_test))
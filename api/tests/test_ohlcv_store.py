@@ -0,0 +1,159 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore, timeframe_to_ms
+from api.src.application.services.backtest_service import BacktestService
+
+TF = '1h'
+TF_MS = timeframe_to_ms(TF)
+
+
+class FakeExchange:
+    """Exchange determinista: una vela por hueco del timeframe, con precios derivados del timestamp."""
+
+    def __init__(self, page_cap: int = 10_000):
+        self.calls = []
+        self.page_cap = page_cap
+
+    async def fetch(self, since, limit):
+        self.calls.append((since, limit))
+        now_open = (int(time.time() * 1000) // TF_MS) * TF_MS
+        limit = min(limit, self.page_cap)
+        if since is None:
+            since = now_open - (limit - 1) * TF_MS
+        ts = np.arange(since, min(since + limit * TF_MS, now_open + TF_MS), TF_MS, dtype=np.int64)
+        return candles(ts)
+
+
+def candles(ts):
+    close = 100 + (ts // TF_MS % 1000) / 10
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(ts, unit='ms'),
+        'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': ts % 97 * 1.0
+    })
+    return df.set_index('timestamp')
+
+
+def test_latest_only_fetches_missing_tail(tmp_path):
+    store, exchange = OHLCVStore(str(tmp_path)), FakeExchange()
+
+    first = asyncio.run(store.get_latest('binance', 'BTC/USDT', TF, 300, exchange.fetch))
+    assert len(first) == 300
+    assert exchange.calls == [(None, 300)]
+
+    # Segunda lectura: solo se vuelve a pedir la vela en formación
+    second = asyncio.run(store.get_latest('binance', 'BTC/USDT', TF, 300, exchange.fetch))
+    assert len(exchange.calls) == 2 and exchange.calls[1][1] <= 2
+    pd.testing.assert_frame_equal(second, first)
+
+    # Ventana más larga: solo se descarga la cabeza que falta
+    longer = asyncio.run(store.get_latest('binance', 'BTC/USDT', TF, 500, exchange.fetch))
+    head_since, head_count = exchange.calls[2]
+    assert longer.index[0] == pd.to_datetime(head_since, unit="ms") and head_count == 200
+    assert len(longer) == 500 and longer.index.is_monotonic_increasing and longer.index.is_unique
+    pd.testing.assert_frame_equal(longer.iloc[-300:], first)
+
+
+def test_latest_reads_a_bounded_window(tmp_path, monkeypatch):
+    store, exchange = OHLCVStore(str(tmp_path)), FakeExchange()
+    asyncio.run(store.get_latest('binance', 'BTC/USDT', TF, 2000, exchange.fetch))
+
+    reads = []
+    real_read = store._read_columns
+    monkeypatch.setattr(store, '_read_columns', lambda path, start, end, tail=None: reads.append(tail) or real_read(path, start, end, tail))
+    df = asyncio.run(store.get_latest('binance', 'BTC/USDT', TF, 10, exchange.fetch))
+
+    # Solo se materializan las filas pedidas, no toda la historia almacenada
+    assert len(df) == 10 and reads[-1] == 10
+
+
+def test_window_fills_gaps_and_persists(tmp_path):
+    store, exchange = OHLCVStore(str(tmp_path)), FakeExchange()
+    base = (int(time.time() * 1000) // TF_MS - 5000) * TF_MS
+
+    a = asyncio.run(store.get_window('binance', 'ETH/USDT', TF, base, 100, exchange.fetch))
+    b = asyncio.run(store.get_window('binance', 'ETH/USDT', TF, base + 200 * TF_MS, 100, exchange.fetch))
+    assert len(a) == len(b) == 100
+    assert store.get_ranges('binance', 'ETH/USDT', TF) == [(base, base + 99 * TF_MS), (base + 200 * TF_MS, base + 299 * TF_MS)]
+
+    # Una ventana que cubre ambas solo pide el hueco intermedio
+    calls_before = len(exchange.calls)
+    full = asyncio.run(store.get_window('binance', 'ETH/USDT', TF, base, 300, exchange.fetch))
+    assert exchange.calls[calls_before:] == [(base + 100 * TF_MS, 100)]
+    assert store.get_ranges('binance', 'ETH/USDT', TF) == [(base, base + 299 * TF_MS)]
+    expected = candles(np.arange(base, base + 300 * TF_MS, TF_MS, dtype=np.int64))
+    pd.testing.assert_frame_equal(full, expected, check_freq=False)
+
+    # Otra instancia sobre el mismo directorio lee del disco sin tocar el exchange
+    reopened, offline = OHLCVStore(str(tmp_path)), FakeExchange()
+    again = asyncio.run(reopened.get_window('binance', 'ETH/USDT', TF, base + 50 * TF_MS, 200, offline.fetch))
+    assert offline.calls == []
+    pd.testing.assert_frame_equal(again, full.iloc[50:250])
+
+
+def test_partial_pages_stay_missing(tmp_path):
+    store, exchange = OHLCVStore(str(tmp_path)), FakeExchange(page_cap=60)
+    base = (int(time.time() * 1000) // TF_MS - 1000) * TF_MS
+
+    df = asyncio.run(store.get_window('binance', 'SOL/USDT', TF, base, 100, exchange.fetch))
+    assert len(df) == 60
+    # Lo que el exchange no devolvió no se marca como cubierto y se pide en la siguiente lectura
+    asyncio.run(store.get_window('binance', 'SOL/USDT', TF, base, 100, exchange.fetch))
+    assert exchange.calls[-1] == (base + 60 * TF_MS, 40)
+
+
+@pytest.mark.asyncio
+async def test_backtest_market_data_reads_through_store(tmp_path):
+    exchange = FakeExchange()
+    adapter = AsyncMock()
+
+    async def get_historical_data(symbol, timeframe, limit, since=None, **kwargs):
+        return await exchange.fetch(since, limit)
+
+    adapter.get_historical_data.side_effect = get_historical_data
+
+    service = BacktestService(adapter, models_dir=str(tmp_path), candle_store=OHLCVStore(str(tmp_path / "ohlcv")))
+    first = await service.get_market_data("BTC/USDT", "1h", days=5)
+    second = await service.get_market_data("BTC/USDT", "1h", days=5)
+
+    assert len(first) == 24 * 5 + 100
+    pd.testing.assert_frame_equal(first, second)
+    assert exchange.calls[0] == (None, 220) and exchange.calls[1][1] <= 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_sharing_the_directory_keep_both_merges(tmp_path):
+    # Dos instancias = dos workers: cada una con su asyncio.Lock, mismo directorio
+    a, b, exchange = OHLCVStore(str(tmp_path)), OHLCVStore(str(tmp_path)), FakeExchange()
+    base = (int(time.time() * 1000) // TF_MS - 3000) * TF_MS
+
+    await asyncio.gather(*(
+        store.get_window('binance', 'BTC/USDT', TF, base + i * 100 * TF_MS, 100, exchange.fetch)
+        for i, store in enumerate([a, b] * 5)
+    ))
+    assert a.get_ranges('binance', 'BTC/USDT', TF) == [(base, base + 999 * TF_MS)]
+    stored = OHLCVStore(str(tmp_path)).read('binance', 'BTC/USDT', TF)
+    assert len(stored) == 1000 and stored.index.is_unique
+    assert not [f for f in (tmp_path / "binance" / "BTC_USDT" / TF).iterdir() if "tmp" in f.name]
+
+
+def test_weekly_candles_open_on_monday_and_monthly_bypass_the_store(tmp_path, monkeypatch):
+    week_ms = timeframe_to_ms('1w')
+    monday = int(pd.Timestamp('2024-06-03').timestamp() * 1000)
+    store = OHLCVStore(str(tmp_path))
+    monkeypatch.setattr(OHLCVStore, "_now_ms", staticmethod(lambda: monday + 2 * 86_400_000))  # miércoles
+
+    async def weekly(since, limit):
+        ts = np.arange(monday - (limit - 1) * week_ms, monday + week_ms, week_ms, dtype=np.int64)
+        return candles(ts)
+
+    df = asyncio.run(store.get_latest('binance', 'BTC/USDT', '1w', 10, weekly))
+    # La semana en formación (abierta el lunes) no se pierde
+    assert len(df) == 10 and df.index[-1] == pd.Timestamp('2024-06-03')
+
+    monthly = AsyncMock(return_value=candles(np.array([monday], dtype=np.int64)))
+    assert len(asyncio.run(store.get_latest('binance', 'BTC/USDT', '1M', 5, monthly))) == 1
+    monthly.assert_awaited_once_with(None, 5)
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.tests.helpers import make_ohlcv
+
+STRATEGIES = ["rsi_reversion", "macd", "momentum", "trend_ema"]
+
+
+@pytest.mark.asyncio
+async def test_train_all_runs_in_process_pool_without_blocking_loop(tmp_path, monkeypatch):
+    executor = ProcessPoolExecutor(max_workers=2)
+    trainer = StrategyTrainer(models_dir=str(tmp_path), executor=executor)
+    monkeypatch.setattr(trainer, "discover_strategies", lambda market_type=None: STRATEGIES)
+    data = {"BTC/USDT": make_ohlcv(n=600, seed=1), "ETH/USDT": make_ohlcv(n=600, seed=2)}
+
+    events = []
+
+    async def emit(msg, level):
+        events.append((msg, level))
+
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    hb = asyncio.create_task(heartbeat())
+    start = asyncio.get_running_loop().time()
+    try:
+        results = await trainer.train_all(data, "spot", emit_callback=emit)
+    finally:
+        hb.cancel()
+        executor.shutdown()
+    elapsed = asyncio.get_running_loop().time() - start
+
+    assert results == {name: "Success" for name in STRATEGIES}
+    for name in STRATEGIES:
+        assert os.path.exists(os.path.join(str(tmp_path), "spot", f"{name}.pkl"))
+        assert (f"[StrategyTrainer] Saved model: {name}.pkl", "success") in events
+    assert events[-1] == ("Training complete", "success")
+    # El loop siguió atendiendo corrutinas durante todo el entrenamiento
+    assert ticks >= 0.5 * elapsed / 0.01
@@ -0,0 +1,131 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from api.src.domain.strategies.base import BaseStrategy
+from api.src.domain.services.position_context import inject_training_context, inject_backtest_context
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.tests.helpers import random_walk
+
+
+def legacy_training_context(df):
+    """Copia del bucle original de StrategyTrainer._inject_position_context."""
+    df = df.copy()
+    df['in_position'] = 0
+    df['current_pnl'] = 0.0
+    avg_price = 0.0
+    in_pos = False
+    current_side = None
+    for i in range(1, len(df)):
+        current_close = df.iloc[i]['close']
+        original_signal = df.iloc[i]['signal']
+        if in_pos:
+            df.at[df.index[i], 'in_position'] = 1
+            if current_side == "BUY":
+                pnl = (current_close - avg_price) / avg_price
+            else:
+                pnl = (avg_price - current_close) / avg_price
+            df.at[df.index[i], 'current_pnl'] = pnl
+            is_reversal = (current_side == "BUY" and original_signal == 2) or \
+                          (current_side == "SELL" and original_signal == 1)
+            if is_reversal and pnl < -0.005:
+                df.at[df.index[i], 'signal'] = 0
+            if original_signal == 1:
+                current_side = "BUY"
+                avg_price = current_close
+            elif original_signal == 2:
+                current_side = "SELL"
+                avg_price = current_close
+        else:
+            if original_signal == 1:
+                in_pos = True
+                current_side = "BUY"
+                avg_price = current_close
+            elif original_signal == 2:
+                in_pos = True
+                current_side = "SELL"
+                avg_price = current_close
+    return df
+
+
+def legacy_backtest_context(df):
+    """Copia del bucle original de BacktestService.prepare_data_for_model (sin strategy.apply)."""
+    df['in_position'] = 0
+    df['current_pnl'] = 0.0
+    avg_price = 0.0
+    in_pos = False
+    current_side = None
+    for i in range(1, len(df)):
+        prev_signal = df.iloc[i-1].get('signal')
+        if prev_signal == BaseStrategy.SIGNAL_BUY:
+            in_pos = True
+            current_side = "BUY"
+            avg_price = df.iloc[i]['close']
+        elif prev_signal == BaseStrategy.SIGNAL_SELL:
+            in_pos = True
+            current_side = "SELL"
+            avg_price = df.iloc[i]['close']
+        if in_pos:
+            df.at[df.index[i], 'in_position'] = 1
+            current_price = df.iloc[i]['close']
+            if avg_price > 0:
+                if current_side == "BUY":
+                    df.at[df.index[i], 'current_pnl'] = (current_price - avg_price) / avg_price
+                else:
+                    df.at[df.index[i], 'current_pnl'] = (avg_price - current_price) / avg_price
+    return df
+
+
+def make_signal_frame(n, seed, density=0.2):
+    close, rng = random_walk(n, seed)
+    signal = rng.choice([0, 1, 2], size=n, p=[1 - density, density / 2, density / 2])
+    idx = pd.date_range(start='2024-01-01', periods=n, freq='15min')
+    return pd.DataFrame({'close': close, 'rsi': rng.random(n) * 100, 'signal': signal}, index=idx)
+
+
+class TestPositionContextParity(unittest.TestCase):
+    def test_training_context_matches_row_loop(self):
+        for seed in range(6):
+            for density in (0.0, 0.05, 0.3, 1.0):
+                df = make_signal_frame(400, seed, density)
+                pd.testing.assert_frame_equal(inject_training_context(df), legacy_training_context(df))
+
+    def test_training_context_relabels_losing_reversals(self):
+        df = pd.DataFrame({'close': [100.0, 100.0, 90.0, 80.0], 'signal': [0, 1, 2, 0]},
+                          index=pd.date_range('2024-01-01', periods=4, freq='h'))
+        out = inject_training_context(df)
+        # LONG a 100, la señal SELL a 90 (-10%) se convierte en WAIT
+        self.assertEqual(out['signal'].tolist(), [0, 1, 0, 0])
+        self.assertEqual(out['in_position'].tolist(), [0, 0, 1, 1])
+        # El estado sí flipea a SHORT a 90 pese al re-etiquetado
+        self.assertAlmostEqual(out['current_pnl'].iloc[3], (90.0 - 80.0) / 90.0)
+        # El DataFrame de entrada no se modifica
+        self.assertEqual(df['signal'].tolist(), [0, 1, 2, 0])
+
+    def test_trainer_uses_shared_module(self):
+        df = make_signal_frame(200, 99)
+        trainer = StrategyTrainer()
+        pd.testing.assert_frame_equal(trainer._inject_position_context(df), legacy_training_context(df))
+
+    def test_backtest_context_matches_row_loop(self):
+        for seed in range(6):
+            for density in (0.0, 0.05, 0.3, 1.0):
+                df = make_signal_frame(400, seed, density)
+                pd.testing.assert_frame_equal(inject_backtest_context(df.copy()), legacy_backtest_context(df.copy()))
+
+    def test_backtest_context_edge_cases(self):
+        df = make_signal_frame(30, 5).drop(columns=['signal'])
+        pd.testing.assert_frame_equal(inject_backtest_context(df.copy()), legacy_backtest_context(df.copy()))
+        empty = make_signal_frame(0, 1)
+        pd.testing.assert_frame_equal(inject_backtest_context(empty.copy()), legacy_backtest_context(empty.copy()))
+        with_nan = make_signal_frame(50, 7).astype({'signal': float})
+        with_nan.iloc[::7, with_nan.columns.get_loc('signal')] = np.nan
+        pd.testing.assert_frame_equal(inject_backtest_context(with_nan.copy()), legacy_backtest_context(with_nan.copy()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch
+from api.src.adapters.driven.notifications import socket_service as socket_module
+from api.src.adapters.driven.notifications.socket_service import SocketService
+
+
+class FakeWebSocket:
+    """WebSocket en memoria; con blocked=True el envío no termina nunca (pestaña colgada)."""
+
+    def __init__(self, blocked: bool = False):
+        self.blocked = blocked
+        self.sent = []
+        self.closed_with = None
+        self._unblock = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.blocked:
+            await self._unblock.wait()
+        self.sent.append(message)
+
+    async def send_bytes(self, message: bytes):
+        await self.send_text(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    def unblock(self):
+        self.blocked = False
+        self._unblock.set()
+
+    def events(self):
+        return [json.loads(m)["event"] if isinstance(m, str) and m.startswith("{") else m for m in self.sent]
+
+
+async def settle(predicate, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        assert time.perf_counter() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_not_delayed_by_a_stuck_client():
+    service = SocketService(max_queue=16, send_timeout=30)
+    stuck = FakeWebSocket(blocked=True)
+    await service.connect(stuck, "user-0")
+    sockets = [FakeWebSocket() for _ in range(1000)]
+    for i, ws in enumerate(sockets):
+        await service.connect(ws, f"user-{i % 500}")
+
+    start = time.perf_counter()
+    await service.broadcast("telegram_log", {"message": "hola"})
+    await service.emit_to_user("user-0", "trade_update", {"id": 1})
+    assert time.perf_counter() - start < 0.5  # solo encola: no espera a ningún envío
+
+    await settle(lambda: sum(len(ws.sent) for ws in sockets) == 1000 + 2)
+    assert sockets[0].events() == ["telegram_log", "trade_update"]
+    assert sockets[1].events() == ["telegram_log"]
+    assert stuck.sent == []
+
+    stuck.unblock()
+    await settle(lambda: len(stuck.sent) == 2)
+    assert stuck.events() == ["telegram_log", "trade_update"]
+
+
+@pytest.mark.asyncio
+async def test_ticks_drop_oldest_and_trades_are_never_dropped():
+    service = SocketService(max_queue=4, send_timeout=30, drop_oldest_events={"candle_update"})
+    ws = FakeWebSocket(blocked=True)
+    await service.connect(ws, "u")
+    connection = service.active_connections["u"][0]
+    await settle(lambda: connection.pending == 0)  # el escritor ya está esperando el primer envío
+
+    await service.emit_to_user("u", "trade_update", {"id": 0})  # en vuelo (bloqueado en send_text)
+    await asyncio.sleep(0)
+    for i in range(10):
+        await service.emit_to_user("u", "candle_update", {"close": i})
+    for i in range(1, 4):
+        await service.emit_to_user("u", "trade_update", {"id": i})
+
+    assert connection.pending == 4 and connection.dropped == 9
+    ws.unblock()
+    await settle(lambda: len(ws.sent) == 5)
+    payloads = [json.loads(m) for m in ws.sent]
+    # Los trades desplazan a los ticks más antiguos; del stream de velas solo queda la última
+    assert [p["event"] for p in payloads] == ["trade_update", "candle_update", "trade_update", "trade_update", "trade_update"]
+    assert payloads[1]["data"] == {"close": 9}
+
+
+@pytest.mark.asyncio
+async def test_stalled_or_slow_connections_are_closed():
+    service = SocketService(max_queue=2, send_timeout=30, drop_oldest_events=())
+    stalled = FakeWebSocket(blocked=True)
+    await service.connect(stalled, "u")
+    for i in range(2 * 4 + 2):
+        await service.emit_to_user("u", "trade_update", {"id": i})  # nunca se descartan...
+    # ...pero una cola de trades que no avanza acaba cerrando la conexión
+    assert "u" not in service.active_connections
+    await settle(lambda: stalled.closed_with == 1013)
+
+    slow_service = SocketService(max_queue=8, send_timeout=0.05)
+    slow = FakeWebSocket(blocked=True)
+    await slow_service.connect(slow, "v")
+    await slow_service.emit_to_user("v", "trade_update", {"id": 1})
+    await settle(lambda: slow.closed_with == 1013)
+    assert "v" not in slow_service.active_connections
+
+    # Las respuestas directas (pong) pasan por la misma cola
+    ok = FakeWebSocket()
+    await slow_service.connect(ok, "w")
+    slow_service.send_text(ok, "w", "pong")
+    await settle(lambda: ok.sent == ["pong"])
+    slow_service.disconnect(ok, "w")
+    assert slow_service.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_each_event_once():
+    service = SocketService(max_queue=8, send_timeout=30)
+    sockets = [FakeWebSocket() for _ in range(200)]
+    for i, ws in enumerate(sockets):
+        await service.connect(ws, f"user-{i % 100}")
+
+    with patch.object(socket_module.json, "dumps", wraps=json.dumps) as dumps:
+        await service.broadcast("telegram_log", {"message": "hola"})
+        await settle(lambda: all(ws.sent for ws in sockets))
+    assert dumps.call_count == 1
+    assert len({id(ws.sent[0]) for ws in sockets}) == 1  # el mismo str para todos
+
+
+@pytest.mark.asyncio
+async def test_msgpack_is_negotiated_per_connection():
+    msgpack = pytest.importorskip("msgpack")
+    service = SocketService(max_queue=8, send_timeout=30, binary_events={"candle_update"})
+    binary, plain = FakeWebSocket(), FakeWebSocket()
+    await service.connect(binary, "u", encoding="msgpack")
+    await service.connect(plain, "u")
+
+    await service.emit_to_user("u", "candle_update", {"close": 1.5})
+    await service.emit_to_user("u", "trade_update", {"id": 1})
+    await settle(lambda: len(binary.sent) == 3 and len(plain.sent) == 2)
+
+    assert json.loads(binary.sent[0])["data"]["encoding"] == "msgpack"
+    assert msgpack.unpackb(binary.sent[1]) == {"event": "candle_update", "data": {"close": 1.5}}
+    assert json.loads(binary.sent[2])["event"] == "trade_update"
+    assert [json.loads(m)["event"] for m in plain.sent] == ["candle_update", "trade_update"]
+
+
+@pytest.mark.asyncio
+async def test_msgpack_falls_back_to_json_when_unavailable():
+    service = SocketService(max_queue=8, send_timeout=30, binary_events={"candle_update"})
+    ws = FakeWebSocket()
+    with patch.object(socket_module, "msgpack", None):
+        await service.connect(ws, "u", encoding="msgpack")
+        await service.emit_to_user("u", "candle_update", {"close": 1.5})
+        await settle(lambda: len(ws.sent) == 2)
+    assert json.loads(ws.sent[0])["data"] == {"encoding": "json", "binary_events": []}
+    assert json.loads(ws.sent[1])["event"] == "candle_update"
+
+
+@pytest.mark.asyncio
+async def test_subscribed_connections_only_receive_their_topics():
+    service = SocketService(max_queue=32, send_timeout=30, coalesce_ms=0)
+    chart, other_chart, legacy, stranger = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for ws, user in ((chart, "u"), (other_chart, "u"), (legacy, "u"), (stranger, "x")):
+        await service.connect(ws, user)
+    btc = socket_module.candle_topic("OKX", "BTC/USDT", "1h")
+    service.subscribe(chart, "u", [btc, socket_module.bot_topic("b1")])
+    service.subscribe(other_chart, "u", [socket_module.candle_topic("okx", "ETH/USDT", "1h")])
+    service.subscribe(stranger, "x", [btc, socket_module.bot_topic("b1")])
+
+    await service.publish(btc, "candle_update", {"close": 1}, owners={"u"})
+    await service.publish("candles:okx:ETH/USDT:1h", "candle_update", {"close": 2}, owners={"u"})
+    await service.publish("bot:b1", "bot_update", {"pnl": 1.0}, owners=["u"], private=True)
+    await settle(lambda: len(chart.sent) == 3 and len(other_chart.sent) == 2 and len(legacy.sent) == 3)
+    await asyncio.sleep(0.02)
+
+    assert chart.events() == ["subscriptions", "candle_update", "bot_update"]
+    assert other_chart.events() == ["subscriptions", "candle_update"]
+    assert json.loads(other_chart.sent[1])["data"] == {"close": 2}
+    # Sin suscripciones: todo lo de sus bots (compatibilidad con el frontend actual)
+    assert legacy.events() == ["candle_update", "candle_update", "bot_update"]
+    # Las velas son públicas para cualquier suscriptor; el estado de un bot solo para su dueño
+    assert stranger.events() == ["subscriptions", "candle_update"]
+
+    service.unsubscribe(chart, "u", [btc])
+    await service.publish(btc, "candle_update", {"close": 3}, owners={"u"})
+    await settle(lambda: len(chart.sent) == 4)
+    await asyncio.sleep(0.02)
+    assert chart.events()[-1] == "subscriptions" and len(stranger.sent) == 3
+
+    service.disconnect(stranger, "x")
+    assert btc not in service._subscribers
+
+
+@pytest.mark.asyncio
+async def test_topics_are_coalesced_to_the_latest_state():
+    service = SocketService(max_queue=64, send_timeout=30, coalesce_ms=50)
+    ws = FakeWebSocket()
+    await service.connect(ws, "u")
+    topic = socket_module.candle_topic("okx", "BTC/USDT", "1m")
+
+    # 1 envío inmediato + el último estado de la ráfaga al cerrar el intervalo
+    for i in range(100):
+        await service.publish(topic, "candle_update", {"candle": {"time": 60, "close": i}}, owners={"u"}, key=60)
+    await service.publish("bot:b1", "bot_update", {"id": "b1", "pnl": 1.0}, owners=["u"], private=True)
+    await service.publish("bot:b1", "bot_update", {"id": "b1", "status": "paused"}, owners=["u"], private=True)
+    await service.publish("bot:b1", "bot_update", {"id": "b1", "pnl": 2.5}, owners=["u"], private=True)
+    await settle(lambda: len(ws.sent) == 4)
+    await asyncio.sleep(0.1)
+
+    payloads = [json.loads(m) for m in ws.sent]
+    candles = [p["data"]["candle"]["close"] for p in payloads if p["event"] == "candle_update"]
+    assert candles == [0, 99]
+    # Los dicts pendientes se fusionan: el status no se pierde aunque después llegue otro PnL
+    bots = [p["data"] for p in payloads if p["event"] == "bot_update"]
+    assert bots == [{"id": "b1", "pnl": 1.0}, {"id": "b1", "status": "paused", "pnl": 2.5}]
+
+    # Una vela nueva (otra key) fuerza el envío del valor final de la anterior, en orden
+    ws.sent.clear()
+    await asyncio.sleep(0.06)
+    await service.publish(topic, "candle_update", {"candle": {"time": 60, "close": 100}}, owners={"u"}, key=60)
+    await service.publish(topic, "candle_update", {"candle": {"time": 60, "close": 101}}, owners={"u"}, key=60)
+    await service.publish(topic, "candle_update", {"candle": {"time": 120, "close": 102}}, owners={"u"}, key=120)
+    await settle(lambda: len(ws.sent) == 3)
+    assert [json.loads(m)["data"]["candle"]["close"] for m in ws.sent] == [100, 101, 102]
@@ -0,0 +1,87 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, patch
+from api.src.application.services import strategy_sweep
+from api.src.application.services.backtest_service import BacktestService
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.tests.helpers import make_ohlcv
+
+STRATEGY_SPACE = {"period": [10, 20], "z_threshold": [1.0, 1.5]}
+MODEL_SPACE = {"n_estimators": [10, 20], "max_depth": [4]}
+
+
+def test_grid_and_random_points():
+    grid = strategy_sweep.build_points(STRATEGY_SPACE, MODEL_SPACE)
+    assert len(grid) == 8
+    assert grid[0] == ({"period": 10, "z_threshold": 1.0}, {"n_estimators": 10, "max_depth": 4})
+    # Sin espacio de modelo se usan los hiperparámetros de producción
+    assert strategy_sweep.build_points({"period": [5]}) == [({"period": 5}, strategy_sweep.DEFAULT_MODEL_PARAMS)]
+
+    sampled = strategy_sweep.build_points(STRATEGY_SPACE, MODEL_SPACE, search="random", n_iter=3)
+    assert len(sampled) == 3 and all(p in grid for p in sampled)
+    assert sampled == strategy_sweep.build_points(STRATEGY_SPACE, MODEL_SPACE, search="random", n_iter=3)
+    with pytest.raises(ValueError):
+        strategy_sweep.build_points(STRATEGY_SPACE, search="bayes")
+
+
+def test_points_share_strategy_frames_and_indicators():
+    StrategyClass = StrategyTrainer().load_strategy_class("spot_arbitrage", "spot")
+    applies = []
+
+    class CountingStrategy(StrategyClass):
+        def apply(self, df, current_position=None):
+            applies.append(dict(self.config))
+            return super().apply(df, current_position)
+
+    df = make_ohlcv(n=800)
+    points = strategy_sweep.build_points(STRATEGY_SPACE, MODEL_SPACE)
+    with patch.object(strategy_sweep.IndicatorCache, "get", autospec=True, side_effect=strategy_sweep.IndicatorCache.get) as get:
+        rows = strategy_sweep.evaluate_sweep_points(df, "spot_arbitrage", CountingStrategy, points, 10000.0, 2000.0)
+
+    # Un apply por combinación de parámetros de estrategia, no por punto
+    assert len(applies) == 4 and len(rows) == 8
+    # sma/std de cada periodo se calculan una vez y se reutilizan para el otro z_threshold
+    keys = {call.args[1:4] for call in get.call_args_list}
+    assert len(get.call_args_list) == 8 and len(keys) == 4
+    assert all("error" not in r and r["test_samples"] > 0 for r in rows)
+
+    # El bloque da lo mismo que evaluar cada punto por separado
+    for point, row in zip(points, rows):
+        alone = strategy_sweep.evaluate_sweep_points(df, "spot_arbitrage", StrategyClass, [point], 10000.0, 2000.0)[0]
+        assert alone == row
+
+
+@pytest.mark.asyncio
+async def test_run_sweep_ranks_and_persists_best_config():
+    service = BacktestService(exchange_adapter=AsyncMock(), executor=ThreadPoolExecutor(max_workers=2))
+    service.get_market_data = AsyncMock(return_value=make_ohlcv(n=800, seed=3))
+    streamed = []
+
+    async def on_result(row):
+        streamed.append(row)
+
+    with patch("api.src.adapters.driven.persistence.mongodb_bot_repository.MongoBotRepository") as repo:
+        repo.return_value.update = AsyncMock(return_value=True)
+        repo.return_value.collection.update_one = AsyncMock()
+        result = await service.run_sweep("BTC/USDT", "spot_arbitrage", STRATEGY_SPACE, MODEL_SPACE, metric="profit_pct",
+                                         trade_amount=2000.0, bot_id="65f000000000000000000001", on_result=on_result)
+
+    table = result["results"]
+    assert result["points"] == len(table) == len(streamed) == 8
+    assert [r["rank"] for r in table] == list(range(1, 9))
+    assert [r["profit_pct"] for r in table] == sorted((r["profit_pct"] for r in table), reverse=True)
+    assert result["best"] is table[0] and result["persisted"]
+
+    bot_id, update = repo.return_value.update.await_args.args
+    assert bot_id == "65f000000000000000000001"
+    # Solo recomendación: no se tocan los parámetros con los que el bot opera en vivo
+    assert set(update) == {"config.sweep"}
+    assert update["config.sweep"]["strategy_params"] == table[0]["strategy_params"]
+    assert update["config.sweep"]["model_params"] == table[0]["model_params"]
+    assert update["config.sweep"]["score"] == table[0]["profit_pct"]
+    # Un bot con config null se inicializa antes del $set sobre config.*
+    guard, init = repo.return_value.collection.update_one.await_args.args
+    assert guard["config"] is None and init == {"$set": {"config": {}}}
+
+    with pytest.raises(ValueError):
+        await service.run_sweep("BTC/USDT", "spot_arbitrage", metric="luck")
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock
+from api.src.application.services.backtest_service import BacktestService
+from api.src.adapters.driven.persistence.ohlcv_store import OHLCVStore
+from api.src.domain.services.strategy_trainer import StrategyTrainer
+from api.src.infrastructure.concurrency import run_jobs
+from api.tests.helpers import make_ohlcv
+
+STRATEGIES = ["rsi_reversion", "macd", "spot_arbitrage"]
+
+
+def _blocking_job(seconds: float, value: int) -> int:
+    time.sleep(seconds)
+    return value
+
+
+def _failing_job():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture
+def trained_models(tmp_path):
+    trainer = StrategyTrainer(models_dir=str(tmp_path))
+    data = {"BTC/USDT": make_ohlcv(seed=1), "ETH/USDT": make_ohlcv(seed=2)}
+    for name in STRATEGIES:
+        assert asyncio.run(trainer.train_agnostic_model(name, data, "spot"))
+    return trainer, str(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_run_jobs_streams_results_without_blocking_loop():
+    executor = ThreadPoolExecutor(max_workers=9)
+    jobs = [("bad", _failing_job, ())]
+    jobs += [(f"job{i}", _blocking_job, (0.05 * (8 - i), i)) for i in range(8)]
+
+    streamed = []
+    ticks = 0
+
+    async def on_result(key, result, error):
+        streamed.append(key)
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    hb = asyncio.create_task(heartbeat())
+    outcomes = await run_jobs(executor, jobs, on_result)
+    hb.cancel()
+    executor.shutdown()
+
+    # Orden original en el retorno, orden de finalización en el streaming
+    assert [k for k, _, _ in outcomes] == [k for k, _, _ in jobs]
+    assert [r for _, r, e in outcomes if e is None] == list(range(8))
+    assert isinstance(outcomes[0][2], RuntimeError)
+    assert streamed == ["bad"] + [f"job{i}" for i in reversed(range(8))]
+    # El loop siguió atendiendo otras corrutinas mientras los jobs bloqueaban hilos
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_parallel_tournament_matches_sequential(trained_models):
+    trainer, models_dir = trained_models
+    exchange = AsyncMock()
+    exchange.get_historical_data.return_value = make_ohlcv(seed=3)
+
+    results = {}
+    for workers in (1, 4):
+        streamed = []
+
+        async def on_result(row):
+            streamed.append(row["strategy"])
+
+        service = BacktestService(exchange, trainer=trainer, models_dir=models_dir, executor=ThreadPoolExecutor(max_workers=workers),
+                                  candle_store=OHLCVStore(os.path.join(models_dir, f"ohlcv_{workers}")))
+        results[workers] = await service.run_backtest("BTC/USDT", days=7, timeframe="1h", trade_amount=1000.0, on_result=on_result)
+        assert sorted(streamed) == sorted(STRATEGIES)
+
+    sequential, parallel = results[1], results[4]
+    assert parallel["tournament_results"] == sequential["tournament_results"]
+    assert parallel["strategy_name"] == sequential["strategy_name"]
+    assert parallel["trades"] == sequential["trades"]
+
+
+@pytest.mark.asyncio
+async def test_select_best_model_in_pool(trained_models):
+    trainer, models_dir = trained_models
+    exchange = AsyncMock()
+    exchange.get_historical_data.return_value = make_ohlcv(seed=4)
+
+    streamed = []
+
+    async def on_result(row):
+        streamed.append(row)
+
+    service = BacktestService(exchange, trainer=trainer, models_dir=models_dir, executor=ThreadPoolExecutor(max_workers=3))
+    result = await service.select_best_model("BTC/USDT", "1h", on_result=on_result)
+
+    assert result["recommended_strategy"] in STRATEGIES
+    assert {r["strategy"] for r in result["tournament_results"]} == set(STRATEGIES)
+    assert len(streamed) == len(STRATEGIES)
+    best = max(result["tournament_results"], key=lambda r: r["accuracy"])
+    assert result["accuracy_score"] == round(best["accuracy"], 4)
+
+
+@pytest.mark.asyncio
+async def test_tournament_ranks_on_requested_metric(trained_models, tmp_path):
+    trainer, models_dir = trained_models
+    exchange = AsyncMock()
+    exchange.get_historical_data.return_value = make_ohlcv(seed=5)
+    service = BacktestService(exchange, trainer=trainer, models_dir=models_dir, executor=ThreadPoolExecutor(max_workers=3),
+                              candle_store=OHLCVStore(str(tmp_path / "ohlcv")))
+
+    result = await service.run_backtest("BTC/USDT", days=7, timeframe="1h", trade_amount=1000.0, metric="max_drawdown")
+
+    drawdowns = [r["max_drawdown"] for r in result["tournament_results"]]
+    assert drawdowns == sorted(drawdowns) and result["ranked_by"] == "max_drawdown"
+    assert result["strategy_name"] == result["tournament_results"][0]["strategy"]
+    assert result["metrics"]["max_drawdown"] == drawdowns[0]
+    assert {"sharpe_ratio", "sortino_ratio", "profit_factor", "exposure_pct", "avg_trade_bars"} <= set(result["metrics"])
+    assert result["equity_curve"][-1]["value"] == pytest.approx(result["final_balance"], abs=0.01)
+
+    with pytest.raises(ValueError):
+        await service.run_backtest("BTC/USDT", days=7, timeframe="1h", metric="luck")
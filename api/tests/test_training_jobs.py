@@ -0,0 +1,217 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.src.application.services.ml_optimizer import MLOptimizer
+from api.src.application.services.training_jobs import TrainingJobQueue
+
+PARAMS = {"symbols": ["BTC/USDT", "ETH/USDT"], "timeframe": "1h", "days": 60, "market": "spot", "exchange": "okx", "refresh_data": False}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs[:length] if length else self.docs)
+
+
+class FakeCollection:
+    """Colección en memoria con las operaciones que usa la cola."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        doc.update(update.get("$set", {}))
+        for field, value in update.get("$addToSet", {}).items():
+            if value not in doc[field]:
+                doc[field] = doc[field] + [value]
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        for doc in self.docs.values():
+            if all(doc.get(k) in v["$in"] if isinstance(v, dict) else doc.get(k) == v for k, v in query.items()):
+                await self.update_one({"_id": doc["_id"]}, update)
+                return dict(doc)
+        return None
+
+    def find(self, query):
+        docs = list(self.docs.values())
+        if "status" in query:
+            docs = [d for d in docs if d["status"] in query["status"]["$in"]]
+        if "subscribers" in query:
+            docs = [d for d in docs if query["subscribers"] in d["subscribers"]]
+        return FakeCursor(docs)
+
+
+class FakeMLService:
+    """train_all_strategies que espera a que el test lo libere, registrando la concurrencia."""
+
+    running = 0
+    peak = 0
+    calls = []
+
+    def __init__(self, release: asyncio.Event):
+        self.release = release
+
+    async def train_all_strategies(self, symbols, timeframe, days, market_type, user_id, refresh_data, exchange_id="binance",
+                                   log_callback=None, progress_callback=None):
+        cls = FakeMLService
+        cls.calls.append((symbols, exchange_id))
+        cls.running += 1
+        cls.peak = max(cls.peak, cls.running)
+        try:
+            await log_callback("Training started", "info")
+            await self.release.wait()
+            for done in (1, 2):
+                await progress_callback(done, 2)
+            return {"status": "success", "trained_count": 2}
+        finally:
+            cls.running -= 1
+
+
+@pytest.fixture
+def queue_env():
+    FakeMLService.running, FakeMLService.peak, FakeMLService.calls = 0, 0, []
+    db = MagicMock(training_jobs=FakeCollection())
+    socket = MagicMock(emit_to_user=AsyncMock())
+    with patch('api.src.adapters.driven.notifications.socket_service.socket_service', socket):
+        yield db, socket
+
+
+async def wait_for(predicate, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_deduplicated_and_bounded(queue_env):
+    db, socket = queue_env
+    release = asyncio.Event()
+    queue = TrainingJobQueue(db_adapter=db, ml_service_factory=lambda: FakeMLService(release), max_workers=1)
+
+    first, created = await queue.submit(PARAMS, user_id="u-1")
+    same, dup = await queue.submit({**PARAMS, "symbols": ["ETH/USDT", "BTC/USDT"]}, user_id="u-2")
+    other, _ = await queue.submit({**PARAMS, "timeframe": "4h"}, user_id="u-1")
+    assert created and not dup and same["id"] == first["id"] and other["id"] != first["id"]
+    assert same["subscribers"] == ["u-1", "u-2"]
+
+    await queue.start()
+    await wait_for(lambda: FakeMLService.running == 1)
+    assert (await queue.get(first["id"]))["status"] == "running"
+    assert (await queue.get(other["id"]))["status"] == "queued"
+
+    release.set()
+    await wait_for(lambda: all(d["status"] == "completed" for d in db.training_jobs.docs.values()))
+    await queue.stop()
+
+    assert FakeMLService.peak == 1 and len(FakeMLService.calls) == 2
+    stored = await queue.get(first["id"])
+    assert stored["progress"] == {"stage": "completed", "done": 2, "total": 2, "percent": 100.0}
+    assert stored["result"]["trained_count"] == 2 and stored["logs"][0]["message"] == "Training started"
+    assert [j["id"] for j in await queue.list_jobs(user_id="u-2")] == [first["id"]]
+
+    # Progreso por socket a todos los suscriptores; los logs, al suscriptor que no es dueño
+    emitted = [(c.args[0], c.args[1]) for c in socket.emit_to_user.await_args_list]
+    assert ("u-2", "training_job") in emitted and ("u-2", "training_log") in emitted
+    assert ("u-1", "training_log") not in emitted
+
+    # Un job terminado ya no deduplica: se vuelve a encolar
+    _, created_again = await queue.submit(PARAMS, user_id="u-1")
+    assert created_again
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_jobs(queue_env):
+    db, _ = queue_env
+    release = asyncio.Event()
+    queue = TrainingJobQueue(db_adapter=db, ml_service_factory=lambda: FakeMLService(release), max_workers=1)
+    running, _ = await queue.submit(PARAMS, user_id="u-1")
+    queued, _ = await queue.submit({**PARAMS, "market": "futures"}, user_id="u-1")
+    await queue.start()
+    await wait_for(lambda: FakeMLService.running == 1)
+
+    assert (await queue.cancel(queued["id"]))["status"] == "cancelled"
+    await queue.cancel(running["id"])
+    await wait_for(lambda: db.training_jobs.docs[next(iter(db.training_jobs.docs))]["status"] == "cancelled")
+    await asyncio.sleep(0.05)
+    await queue.stop()
+
+    assert FakeMLService.calls == [(PARAMS["symbols"], "okx")] and FakeMLService.running == 0
+    assert {d["status"] for d in db.training_jobs.docs.values()} == {"cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_pending_jobs_are_recovered_on_start(queue_env):
+    db, _ = queue_env
+    release = asyncio.Event()
+    release.set()
+    previous = TrainingJobQueue(db_adapter=db, ml_service_factory=lambda: FakeMLService(release))
+    job, _ = await previous.submit(PARAMS, user_id="u-1")  # encolado pero nunca ejecutado (reinicio)
+
+    queue = TrainingJobQueue(db_adapter=db, ml_service_factory=lambda: FakeMLService(release))
+    await queue.start()
+    await wait_for(lambda: db.training_jobs.docs[next(iter(db.training_jobs.docs))]["status"] == "completed")
+    await queue.stop()
+    assert (await queue.get(job["id"]))["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_automl_enqueues_retraining():
+    db = MagicMock()
+    db.trades.aggregate = MagicMock(return_value=FakeCursor([{"_id": "b1", "total_trades": 20, "wins": 5}]))
+    db.bot_instances.find_one = AsyncMock(return_value={"id": "b1", "symbol": "SOL/USDT", "timeframe": "15m",
+                                                         "market_type": "spot", "exchangeId": "OKX"})
+    queue = MagicMock(submit=AsyncMock(return_value=({"id": "job-1"}, True)))
+
+    job = await MLOptimizer(db, ml_service=None, training_queue=queue).check_and_retrain("b1")
+
+    assert job == {"id": "job-1"}
+    params = queue.submit.await_args.args[0]
+    assert params["symbols"] == ["SOL/USDT"] and params["timeframe"] == "15m"
+    assert params["exchange"] == "okx" and params["refresh_data"] is True
+    assert queue.submit.await_args.kwargs["requested_by"] == "automl"
+
+
+@pytest.mark.asyncio
+async def test_secondary_workers_hand_jobs_to_the_primary(queue_env):
+    db, _ = queue_env
+    release = asyncio.Event()
+    primary = TrainingJobQueue(db_adapter=db, ml_service_factory=lambda: FakeMLService(release),
+                               max_workers=1, poll_seconds=0.01)
+    secondary = TrainingJobQueue(db_adapter=db, remote=True)
+
+    job, created = await secondary.submit(PARAMS, user_id="u-1")
+    same, dup = await secondary.submit(PARAMS, user_id="u-2")
+    assert created and not dup and same["id"] == job["id"] and same["subscribers"] == ["u-1", "u-2"]
+    queued, _ = await secondary.submit({**PARAMS, "timeframe": "4h"}, user_id="u-1")
+
+    # El principal los recoge de Mongo y los ejecuta; el secundario no tiene consumidores
+    await primary.start()
+    await wait_for(lambda: FakeMLService.running == 1)
+    assert (await secondary.get(job["id"]))["status"] == "running"
+
+    # Un submit en el principal deduplica con el job que vino del secundario
+    again, created_again = await primary.submit(PARAMS, user_id="u-3")
+    assert not created_again and again["id"] == job["id"]
+
+    # Las cancelaciones también viajan por Mongo
+    await secondary.cancel(queued["id"])
+    await secondary.cancel(job["id"])
+    await wait_for(lambda: {d["status"] for d in db.training_jobs.docs.values()} == {"cancelled"})
+    await primary.stop()
+    assert FakeMLService.calls == [(PARAMS["symbols"], "okx")]
+    assert set(db.training_jobs.docs[next(iter(db.training_jobs.docs))]["subscribers"]) == {"u-1", "u-2", "u-3"}
@@ -0,0 +1,70 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, patch
+from api.src.adapters.driven.persistence.walk_forward_cache import WalkForwardCache
+from api.src.application.services import walk_forward
+from api.src.application.services.backtest_service import BacktestService
+from api.tests.helpers import make_ohlcv
+
+
+def test_folds_are_aligned_and_survive_history_extension():
+    df = make_ohlcv(n=1200, seed=11, start='2024-01-01 07:00')
+    folds = walk_forward.build_folds(df.index[:900], "1h", train_size=300, test_size=100)
+
+    assert folds and all(f["test_end"] - f["test_start"] == 100 for f in folds)
+    assert all(f["start_ms"] % (100 * 3_600_000) == 0 for f in folds)
+    # Test consecutivos y sin solapamiento; cada fold tiene su histórico de entrenamiento completo
+    assert all(a["test_end"] == b["test_start"] for a, b in zip(folds, folds[1:]))
+    assert folds[0]["train_start"] >= 0
+
+    # Más velas al final: los folds previos siguen siendo los mismos
+    extended = walk_forward.build_folds(df.index, "1h", train_size=300, test_size=100)
+    assert [f["start_ms"] for f in extended[:len(folds)]] == [f["start_ms"] for f in folds]
+    assert len(extended) > len(folds)
+
+
+def test_aggregate_folds_sums_out_of_sample_pnl():
+    rows = [
+        {"final_balance": 10100.0, "accuracy": 0.5, "test_samples": 100, "win_rate": 50.0, "total_trades": 4},
+        {"final_balance": 9950.0, "accuracy": 0.8, "test_samples": 300, "win_rate": 100.0, "total_trades": 1},
+        {"error": "not enough training signals"},
+    ]
+    summary = walk_forward.aggregate_folds(rows, 10000.0)
+    assert summary == {"folds": 2, "failed_folds": 1, "total_pnl": 50.0, "profit_pct": 0.5, "accuracy": 0.725,
+                       "total_trades": 5, "win_rate": 60.0, "positive_folds": 1}
+
+
+@pytest.mark.asyncio
+async def test_extending_history_only_trains_new_folds(tmp_path):
+    df = make_ohlcv(n=1200, seed=11, start='2024-01-01 07:00')
+    service = BacktestService(exchange_adapter=AsyncMock(), executor=ThreadPoolExecutor(max_workers=2),
+                              fold_cache=WalkForwardCache(str(tmp_path)))
+    kwargs = dict(strategy_name="spot_arbitrage", train_size=300, test_size=100, trade_amount=2000.0)
+    streamed = []
+
+    async def on_result(row):
+        streamed.append(row)
+
+    with patch.object(walk_forward, "evaluate_fold", wraps=walk_forward.evaluate_fold) as evaluate:
+        service.get_market_data = AsyncMock(return_value=df.iloc[:900])
+        first = await service.run_walk_forward("BTC/USDT", on_result=on_result, **kwargs)
+        assert first["trained_folds"] == first["folds"] == evaluate.call_count == len(streamed)
+
+        service.get_market_data = AsyncMock(return_value=df)
+        second = await service.run_walk_forward("BTC/USDT", **kwargs)
+
+    new_folds = second["folds"] - first["folds"]
+    assert new_folds == 3 and second["trained_folds"] == new_folds and second["cached_folds"] == first["folds"]
+    assert evaluate.call_count == first["folds"] + new_folds
+
+    before, after = first["results"][0], second["results"][0]
+    assert after["fold_results"][0]["cached"] and not after["fold_results"][-1]["cached"]
+    for old, new in zip(before["fold_results"], after["fold_results"]):
+        assert {**old, "cached": True} == new
+    assert second["recommended_strategy"] == "spot_arbitrage"
+    assert after["total_trades"] == sum(r.get("total_trades", 0) for r in after["fold_results"])
+
+    # Una caché nueva sobre el mismo directorio también sirve los folds desde disco
+    service.fold_cache = WalkForwardCache(str(tmp_path))
+    third = await service.run_walk_forward("BTC/USDT", **kwargs)
+    assert third["trained_folds"] == 0 and third["results"][0]["profit_pct"] == after["profit_pct"]